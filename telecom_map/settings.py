@@ -4,6 +4,7 @@ Django settings for telecom_map project.
 Generated by 'django-admin startproject' using Django 5.2.7.
 """
 
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -49,6 +50,8 @@ X_FRAME_OPTIONS = 'SAMEORIGIN'
 #       MIDDLEWARE
 # ---------------------------
 MIDDLEWARE = [
+    # Первым — чтобы метрики учитывали весь запрос (/api/_metrics)
+    'telecom_net.middleware.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -59,6 +62,11 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Запросы дольше SLOW_REQUEST_MS пишутся в лог telecom_net.metrics с самыми долгими SQL —
+# каждый с вероятностью SLOW_REQUEST_SAMPLE
+SLOW_REQUEST_MS = 500
+SLOW_REQUEST_SAMPLE = 0.1
+
 
 ROOT_URLCONF = 'telecom_map.urls'
 
@@ -95,13 +103,75 @@ WSGI_APPLICATION = 'telecom_map.wsgi.application'
 # ---------------------------
 #       DATABASE
 # ---------------------------
+# PRAGMA для каждого нового соединения SQLite
+SQLITE_PRAGMAS = {
+    # WAL: чтение не блокируется записью, запись — чтением
+    'journal_mode': 'WAL',
+    # В режиме WAL NORMAL не теряет целостность, fsync только на checkpoint
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение — размер кэша страниц в КиБ (64 МБ)
+    'cache_size': -64000,
+    # Ожидание блокировки вместо мгновенного "database is locked" (мс)
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+
+
+def sqlite_init_command(pragmas):
+    return ';'.join(f'PRAGMA {name}={value}' for name, value in pragmas.items())
+
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'init_command': sqlite_init_command(SQLITE_PRAGMAS),
+            # Запись берет блокировку сразу в BEGIN: без SQLITE_BUSY при повышении
+            # блокировки чтения до записи посреди транзакции
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# Реплика для чтения map-data, search, check-connection и stats (db_router.py):
+# DB_READ_REPLICA=ro — тот же файл соединением только на чтение,
+# DB_READ_REPLICA=<путь> — копия БД (например, от litestream или sqlite3 .backup)
+DB_READ_REPLICA = os.environ.get('DB_READ_REPLICA')
+if DB_READ_REPLICA:
+    replica_path = DATABASES['default']['NAME'] if DB_READ_REPLICA == 'ro' else Path(DB_READ_REPLICA)
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{replica_path}?mode=ro',
+        'OPTIONS': {
+            # journal_mode задает основное соединение, реплика его не меняет
+            'init_command': sqlite_init_command({
+                **{name: value for name, value in SQLITE_PRAGMAS.items() if name != 'journal_mode'},
+                'query_only': 'ON',
+            }),
+        },
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['telecom_net.db_router.ReadReplicaRouter']
+
+
+# ---------------------------
+#       CACHE
+# ---------------------------
+# Здесь хранятся тайлы карты (/api/tiles/). При нескольких воркерах нужен
+# общий кэш, например django_redis.cache.RedisCache.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'telecom-map',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+# Версии индексов в памяти, общие для воркеров и команд импорта (telecom_net/versions.py)
+VERSIONS_DIR = BASE_DIR / 'var' / 'versions'
+
 
 # ---------------------------
 #       PASSWORDS
@@ -141,7 +211,15 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
-    ]
+    ],
+    # Списки — страницами по курсору (telecom_net/pagination.py; ?page_size= до 1000)
+    'DEFAULT_PAGINATION_CLASS': 'telecom_net.pagination.KeysetPagination',
+    'PAGE_SIZE': 100,
+    # Время рендеринга JSON учитывается в метриках как сериализация (telecom_net/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'telecom_net.renderers.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 
@@ -2,8 +2,20 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 from django import forms
+from . import thumbnails
 from .models import InfrastructureObject, CableRoute, ObjectHistory
 
+def image_preview(image, digest):
+    """Превью 60px: миниатюра WebP/JPEG, пока ее нет — оригинал"""
+    urls = thumbnails.urls(digest)
+    if urls is None:
+        return format_html('<img src="{}" style="width:60px;height:60px;border-radius:6px;">', image.url)
+    return format_html(
+        '<picture><source srcset="{}" type="image/webp">'
+        '<img src="{}" style="width:60px;height:60px;object-fit:cover;border-radius:6px;"></picture>',
+        urls['small']['webp'], urls['small']['jpeg']
+    )
+
 class InfrastructureObjectForm(forms.ModelForm):
     class Meta:
         model = InfrastructureObject
@@ -122,12 +134,12 @@ class InfrastructureObjectAdmin(admin.ModelAdmin):
 
     def photo_preview(self, obj):
         if obj.photo:
-            return format_html('<img src="{}" style="width:60px;height:60px;border-radius:6px;">', obj.photo.url)
+            return image_preview(obj.photo, obj.photo_hash)
         return "Нет фото"
 
     def diagram_preview(self, obj):
         if obj.diagram:
-            return format_html('<img src="{}" style="width:60px;height:60px;border-radius:6px;">', obj.diagram.url)
+            return image_preview(obj.diagram, obj.diagram_hash)
         return "Нет схемы"
 
     class Media:
@@ -149,7 +161,7 @@ class CableRouteAdmin(admin.ModelAdmin):
 
     def route_photo_preview(self, obj):
         if obj.route_photo:
-            return format_html('<img src="{}" style="width:60px;height:60px;border-radius:6px;">', obj.route_photo.url)
+            return image_preview(obj.route_photo, obj.route_photo_hash)
         return "Нет фото"
 
 @admin.register(ObjectHistory)
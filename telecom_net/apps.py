@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 class TelecomNetConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'telecom_net'
\ No newline at end of file
+    name = 'telecom_net'
+
+    def ready(self):
+        from . import metrics, signals  # noqa: F401
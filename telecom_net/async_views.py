@@ -0,0 +1,176 @@
+"""
+Асинхронные версии горячих read-эндпоинтов (map-data, check-connection,
+search, stats) для запуска под ASGI (telecom_map/asgi.py).
+
+Запросы идут через асинхронный ORM, независимые — одновременно
+(asyncio.gather). Разбор параметров, фильтры, ETag и формирование ответа
+общие с синхронными views, поэтому ответы совпадают. Медленный клиент
+под ASGI держит только корутину, а не поток воркера.
+"""
+
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db.models import Max
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_GET
+
+from . import fulltext, views
+from . import stats as network_stats
+from .db_router import read_from_replica
+from .models import CableRoute, InfrastructureObject
+from .renderers import TimedJSONRenderer
+from .serializers import CableRouteSerializer, InfrastructureObjectSerializer
+
+MEDIA_TYPE = 'application/json'
+
+
+def json_response(data, status=200):
+    """JSON тем же рендерером, что и у DRF-версий"""
+    return HttpResponse(TimedJSONRenderer().render(data), content_type=MEDIA_TYPE, status=status)
+
+
+async def alist(queryset):
+    return [item async for item in queryset]
+
+
+async def aranked(queryset, ids):
+    """Асинхронный views.ranked: записи queryset в порядке ids"""
+    found = {obj.pk: obj async for obj in queryset.filter(pk__in=ids)}
+    return [found[pk] for pk in ids if pk in found]
+
+
+async def objects_payload(queryset, compact):
+    if compact:
+        rows = await alist(queryset.values_list(*views.COMPACT_OBJECT_FIELDS))
+        return views.rows_to_columns(rows, views.COMPACT_OBJECT_FIELDS)
+    objects = await alist(InfrastructureObjectSerializer.setup_eager_loading(queryset))
+    return InfrastructureObjectSerializer(objects, many=True).data
+
+
+async def routes_payload(queryset, compact):
+    if compact:
+        rows = await alist(queryset.values_list(*views.COMPACT_ROUTE_FIELDS))
+        return views.rows_to_columns(rows, views.COMPACT_ROUTE_NAMES)
+    routes = await alist(CableRouteSerializer.setup_eager_loading(queryset))
+    return CableRouteSerializer(routes, many=True).data
+
+
+async def map_data_version():
+    """Асинхронный views.map_data_version: три запроса одновременно"""
+    objects_modified, routes_modified, last_deletion = await asyncio.gather(
+        InfrastructureObject.objects.aaggregate(last=Max('updated_at')),
+        CableRoute.objects.aaggregate(last=Max('updated_at')),
+        views.last_deletion().afirst(),
+    )
+    return views.combine_version(objects_modified['last'], routes_modified['last'], last_deletion)
+
+
+@require_GET
+@read_from_replica
+async def map_data(request):
+    """Данные для карты — параметры и ответ как у /api/map-data/ (format=compact — колонки)"""
+    compact = request.GET.get('format') == 'compact'
+    try:
+        bbox, zoom, since = views.map_data_params(request.GET)
+    except ValueError as e:
+        return json_response({'error': str(e)}, status=400)
+
+    sync_token, etag, last_modified_ts = views.map_data_etag(*await map_data_version(), MEDIA_TYPE, request.GET)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified_ts)
+    if not_modified is not None:
+        return not_modified
+
+    infrastructure_objects, cable_routes = views.map_data_querysets(request.GET, bbox, zoom)
+
+    if zoom is not None and zoom < views.CLUSTER_MAX_ZOOM:
+        rows, routes = await asyncio.gather(
+            alist(views.cluster_rows(infrastructure_objects, zoom)), routes_payload(cable_routes, compact),
+        )
+        data = {'mode': 'clusters', 'clusters': views.merge_clusters(rows), 'cable_routes': routes}
+    elif since is not None:
+        # Дельта — десяток зависимых запросов, выполняется синхронной версией в потоке
+        data = await sync_to_async(views.map_data_delta)(
+            since, infrastructure_objects, cable_routes, *views.map_data_serializers(compact)
+        )
+    else:
+        objects, routes = await asyncio.gather(
+            objects_payload(infrastructure_objects, compact), routes_payload(cable_routes, compact),
+        )
+        data = {'mode': 'objects', 'infrastructure_objects': objects, 'cable_routes': routes}
+    if compact:
+        data['format'] = 'compact'
+    data['sync_token'] = sync_token
+
+    return views.with_map_data_headers(json_response(data), etag, last_modified_ts)
+
+
+@require_GET
+@read_from_replica
+async def check_connection(request):
+    """Проверка подключения — как /api/check-connection/"""
+    address, lat, lng = views.connection_params(request.GET)
+    try:
+        lat = float(lat)
+        lng = float(lng)
+        # Индекс в памяти; при первом обращении он строится из БД — поэтому в потоке
+        nearest = await sync_to_async(views.nearest_connection_points)(lat, lng)
+        objects_by_id = await views.connection_candidates().ain_bulk([pk for _, pk in nearest])
+        return json_response(views.connection_result(address, nearest, objects_by_id))
+    except Exception as e:
+        return json_response({
+            'error': str(e),
+            'message': 'Ошибка при проверке подключения'
+        }, status=500)
+
+
+async def fulltext_search(query):
+    object_expression = fulltext.match_expression(query, views.SEARCH_OBJECT_COLUMNS)
+    if object_expression is None:
+        return [], 0, [], 0
+    search = sync_to_async(fulltext.search)
+    (object_ids, objects_total), (route_ids, routes_total) = await asyncio.gather(
+        search('object', object_expression, views.SEARCH_OBJECTS_LIMIT),
+        search('route', fulltext.match_expression(query), views.SEARCH_ROUTES_LIMIT),
+    )
+    objects, routes = await asyncio.gather(
+        aranked(InfrastructureObjectSerializer.setup_eager_loading(InfrastructureObject.objects.all()), object_ids),
+        aranked(CableRouteSerializer.setup_eager_loading(CableRoute.objects.all()), route_ids),
+    )
+    return objects, objects_total, routes, routes_total
+
+
+async def icontains_search(query):
+    objects, routes = views.icontains_querysets(query)
+    return await asyncio.gather(
+        alist(objects[:views.SEARCH_OBJECTS_LIMIT]), objects.acount(),
+        alist(routes[:views.SEARCH_ROUTES_LIMIT]), routes.acount(),
+    )
+
+
+@require_GET
+@read_from_replica
+async def search(request):
+    """Поиск — как /api/search/"""
+    query = request.GET.get('q', '')
+    if not query or len(query) < 2:
+        return json_response({'error': 'Слишком короткий запрос'}, status=400)
+
+    if fulltext.is_available():
+        objects, objects_total, routes, routes_total = await fulltext_search(query)
+    else:
+        objects, objects_total, routes, routes_total = await icontains_search(query)
+
+    return json_response({
+        'infrastructure_objects': InfrastructureObjectSerializer(objects, many=True).data,
+        'cable_routes': CableRouteSerializer(routes, many=True).data,
+        'total_results': objects_total + routes_total
+    })
+
+
+@require_GET
+@read_from_replica
+async def stats(request):
+    """Статистика из сводной таблицы — как /api/infrastructure/stats/"""
+    return json_response(network_stats.summarize(await alist(network_stats.stat_rows())))
@@ -0,0 +1,340 @@
+"""
+Индекс автодополнения для строки поиска на карте.
+
+Слова из object_id, name и address активных объектов нормализуются
+(нижний регистр, кириллица и таджикские буквы -> латиница, «kh»/«x» -> «h»,
+«dzh»/«zh» -> «j»), поэтому «Худжанд», «Khujand» и «Xujand» дают одно слово.
+Словарь хранится отсортированным: префиксный поиск — два bisect. Для
+опечаток слова словаря индексируются по триграммам.
+
+Индекс живёт в памяти процесса, строится лениво и обновляется сигналами
+модели (см. signals.py); изменения в других процессах видны по общей
+версии (versions.py) — как в spatial.
+"""
+
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+from . import versions
+
+TRANSLIT = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo', 'ж': 'zh',
+    'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o',
+    'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'kh', 'ц': 'ts',
+    'ч': 'ch', 'ш': 'sh', 'щ': 'sh', 'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu',
+    'я': 'ya',
+    # Таджикский алфавит
+    'ғ': 'gh', 'ӣ': 'i', 'қ': 'q', 'ӯ': 'u', 'ҳ': 'h', 'ҷ': 'j',
+}
+TRANSLIT_TABLE = str.maketrans(TRANSLIT)
+# Свертка вариантов латиницы (после транслитерации), порядок важен
+LATIN_FOLDS = (('dzh', 'j'), ('zh', 'j'), ('kh', 'h'), ('x', 'h'))
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Слово запроса короче этого ищется только по префиксу, без опечаток
+FUZZY_MIN_LENGTH = 4
+# Минимальное сходство по триграммам (коэффициент Жаккара) для опечатки
+FUZZY_MIN_SIMILARITY = 0.3
+FUZZY_MAX_TOKENS = 5
+
+DEFAULT_LIMIT = 10
+# Сколько кандидатов (от limit) собрать до ранжирования
+CANDIDATES_FACTOR = 4
+
+# Уровни совпадения: точное слово, префикс, опечатка
+EXACT, PREFIX, FUZZY = 0, 1, 2
+
+
+def normalize(text):
+    text = (text or '').lower().translate(TRANSLIT_TABLE)
+    for src, dst in LATIN_FOLDS:
+        text = text.replace(src, dst)
+    return text
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(normalize(text))
+
+
+def trigrams(token):
+    padded = f' {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def is_fuzzy(token):
+    """Опечатки ищутся только в словах из букв — номера и ID совпадают точно или по префиксу"""
+    return token.isalpha()
+
+
+def object_tokens(object_id, name, address):
+    """Слова объекта; ID дополнительно целиком без разделителей (olt001 для OLT-001)"""
+    id_tokens = tokenize(object_id)
+    tokens = set(id_tokens) | set(tokenize(name)) | set(tokenize(address))
+    tokens.add(''.join(id_tokens))
+    tokens.discard('')
+    return tokens
+
+
+class AutocompleteIndex:
+    """Словарь слов -> id объектов и карточки объектов для выдачи"""
+
+    def __init__(self):
+        self._entries = {}
+        self._postings = defaultdict(set)
+        self._vocab = []
+        self._trigrams = defaultdict(set)
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, pk):
+        return pk in self._entries
+
+    def insert(self, pk, object_id, name, address, object_type, lat, lng):
+        with self._lock:
+            self.remove(pk)
+            tokens = object_tokens(object_id, name, address)
+            label = f'{object_id} — {name}' if name else object_id
+            self._entries[pk] = (label, object_type, lat, lng, tokens)
+            for token in tokens:
+                posting = self._postings[token]
+                if not posting:
+                    self._add_word(token)
+                posting.add(pk)
+
+    def remove(self, pk):
+        with self._lock:
+            entry = self._entries.pop(pk, None)
+            if entry is None:
+                return
+            for token in entry[4]:
+                posting = self._postings[token]
+                posting.discard(pk)
+                if not posting:
+                    del self._postings[token]
+                    self._remove_word(token)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._postings.clear()
+            self._vocab.clear()
+            self._trigrams.clear()
+
+    def load(self, rows):
+        """Массовая загрузка (id, object_id, name, address, object_type, lat, lng) в пустой индекс"""
+        with self._lock:
+            for pk, object_id, name, address, object_type, lat, lng in rows:
+                tokens = object_tokens(object_id, name, address)
+                label = f'{object_id} — {name}' if name else object_id
+                self._entries[pk] = (label, object_type, lat, lng, tokens)
+                for token in tokens:
+                    self._postings[token].add(pk)
+            self._vocab = sorted(self._postings)
+            for token in filter(is_fuzzy, self._vocab):
+                for gram in trigrams(token):
+                    self._trigrams[gram].add(token)
+
+    def _add_word(self, token):
+        insort(self._vocab, token)
+        if not is_fuzzy(token):
+            return
+        for gram in trigrams(token):
+            self._trigrams[gram].add(token)
+
+    def _remove_word(self, token):
+        i = bisect_left(self._vocab, token)
+        if i < len(self._vocab) and self._vocab[i] == token:
+            del self._vocab[i]
+        if not is_fuzzy(token):
+            return
+        for gram in trigrams(token):
+            words = self._trigrams.get(gram)
+            if words is not None:
+                words.discard(token)
+                if not words:
+                    del self._trigrams[gram]
+
+    def _prefix_range(self, prefix):
+        lo = bisect_left(self._vocab, prefix)
+        hi = bisect_left(self._vocab, prefix + '\uffff', lo)
+        return lo, hi
+
+    def _similar_words(self, token):
+        """Слова словаря, похожие на token по триграммам: [(similarity, word)]"""
+        grams = trigrams(token)
+        shared = defaultdict(int)
+        for gram in grams:
+            for word in self._trigrams.get(gram, ()):
+                shared[word] += 1
+        scored = []
+        for word, count in shared.items():
+            similarity = count / (len(grams) + len(word) - count)
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                scored.append((similarity, word))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return scored[:FUZZY_MAX_TOKENS]
+
+    def _matches(self, word):
+        """
+        Как искать слово запроса: (оценка числа кандидатов, fuzzy). fuzzy —
+        None, если в словаре есть слова с таким префиксом, иначе словарь
+        похожих слов {слово: FUZZY} (пустой — совпадений нет).
+        """
+        lo, hi = self._prefix_range(word)
+        if lo < hi:
+            return hi - lo + len(self._postings[self._vocab[lo]]), None
+        if len(word) < FUZZY_MIN_LENGTH or not is_fuzzy(word):
+            return 0, {}
+        fuzzy = {similar: FUZZY for _, similar in self._similar_words(word)}
+        return sum(len(self._postings[similar]) for similar in fuzzy), fuzzy
+
+    def _candidate_words(self, word, fuzzy):
+        """Слова словаря для слова запроса в порядке приоритета: (level, word)"""
+        if fuzzy is not None:
+            yield from ((level, similar) for similar, level in fuzzy.items())
+            return
+        lo, hi = self._prefix_range(word)
+        for i in range(lo, hi):
+            vocab_word = self._vocab[i]
+            yield (EXACT if vocab_word == word else PREFIX), vocab_word
+
+    @staticmethod
+    def _level(word, fuzzy, tokens):
+        """Лучший уровень совпадения слова запроса со словами объекта (None — нет)"""
+        best = None
+        for token in tokens:
+            if fuzzy is None:
+                level = (EXACT if token == word else PREFIX) if token.startswith(word) else None
+            else:
+                level = fuzzy.get(token)
+            if level is not None and (best is None or level < best):
+                best = level
+        return best
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """
+        До limit объектов, содержащих все слова запроса (по префиксу или с
+        опечаткой): список dict(id, label, type, lat, lng).
+        """
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words:
+            return []
+
+        with self._lock:
+            matched = []
+            for word in words:
+                estimate, fuzzy = self._matches(word)
+                if not estimate:
+                    return []
+                matched.append((estimate, word, fuzzy))
+            # Обход начинается со слова с наименьшим числом кандидатов,
+            # остальные проверяются по словам найденного объекта
+            matched.sort(key=lambda item: item[0])
+            _, driver_word, driver_fuzzy = matched[0]
+            others = [(word, fuzzy) for _, word, fuzzy in matched[1:]]
+
+            found = {}
+            for level, vocab_word in self._candidate_words(driver_word, driver_fuzzy):
+                for pk in self._postings[vocab_word]:
+                    if pk in found:
+                        continue
+                    tokens = self._entries[pk][4]
+                    score = level
+                    for word, fuzzy in others:
+                        other_level = self._level(word, fuzzy, tokens)
+                        if other_level is None:
+                            break
+                        score = max(score, other_level)
+                    else:
+                        found[pk] = score
+                        if len(found) >= limit * CANDIDATES_FACTOR:
+                            break
+                # Точных совпадений хватает — префиксы и опечатки не нужны
+                if len(found) >= limit * CANDIDATES_FACTOR or (level == EXACT and len(found) >= limit):
+                    break
+
+            result = []
+            for pk in sorted(found, key=lambda pk: (found[pk], self._entries[pk][0]))[:limit]:
+                label, object_type, lat, lng, _ = self._entries[pk]
+                result.append({'id': pk, 'label': label, 'type': object_type, 'lat': lat, 'lng': lng})
+            return result
+
+
+index = AutocompleteIndex()
+VERSION = 'autocomplete'
+# Общая версия, которой соответствует индекс процесса (None — не загружен)
+_version = None
+_load_lock = threading.Lock()
+
+
+def is_indexed(obj):
+    """В автодополнение попадают только активные объекты (как в поиске)"""
+    return bool(obj.is_active)
+
+
+def get_index():
+    """Индекс автодополнения; строится из БД при первом обращении и после изменений в других процессах"""
+    if _version != versions.current(VERSION):
+        with _load_lock:
+            version = versions.current(VERSION)
+            if _version != version:
+                rebuild(version)
+    return index
+
+
+def rebuild(version=None):
+    """Полностью перестроить индекс по текущему состоянию БД"""
+    global _version
+    from .models import InfrastructureObject
+
+    if version is None:
+        version = versions.current(VERSION)
+    rows = InfrastructureObject.objects.filter(is_active=True).values_list(
+        'id', 'object_id', 'name', 'address', 'object_type', 'lat', 'lng'
+    )
+    with index._lock:
+        index.clear()
+        index.load(rows.iterator(chunk_size=5000))
+        _version = version
+
+
+def invalidate():
+    """Сбросить индекс во всех процессах — он будет перестроен при следующем обращении"""
+    global _version
+    with _load_lock:
+        versions.bump(VERSION)
+        index.clear()
+        _version = None
+
+
+def changed():
+    """Новая версия после изменения объекта; True — применить его к индексу процесса на месте (см. spatial)"""
+    global _version
+    version = versions.bump(VERSION)
+    if _version != version - 1:
+        return False
+    _version = version
+    return True
+
+
+def sync_object(pk, fields, eligible):
+    """Обновить индекс после сохранения объекта; fields — (object_id, name, address, object_type, lat, lng)"""
+    with _load_lock:
+        if not changed():
+            return
+        if eligible:
+            index.insert(pk, *fields)
+        else:
+            index.remove(pk)
+
+
+def remove_object(pk):
+    """Убрать объект из индекса после удаления"""
+    with _load_lock:
+        if changed():
+            index.remove(pk)
@@ -0,0 +1,776 @@
+"""
+Бенчмарки производительности.
+
+Каждый бенчмарк — функция (sizes, stdout) -> list[dict], зарегистрированная
+в BENCHMARKS; поля key определяют строку результата при сравнении запусков.
+Запуск: python manage.py benchmark <name> [--sizes ...] [--output FILE]
+[--compare FILE]
+"""
+
+import random
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.test import Client
+
+from . import geo, spatial
+from .generator import CITY_CENTER
+
+# Разброс точек вокруг центра в градусах (≈ ±35 км)
+CITY_SPREAD = 0.3
+
+BENCHMARKS = {}
+
+
+def benchmark(name, default_sizes, key=('size',)):
+    def decorator(func):
+        func.default_sizes = default_sizes
+        func.key = key
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+
+def random_points(n, seed=42):
+    rnd = random.Random(seed)
+    lat0, lng0 = CITY_CENTER
+    return [
+        (lat0 + rnd.uniform(-CITY_SPREAD, CITY_SPREAD),
+         lng0 + rnd.uniform(-CITY_SPREAD, CITY_SPREAD))
+        for _ in range(n)
+    ]
+
+
+@contextmanager
+def rollback():
+    """Данные, созданные бенчмарком, не сохраняются в БД"""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def create_objects(n, seed=42):
+    """Синтетические объекты в БД (bulk_create, без сигналов)"""
+    from .models import InfrastructureObject
+
+    types = [choice for choice, _ in InfrastructureObject.OBJECT_TYPES]
+    technologies = [choice for choice, _ in InfrastructureObject.TECHNOLOGIES]
+    rnd = random.Random(seed)
+    objects = [
+        InfrastructureObject(
+            object_id=f'BENCH-{i:07d}', name=f'Объект {i}', object_type=rnd.choice(types),
+            technology=rnd.choice(technologies), address=f'ул. Тестовая, {i}',
+            lat=lat, lng=lng, capacity=16, free_ports=rnd.randint(0, 16),
+            technical_notes='Синтетический объект для бенчмарка',
+        )
+        for i, (lat, lng) in enumerate(random_points(n, seed))
+    ]
+    InfrastructureObject.objects.bulk_create(objects, batch_size=2000)
+
+
+def client():
+    return Client(HTTP_HOST='localhost')
+
+
+def timed(func, repeat):
+    """Среднее время вызова func в миллисекундах"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+@benchmark('spatial', default_sizes=[10_000, 100_000, 1_000_000])
+def bench_spatial(sizes, stdout):
+    """check_connection: поиск 10 ближайших в 2 км — полный перебор против индекса"""
+    from .qualification import CONNECTION_RADIUS
+    from .views import calculate_distance
+
+    results = []
+    queries = random_points(200, seed=7)
+    for size in sizes:
+        points = random_points(size)
+        index = spatial.GridIndex()
+        start = time.perf_counter()
+        for pk, (lat, lng) in enumerate(points):
+            index.insert(pk, lat, lng)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        def scan(lat, lng):
+            dists = sorted((calculate_distance(lat, lng, p_lat, p_lng), pk)
+                           for pk, (p_lat, p_lng) in enumerate(points))
+            return [d for d in dists[:10] if d[0] <= CONNECTION_RADIUS]
+
+        scan_queries = queries[:max(1, 2_000_000 // (size * 10))]
+        scan_ms = timed(lambda: [scan(lat, lng) for lat, lng in scan_queries], 1) / len(scan_queries)
+        index_ms = timed(
+            lambda: [index.nearest(lat, lng, CONNECTION_RADIUS) for lat, lng in queries], 1
+        ) / len(queries)
+
+        row = {'size': size, 'build_ms': round(build_ms, 1),
+               'scan_ms': round(scan_ms, 3), 'index_ms': round(index_ms, 3)}
+        stdout.write(f"{size:>9} объектов: перебор {row['scan_ms']:>10.3f} мс, "
+                     f"индекс {row['index_ms']:>7.3f} мс (построение {row['build_ms']:.0f} мс)")
+        results.append(row)
+    return results
+
+
+@benchmark('distance', default_sizes=[10_000, 100_000, 1_000_000])
+def bench_distance(sizes, stdout):
+    """Расстояния до всех точек и 10 ближайших: скалярный цикл против NumPy"""
+    from .views import calculate_distance
+
+    results = []
+    lat, lng = CITY_CENTER
+    for size in sizes:
+        rows = [(pk, p_lat, p_lng) for pk, (p_lat, p_lng) in enumerate(random_points(size))]
+        points = geo.PointSet.from_rows(rows)
+
+        scalar_ms = timed(lambda: sorted(
+            (calculate_distance(lat, lng, p_lat, p_lng), pk) for pk, p_lat, p_lng in rows
+        )[:10], 1)
+        vector_ms = timed(lambda: points.nearest(lat, lng, k=10), 5)
+
+        row = {'size': size, 'scalar_ms': round(scalar_ms, 3), 'vector_ms': round(vector_ms, 3)}
+        stdout.write(f"{size:>9} точек: скалярно {row['scalar_ms']:>10.3f} мс, "
+                     f"NumPy {row['vector_ms']:>8.3f} мс")
+        results.append(row)
+    return results
+
+
+@benchmark('map_payload', default_sizes=[1_000, 10_000])
+def bench_map_payload(sizes, stdout):
+    """map-data: полный сериализатор против format=compact — размер и время ответа"""
+    results = []
+    http = client()
+    for size in sizes:
+        with rollback():
+            create_objects(size)
+            row = {'size': size}
+            for fmt, params in (('full', {}), ('compact', {'format': 'compact'})):
+                response = http.get('/api/map-data/', params)
+                row[f'{fmt}_bytes'] = len(response.content)
+                row[f'{fmt}_ms'] = round(timed(lambda: http.get('/api/map-data/', params), 3), 1)
+        stdout.write(f"{size:>7} объектов: полный {row['full_bytes'] / 1024:>9.1f} КБ / {row['full_ms']:>8.1f} мс, "
+                     f"compact {row['compact_bytes'] / 1024:>7.1f} КБ / {row['compact_ms']:>6.1f} мс")
+        results.append(row)
+    return results
+
+
+@benchmark('autocomplete', default_sizes=[10_000, 100_000, 1_000_000])
+def bench_autocomplete(sizes, stdout):
+    """Автодополнение: время построения индекса и ответа на типичные запросы"""
+    from .autocomplete import AutocompleteIndex
+
+    types = ['olt', 'splitter', 'ats', 'cabinet']
+    streets = ['Ленина', 'Сомони', 'Айни', 'Рудаки', 'Гафурова', 'Камоли Худжанди', 'Турсунзаде', 'Сино']
+    queries = ['худж', 'Khujand', 'ленина 1', 'somoni', 'OLT-00012', 'сплит', 'rudaki 5', 'gafurva']
+    results = []
+    for size in sizes:
+        rnd = random.Random(42)
+        rows = [
+            (i, f'{types[i % 4].upper()}-{i:07d}', f'{types[i % 4].capitalize()} {rnd.choice(streets)} {i % 500}',
+             f'г. Худжанд, ул. {rnd.choice(streets)}, {rnd.randint(1, 200)}', types[i % 4], lat, lng)
+            for i, (lat, lng) in enumerate(random_points(size))
+        ]
+        index = AutocompleteIndex()
+        start = time.perf_counter()
+        index.load(rows)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        query_ms = timed(lambda: [index.search(q) for q in queries], 5) / len(queries)
+        row = {'size': size, 'build_ms': round(build_ms, 1), 'query_ms': round(query_ms, 3)}
+        stdout.write(f"{size:>9} объектов: запрос {row['query_ms']:>7.3f} мс "
+                     f"(построение {row['build_ms']:.0f} мс)")
+        results.append(row)
+    return results
+
+
+def grid_network(routes, seed=42):
+    """Синтетическая сеть-решетка из ≈routes трасс: (id, from, to, length)"""
+    rnd = random.Random(seed)
+    side = max(2, int((routes / 2) ** 0.5))
+    edges = []
+    for row in range(side):
+        for col in range(side):
+            node = row * side + col + 1
+            if col + 1 < side:
+                edges.append((len(edges) + 1, node, node + 1, rnd.randint(50, 500)))
+            if row + 1 < side:
+                edges.append((len(edges) + 1, node, node + side, rnd.randint(50, 500)))
+    return side, edges
+
+
+@benchmark('graph', default_sizes=[10_000, 100_000, 500_000], key=('routes',))
+def bench_graph(sizes, stdout):
+    """Граф трасс: построение CSR, кратчайший путь и 2 независимых пути между дальними узлами"""
+    from .graph import CableGraph
+
+    results = []
+    for size in sizes:
+        side, edges = grid_network(size)
+        start = time.perf_counter()
+        cable_graph = CableGraph(*zip(*edges))
+        build_ms = (time.perf_counter() - start) * 1000
+
+        rnd = random.Random(7)
+        # Пары из противоположных углов решетки — худший случай для Дейкстры
+        pairs = [(rnd.randint(1, side), side * side - rnd.randint(0, side - 1)) for _ in range(3)]
+        shortest_ms = timed(lambda: [cable_graph.shortest_path(a, b) for a, b in pairs], 1) / len(pairs)
+        disjoint_ms = timed(lambda: [cable_graph.disjoint_paths(a, b, 2) for a, b in pairs], 1) / len(pairs)
+
+        row = {'routes': len(edges), 'nodes': len(cable_graph), 'build_ms': round(build_ms, 1),
+               'shortest_ms': round(shortest_ms, 1), 'disjoint_ms': round(disjoint_ms, 1)}
+        stdout.write(f"{row['routes']:>8} трасс: построение {row['build_ms']:>8.1f} мс, "
+                     f"кратчайший {row['shortest_ms']:>8.1f} мс, 2 независимых {row['disjoint_ms']:>8.1f} мс")
+        results.append(row)
+    return results
+
+
+@benchmark('export', default_sizes=[10_000, 100_000, 500_000])
+def bench_export(sizes, stdout):
+    """Потоковая выгрузка объектов: время, объем и пик памяти (tracemalloc) по форматам"""
+    from django.db import reset_queries
+
+    results = []
+    http = client()
+    for size in sizes:
+        with rollback():
+            create_objects(size)
+            row = {'size': size}
+            for fmt in ('geojson', 'ndjson', 'csv'):
+                # Ответ читается порциями и сразу отбрасывается, как при отдаче в сокет
+                def drain():
+                    response = http.get('/api/export/objects/', {'format': fmt})
+                    return sum(len(part) for part in response.streaming_content)
+
+                reset_queries()
+                start = time.perf_counter()
+                row[f'{fmt}_bytes'] = drain()
+                row[f'{fmt}_ms'] = round((time.perf_counter() - start) * 1000, 1)
+                # Пик памяти — отдельным проходом: tracemalloc сильно замедляет код
+                tracemalloc.start()
+                drain()
+                row[f'{fmt}_peak_kb'] = round(tracemalloc.get_traced_memory()[1] / 1024)
+                tracemalloc.stop()
+            stdout.write(f"{size:>7} объектов: " + ", ".join(
+                f"{fmt} {row[f'{fmt}_bytes'] / 2 ** 20:.1f} МБ / {row[f'{fmt}_ms']:.0f} мс / "
+                f"пик {row[f'{fmt}_peak_kb']} КБ" for fmt in ('geojson', 'ndjson', 'csv')
+            ))
+        results.append(row)
+    return results
+
+
+@benchmark('check_batch', default_sizes=[1_000, 5_000, 20_000], key=('points',))
+def bench_check_batch(sizes, stdout):
+    """Пакетная проверка подключения против поштучных запросов check-connection (100 000 объектов)"""
+    from django.db import reset_queries
+
+    results = []
+    http = client()
+    with rollback():
+        create_objects(100_000)
+        spatial.invalidate()
+        for size in sizes:
+            points = [{'lat': lat, 'lng': lng} for lat, lng in random_points(size, seed=7)]
+            reset_queries()
+            start = time.perf_counter()
+            response = http.post('/api/check-connection/batch/', {'points': points}, content_type='application/json')
+            lines = sum(part.count(b'\n') for part in response.streaming_content)
+            batch_ms = (time.perf_counter() - start) * 1000
+            # Поштучно — по выборке из 200 точек
+            sample = points[:200]
+            single_ms = timed(lambda: [http.get('/api/check-connection/', point) for point in sample], 1) / len(sample)
+            row = {'points': size, 'lines': lines, 'batch_ms': round(batch_ms, 1),
+                   'per_point_ms': round(batch_ms / size, 3), 'single_ms': round(single_ms, 2)}
+            stdout.write(f"{size:>6} точек: пакет {row['batch_ms']:>8.0f} мс ({row['per_point_ms']:.3f} мс/точка), "
+                         f"поштучно {row['single_ms']:.2f} мс/точка")
+            results.append(row)
+    spatial.invalidate()
+    return results
+
+
+@benchmark('coverage', default_sizes=[10_000, 100_000])
+def bench_coverage(sizes, stdout):
+    """Растр покрытия: полный пересчет, пересчет окрестности одной точки и PNG-тайл"""
+    from . import coverage, tiles
+
+    results = []
+    for size in sizes:
+        with rollback():
+            create_objects(size)
+            start = time.perf_counter()
+            raster = coverage.build()
+            build_ms = (time.perf_counter() - start) * 1000
+            points = random_points(20, seed=11)
+            update_ms = timed(lambda: [coverage.update(raster, [point]) for point in points], 1) / len(points)
+            tile = [(15, *tiles.tile_for_point(lat, lng, 15)) for lat, lng in points]
+            tile_ms = timed(lambda: [coverage.render_tile(raster, *t) for t in tile], 1) / len(tile)
+            row = {'size': size, 'cells': raster.levels.size, 'raster_kb': round(raster.levels.nbytes / 1024),
+                   'build_ms': round(build_ms), 'update_ms': round(update_ms, 1), 'tile_ms': round(tile_ms, 1)}
+        stdout.write(f"{size:>7} объектов: растр {row['cells']} ячеек ({row['raster_kb']} КБ), "
+                     f"полный пересчет {row['build_ms']} мс, точка {row['update_ms']} мс, тайл {row['tile_ms']} мс")
+        results.append(row)
+    return results
+
+
+@benchmark('thumbnails', default_sizes=[8, 32], key=('photos',))
+def bench_thumbnails(sizes, stdout):
+    """Миниатюры: время на фото 4000×3000 последовательно и в пуле, объем против оригинала"""
+    import shutil
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+    from io import BytesIO
+
+    from django.core.files.base import ContentFile
+    from django.core.files.storage import FileSystemStorage
+    from PIL import Image
+
+    from . import thumbnails
+
+    results = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as media:
+            storage = FileSystemStorage(location=media)
+            rnd = random.Random(size)
+            names = []
+            for i in range(size):
+                # Шум, чтобы JPEG был похож по объему на фотографию
+                noise = Image.effect_noise((4000, 3000), 60).convert('RGB')
+                image = Image.blend(noise, Image.new('RGB', (4000, 3000), (rnd.randrange(256), 90, 60)), 0.5)
+                buffer = BytesIO()
+                image.save(buffer, 'JPEG', quality=90)
+                names.append(storage.save(f'photos/{i}.jpg', ContentFile(buffer.getvalue())))
+            original = sum(storage.size(name) for name in names) / size
+
+            def run(parallel):
+                shutil.rmtree(storage.path(thumbnails.THUMBNAIL_DIR), ignore_errors=True)
+                start = time.perf_counter()
+                if parallel:
+                    with ThreadPoolExecutor(thumbnails.MAX_WORKERS) as pool:
+                        digests = list(pool.map(lambda name: thumbnails.generate(name, storage), names))
+                else:
+                    digests = [thumbnails.generate(name, storage) for name in names]
+                return (time.perf_counter() - start) * 1000 / size, digests
+
+            serial_ms, digests = run(False)
+            pool_ms, _ = run(True)
+            row = {'photos': size, 'original_kb': round(original / 1024), 'serial_ms': round(serial_ms),
+                   'pool_ms': round(pool_ms)}
+            for name in ('small', 'medium'):
+                row[f'{name}_webp_kb'] = round(sum(
+                    storage.size(thumbnails.thumbnail_name(digest, name, 'webp')) for digest in digests
+                ) / size / 1024, 1)
+        stdout.write(f"{size:>3} фото: оригинал {row['original_kb']} КБ, small {row['small_webp_kb']} КБ, "
+                     f"medium {row['medium_webp_kb']} КБ; {row['serial_ms']} мс/фото, "
+                     f"в пуле ({thumbnails.MAX_WORKERS}) {row['pool_ms']} мс/фото")
+        results.append(row)
+    return results
+
+
+# Медленный клиент: столько секунд передает запрос и столько же принимает ответ
+SLOW_CLIENT_S = 0.1
+# Потоков-воркеров WSGI-сервера (gunicorn --threads)
+WSGI_WORKERS = 8
+REQUESTS_PER_CLIENT = 3
+
+
+def latency_row(mode, clients, wall, latencies):
+    latencies = sorted(latencies)
+    return {
+        'mode': mode, 'clients': clients, 'rps': round(len(latencies) / wall, 1),
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95)] * 1000),
+    }
+
+
+def wsgi_load(path, query, clients):
+    """WSGI: каждый запрос, включая прием и отдачу медленному клиенту, занимает воркер"""
+    import io
+    import sys
+    import threading
+
+    from django.core.handlers.wsgi import WSGIHandler
+
+    handler = WSGIHandler()
+    workers = threading.Semaphore(WSGI_WORKERS)
+    latencies = []
+
+    def request():
+        start = time.perf_counter()
+        with workers:
+            time.sleep(SLOW_CLIENT_S)
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+                'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+                'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+            }
+            response = handler(environ, lambda status, headers: None)
+            b''.join(response)
+            response.close()
+            time.sleep(SLOW_CLIENT_S)
+        latencies.append(time.perf_counter() - start)
+
+    def client_loop():
+        for _ in range(REQUESTS_PER_CLIENT):
+            request()
+
+    threads = [threading.Thread(target=client_loop) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, latencies
+
+
+def asgi_load(path, query, clients):
+    """ASGI: медленный клиент ждет в receive/send, не занимая поток"""
+    import asyncio
+
+    from django.core.handlers.asgi import ASGIHandler
+
+    application = ASGIHandler()
+    latencies = []
+
+    async def request():
+        start = time.perf_counter()
+        received = False
+
+        async def receive():
+            nonlocal received
+            if received:
+                # Клиент не отключается до конца ответа
+                await asyncio.Event().wait()
+            received = True
+            await asyncio.sleep(SLOW_CLIENT_S)
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.body' and not message.get('more_body'):
+                await asyncio.sleep(SLOW_CLIENT_S)
+
+        await application({
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'root_path': '',
+            'query_string': query.encode(), 'headers': [(b'host', b'localhost')],
+            'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+        }, receive, send)
+        latencies.append(time.perf_counter() - start)
+
+    async def client_loop():
+        for _ in range(REQUESTS_PER_CLIENT):
+            await request()
+
+    async def run():
+        await asyncio.gather(*(client_loop() for _ in range(clients)))
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    return time.perf_counter() - start, latencies
+
+
+@benchmark('asgi', default_sizes=[10, 50, 200], key=('clients', 'mode'))
+def bench_asgi(sizes, stdout):
+    """
+    map-data (bbox, compact) под нагрузкой медленных клиентов: WSGI с
+    WSGI_WORKERS потоками против ASGI с синхронным и асинхронным view.
+    Данные коммитятся (воркеры читают из своих соединений) и удаляются в конце.
+    """
+    from django.db import connection
+
+    from .models import InfrastructureObject
+
+    lat, lng = CITY_CENTER
+    query = f'bbox={lng - 0.02},{lat - 0.02},{lng + 0.02},{lat + 0.02}&zoom=15&format=compact'
+    modes = (
+        ('wsgi', wsgi_load, '/api/map-data/'),
+        ('asgi', asgi_load, '/api/map-data/'),
+        ('asgi+async', asgi_load, '/api/async/map-data/'),
+    )
+    results = []
+    create_objects(20_000)
+    try:
+        for clients in sizes:
+            for mode, load, path in modes:
+                row = latency_row(mode, clients, *load(path, query, clients))
+                stdout.write(f"{clients:>4} клиентов, {mode:<10}: {row['rps']:>7.1f} запр/с, "
+                             f"p50 {row['p50_ms']:>6} мс, p95 {row['p95_ms']:>6} мс")
+                results.append(row)
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {InfrastructureObject._meta.db_table} WHERE object_id LIKE %s', ['BENCH-%'])
+    return results
+
+
+def sqlite_workload(path, init_command, begin, readers, writers, duration):
+    """
+    readers потоков читают объекты в случайных bbox, writers потоков меняют
+    free_ports (SELECT + UPDATE в транзакции). Возвращает чтения/с, записи/с,
+    p95 чтения и число ошибок "database is locked".
+    """
+    import sqlite3
+    import threading
+
+    stop = time.perf_counter() + duration
+    stats = {'reads': 0, 'writes': 0, 'locked': 0, 'read_latencies': []}
+    lock = threading.Lock()
+
+    def connect():
+        conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        for command in init_command.split(';'):
+            if command.strip():
+                conn.execute(command)
+        return conn
+
+    def reader(seed):
+        conn, rnd, latencies, reads = connect(), random.Random(seed), [], 0
+        while time.perf_counter() < stop:
+            lat, lng = random_points(1, seed=rnd.random())[0]
+            start = time.perf_counter()
+            try:
+                conn.execute(
+                    'SELECT id, lat, lng, free_ports FROM objects WHERE lat BETWEEN ? AND ? AND lng BETWEEN ? AND ?',
+                    (lat - 0.01, lat + 0.01, lng - 0.01, lng + 0.01),
+                ).fetchall()
+            except sqlite3.OperationalError:
+                with lock:
+                    stats['locked'] += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+            reads += 1
+        conn.close()
+        with lock:
+            stats['reads'] += reads
+            stats['read_latencies'] += latencies
+
+    def writer(seed):
+        conn, rnd, writes = connect(), random.Random(seed), 0
+        while time.perf_counter() < stop:
+            pk = rnd.randrange(1, 100_001)
+            try:
+                conn.execute(begin)
+                free_ports = conn.execute('SELECT free_ports FROM objects WHERE id = ?', (pk,)).fetchone()[0]
+                conn.execute('UPDATE objects SET free_ports = ?, updated_at = ? WHERE id = ?',
+                             ((free_ports + 1) % 17, time.time(), pk))
+                conn.execute('COMMIT')
+                writes += 1
+            except sqlite3.OperationalError:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                with lock:
+                    stats['locked'] += 1
+        conn.close()
+        with lock:
+            stats['writes'] += writes
+
+    threads = ([threading.Thread(target=reader, args=(i,)) for i in range(readers)] +
+               [threading.Thread(target=writer, args=(1000 + i,)) for i in range(writers)])
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies = sorted(stats['read_latencies']) or [0]
+    return {
+        'reads_per_s': round(stats['reads'] / duration), 'writes_per_s': round(stats['writes'] / duration),
+        'read_p95_ms': round(latencies[int(len(latencies) * 0.95)] * 1000, 2), 'locked': stats['locked'],
+    }
+
+
+@benchmark('sqlite', default_sizes=[1, 4, 16], key=('readers', 'config'))
+def bench_sqlite(sizes, stdout):
+    """
+    Параллельные чтения (sizes — число читателей) и 2 писателя на копии
+    таблицы объектов (100 000 строк): настройки SQLite по умолчанию против
+    PRAGMA и transaction_mode из settings.DATABASES.
+    """
+    import os
+    import sqlite3
+    import tempfile
+
+    from django.conf import settings
+
+    options = settings.DATABASES['default'].get('OPTIONS', {})
+    configs = (
+        ('default', '', 'BEGIN'),
+        ('tuned', options.get('init_command', ''), f"BEGIN {options.get('transaction_mode') or ''}"),
+    )
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for readers in sizes:
+            for name, init_command, begin in configs:
+                # Свежий файл: journal_mode=WAL сохраняется в самой БД
+                path = os.path.join(directory, f'{name}-{readers}.sqlite3')
+                conn = sqlite3.connect(path)
+                conn.execute('CREATE TABLE objects (id INTEGER PRIMARY KEY, lat REAL, lng REAL, '
+                             'free_ports INTEGER, updated_at REAL)')
+                conn.executemany('INSERT INTO objects (lat, lng, free_ports, updated_at) VALUES (?, ?, 8, 0)',
+                                 random_points(100_000))
+                conn.execute('CREATE INDEX objects_lat_lng ON objects (lat, lng)')
+                conn.commit()
+                conn.close()
+                row = {'readers': readers, 'config': name,
+                       **sqlite_workload(path, init_command, begin, readers, writers=2, duration=3)}
+                stdout.write(f"{readers:>3} читателей, {name:<8}: {row['reads_per_s']:>6} чтений/с "
+                             f"(p95 {row['read_p95_ms']} мс), {row['writes_per_s']:>5} записей/с, "
+                             f"locked: {row['locked']}")
+                results.append(row)
+    return results
+
+
+# Время на замеры одного эндпоинта и пределы числа повторов
+ENDPOINT_BUDGET_S = 3
+ENDPOINT_REPEAT = (5, 50)
+
+
+def endpoint_cases(station_pk):
+    """(название, путь, параметры) — горячие эндпоинты на сгенерированной сети"""
+    lat, lng = CITY_CENTER
+    bbox = f'{lng - 0.01},{lat - 0.01},{lng + 0.01},{lat + 0.01}'
+    return (
+        ('map-data bbox', '/api/map-data/', {'bbox': bbox, 'zoom': 15}),
+        ('map-data compact', '/api/map-data/', {'bbox': bbox, 'zoom': 15, 'format': 'compact'}),
+        ('map-data clusters', '/api/map-data/', {'zoom': 11, 'format': 'compact'}),
+        ('search', '/api/search/', {'q': 'Гагарина'}),
+        ('check-connection', '/api/check-connection/', {'lat': lat, 'lng': lng}),
+        ('stats', '/api/infrastructure/stats/', {}),
+        ('connected-routes', f'/api/infrastructure/{station_pk}/connected-routes/', {}),
+        ('infrastructure list', '/api/infrastructure/', {'object_type': 'olt'}),
+        ('cable-routes list', '/api/cable-routes/', {'cable_type': 'copper'}),
+    )
+
+
+def measure_endpoint(http, path, params):
+    """Первый (холодный) запрос, p50/p95 повторов, число SQL-запросов и пик памяти одного запроса"""
+    from django.db import connection
+
+    start = time.perf_counter()
+    response = http.get(path, params)
+    cold_ms = (time.perf_counter() - start) * 1000
+    assert response.status_code == 200, (path, response.status_code)
+
+    latencies = []
+    deadline = time.perf_counter() + ENDPOINT_BUDGET_S
+    min_repeat, max_repeat = ENDPOINT_REPEAT
+    while len(latencies) < max_repeat and (len(latencies) < min_repeat or time.perf_counter() < deadline):
+        start = time.perf_counter()
+        http.get(path, params)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+
+    # Счетчик через execute_wrapper: журнал connection.queries сбрасывается в начале запроса
+    queries = []
+    with connection.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+        http.get(path, params)
+    # Пик памяти — отдельным запросом: tracemalloc сильно замедляет код
+    tracemalloc.start()
+    http.get(path, params)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'cold_ms': round(cold_ms, 1), 'p50_ms': round(latencies[len(latencies) // 2], 2),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95)], 2), 'repeat': len(latencies),
+        'queries': len(queries), 'peak_kb': round(peak / 1024), 'bytes': len(response.content),
+    }
+
+
+@benchmark('endpoints', default_sizes=[10_000, 100_000], key=('size', 'endpoint'))
+def bench_endpoints(sizes, stdout):
+    """
+    Сквозной замер API на синтетической сети (generator.py): задержка
+    p50/p95, число SQL-запросов, пик памяти и размер ответа по эндпоинтам.
+    """
+    from . import generator
+    from .models import InfrastructureObject
+
+    results = []
+    http = client()
+    for size in sizes:
+        with rollback():
+            start = time.perf_counter()
+            counts = generator.generate(size, prefix='BENCH')
+            stdout.write(f"{counts['objects']} объектов, {counts['routes']} трасс "
+                         f"(генерация {time.perf_counter() - start:.1f} с)")
+            station = InfrastructureObject.objects.filter(object_id='BENCH-OLT-0000001').values_list('pk', flat=True)
+            for endpoint, path, params in endpoint_cases(station.first()):
+                row = {'size': size, 'endpoint': endpoint, **measure_endpoint(http, path, params)}
+                stdout.write(f"  {endpoint:<20} p50 {row['p50_ms']:>8.2f} мс, p95 {row['p95_ms']:>8.2f} мс "
+                             f"(первый {row['cold_ms']:>7.1f} мс), запросов {row['queries']:>3}, "
+                             f"пик {row['peak_kb']:>6} КБ, ответ {row['bytes'] / 1024:>8.1f} КБ")
+                results.append(row)
+        # Индексы в памяти построены по откаченным данным
+        generator.invalidate()
+    return results
+
+
+@benchmark('metrics', default_sizes=[10_000], key=('size', 'endpoint'))
+def bench_metrics(sizes, stdout):
+    """Накладные расходы MetricsMiddleware: медиана времени запроса с метриками и без"""
+    from django.conf import settings
+    from django.test import override_settings
+
+    from . import generator
+
+    plain = [name for name in settings.MIDDLEWARE if name != 'telecom_net.middleware.MetricsMiddleware']
+    with override_settings(MIDDLEWARE=plain):
+        # Клиент собирает цепочку middleware при первом запросе
+        plain_http = client()
+        plain_http.get('/api/infrastructure/stats/')
+    measured_http = client()
+    cases = [case for case in endpoint_cases(None) if case[0] in ('stats', 'check-connection', 'search', 'map-data compact')]
+    results = []
+    for size in sizes:
+        with rollback():
+            generator.generate(size, prefix='BENCH')
+            for endpoint, path, params in cases:
+                latencies = {'plain': [], 'metrics': []}
+                # Поочередно, чтобы фон одинаково влиял на оба варианта
+                for _ in range(200):
+                    for mode, http in (('plain', plain_http), ('metrics', measured_http)):
+                        start = time.perf_counter()
+                        http.get(path, params)
+                        latencies[mode].append((time.perf_counter() - start) * 1000)
+                plain_ms, metrics_ms = (sorted(latencies[mode])[len(latencies[mode]) // 2] for mode in latencies)
+                row = {'size': size, 'endpoint': endpoint, 'plain_ms': round(plain_ms, 3),
+                       'metrics_ms': round(metrics_ms, 3), 'overhead_us': round((metrics_ms - plain_ms) * 1000)}
+                stdout.write(f"{endpoint:<18} без метрик {row['plain_ms']:>7.3f} мс, с метриками "
+                             f"{row['metrics_ms']:>7.3f} мс ({row['overhead_us']:+} мкс)")
+                results.append(row)
+        generator.invalidate()
+    return results
+
+
+@benchmark('pagination', default_sizes=[10_000, 100_000])
+def bench_pagination(sizes, stdout):
+    """Страница списка объектов в начале и в конце: курсор (keyset) против OFFSET"""
+    from .models import InfrastructureObject
+    from .pagination import ObjectPagination
+
+    results = []
+    http = client()
+    page_size = 100
+    for size in sizes:
+        with rollback():
+            create_objects(size)
+            objects = InfrastructureObject.objects.order_by(*ObjectPagination.ordering)
+            deep = size - page_size * 2
+            row = {'size': size}
+            for depth, offset in (('first', 0), ('deep', deep)):
+                keyset = objects
+                if offset:
+                    last = objects[offset - 1]
+                    keyset = objects.filter(ObjectPagination().after([last.object_id, last.pk], reverse=False))
+                row[f'keyset_{depth}_ms'] = round(timed(lambda: list(keyset[:page_size + 1]), 20), 3)
+                row[f'offset_{depth}_ms'] = round(timed(lambda: list(objects[offset:offset + page_size]), 20), 3)
+            # Сквозной запрос: ссылка next глубокой страницы
+            pagination = ObjectPagination()
+            pagination.base_url = f'/api/infrastructure/?page_size={page_size}'
+            url = pagination.encode_cursor(objects[deep - 1], reverse=False)
+            row['api_deep_ms'] = round(timed(lambda: http.get(url), 10), 2)
+            stdout.write(f"{size:>7} объектов: курсор {row['keyset_first_ms']:.2f} → {row['keyset_deep_ms']:.2f} мс, "
+                         f"OFFSET {row['offset_first_ms']:.2f} → {row['offset_deep_ms']:.2f} мс "
+                         f"(API, глубокая страница {row['api_deep_ms']:.1f} мс)")
+            results.append(row)
+    return results
@@ -0,0 +1,423 @@
+"""
+Растр покрытия: доступность подключения и технология на географической сетке.
+
+Каждая ячейка сетки (COVERAGE_CELL_DEG) хранит уровень по правилу
+check_connection для ее центра: до 10 ближайших точек подключения в
+радиусе 2 км, технология по приоритету GPON > ADSL > Ethernet. Уровни
+упорядочены так же, поэтому уровень ячейки — максимум уровней этих точек.
+
+Растр (uint8) хранится в MEDIA_ROOT/coverage/coverage.npz и считается
+фоновым потоком: полностью — командой build_coverage или при первом
+обращении, частично — после изменения точки подключения (пересчитываются
+только ячейки в радиусе 2 км от старого и нового положения, см. signals.py).
+Процессы сверяют версию растра по mtime файла. Частичный пересчет делает
+процесс, изменивший объект, даже если сам растр не читал, — поверх файла.
+Массовые изменения в обход сигналов (импорт, генерация) повышают общую
+версию VERSION (versions.py); растр, построенный при другой версии,
+пересчитывается целиком в первом процессе, который к нему обратится.
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from PIL import Image
+
+from . import versions
+from .qualification import CONNECTION_RADIUS, NEAREST_LIMIT, BatchChecker, Snapshot, degree_margins
+
+logger = logging.getLogger(__name__)
+
+# ≈ 110 м по широте
+COVERAGE_CELL_DEG = 0.001
+
+# Уровни ячейки
+NONE, AVAILABLE, ETHERNET, ADSL, GPON = 0, 1, 2, 3, 4
+LEVEL_TECHNOLOGY = {AVAILABLE: None, ETHERNET: 'Ethernet', ADSL: 'ADSL', GPON: 'GPON'}
+
+# Поля объекта, изменение которых меняет покрытие
+TRACKED_FIELDS = ('lat', 'lng', 'technology', 'free_ports', 'is_active')
+
+VERSION = 'coverage'
+
+COVERAGE_MIN_ZOOM = 8
+COVERAGE_MAX_ZOOM = 19
+TILE_SIZE = 256
+TILE_CACHE_TIMEOUT = 24 * 60 * 60
+# Цвета уровней (RGBA): уровень 0 прозрачный
+PALETTE = {
+    AVAILABLE: (158, 158, 158, 110),
+    ETHERNET: (33, 150, 243, 110),
+    ADSL: (255, 152, 0, 110),
+    GPON: (76, 175, 80, 110),
+}
+
+
+def technology_level(technology):
+    """Уровень точки подключения по ее технологии (как connection_technology)"""
+    if technology == 'gpon':
+        return GPON
+    if technology == 'adsl':
+        return ADSL
+    return ETHERNET if technology else AVAILABLE
+
+
+def raster_path():
+    return Path(settings.MEDIA_ROOT) / 'coverage' / 'coverage.npz'
+
+
+class Raster:
+    """Уровни ячеек levels[row, col]; строка 0 — южная, столбец 0 — западный"""
+
+    def __init__(self, south, west, levels, cell=COVERAGE_CELL_DEG, built_at=0.0, synced_at=None, marker=None,
+                 version=None):
+        self.south = south
+        self.west = west
+        self.levels = levels
+        self.cell = cell
+        # Начало последнего полного пересчета (unix time)
+        self.built_at = built_at
+        # Изменения объектов до этого момента внесены — полным или частичным пересчетом
+        self.synced_at = built_at if synced_at is None else synced_at
+        # Общая версия VERSION на начало полного пересчета (None — неизвестна)
+        self.marker = marker
+        # mtime_ns файла, из которого растр прочитан или в который записан
+        self.version = version
+
+    @property
+    def shape(self):
+        return self.levels.shape
+
+    @classmethod
+    def empty_for(cls, min_lat, max_lat, min_lng, max_lng, radius=CONNECTION_RADIUS, cell=COVERAGE_CELL_DEG):
+        """Пустой растр на прямоугольник с запасом radius (м), выровненный по сетке"""
+        dlat, dlng = degree_margins(max(abs(min_lat), abs(max_lat)), radius)
+        south = math.floor((min_lat - dlat) / cell) * cell
+        west = math.floor((min_lng - dlng) / cell) * cell
+        rows = math.ceil((max_lat + dlat - south) / cell)
+        cols = math.ceil((max_lng + dlng - west) / cell)
+        return cls(south, west, np.zeros((rows, cols), dtype=np.uint8), cell)
+
+    def centers(self, rows, cols):
+        """Координаты центров ячеек срезов rows × cols: плоские массивы lats, lngs"""
+        lats = self.south + (np.arange(rows.start, rows.stop) + 0.5) * self.cell
+        lngs = self.west + (np.arange(cols.start, cols.stop) + 0.5) * self.cell
+        grid_lats, grid_lngs = np.meshgrid(lats, lngs, indexing='ij')
+        return grid_lats.ravel(), grid_lngs.ravel()
+
+    def window(self, lat, lng, radius=CONNECTION_RADIUS):
+        """Срезы (rows, cols) ячеек в квадрате radius (м) вокруг точки; None — вне растра"""
+        dlat, dlng = degree_margins(lat, radius)
+        rows = slice(max(0, math.floor((lat - dlat - self.south) / self.cell)),
+                     min(self.shape[0], math.ceil((lat + dlat - self.south) / self.cell)))
+        cols = slice(max(0, math.floor((lng - dlng - self.west) / self.cell)),
+                     min(self.shape[1], math.ceil((lng + dlng - self.west) / self.cell)))
+        if rows.start >= rows.stop or cols.start >= cols.stop:
+            return None
+        return rows, cols
+
+    def covers(self, lat, lng, radius=CONNECTION_RADIUS):
+        """Квадрат radius вокруг точки целиком внутри растра"""
+        dlat, dlng = degree_margins(lat, radius)
+        return (self.south <= lat - dlat and lat + dlat <= self.south + self.shape[0] * self.cell
+                and self.west <= lng - dlng and lng + dlng <= self.west + self.shape[1] * self.cell)
+
+    def compute(self, rows, cols):
+        """Пересчитать ячейки срезов rows × cols по текущему состоянию БД"""
+        lats, lngs = self.centers(rows, cols)
+        snapshot = Snapshot.load(lats, lngs, CONNECTION_RADIUS)
+        levels = np.zeros(len(lats), dtype=np.uint8)
+        if len(snapshot):
+            point_levels = np.array([technology_level(card['technology']) for card in snapshot.cards], dtype=np.uint8)
+            checker = BatchChecker(snapshot, CONNECTION_RADIUS, CONNECTION_RADIUS, NEAREST_LIMIT)
+            for block, nearest, distances in checker.nearest(lats, lngs):
+                in_range = distances <= CONNECTION_RADIUS
+                levels[block] = np.where(in_range, point_levels[nearest], NONE).max(axis=1)
+        self.levels[rows, cols] = levels.reshape(rows.stop - rows.start, cols.stop - cols.start)
+
+    def sample(self, lats, lngs):
+        """Уровни в точках (массивы любой формы); вне растра — NONE"""
+        rows = np.floor((lats - self.south) / self.cell).astype(np.int64)
+        cols = np.floor((lngs - self.west) / self.cell).astype(np.int64)
+        inside = (rows >= 0) & (rows < self.shape[0]) & (cols >= 0) & (cols < self.shape[1])
+        result = np.zeros(np.shape(lats), dtype=np.uint8)
+        result[inside] = self.levels[rows[inside], cols[inside]]
+        return result
+
+    def save(self, path):
+        """Атомарная запись: файл заменяется целиком"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f'{path.stem}.{os.getpid()}.{threading.get_ident()}.tmp.npz')
+        marker = -1 if self.marker is None else self.marker
+        np.savez_compressed(tmp, levels=self.levels,
+                            origin=np.array([self.south, self.west, self.cell, self.built_at, self.synced_at, marker]))
+        os.replace(tmp, path)
+        self.version = path.stat().st_mtime_ns
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            origin = data['origin'].tolist()
+            levels = data['levels']
+        south, west, cell, built_at = origin[:4]
+        # В файлах прежнего формата нет synced_at и marker — такой растр пересчитается целиком
+        synced_at = origin[4] if len(origin) > 4 else built_at
+        marker = int(origin[5]) if len(origin) > 5 and origin[5] >= 0 else None
+        return cls(south, west, levels, cell, built_at, synced_at, marker, version=path.stat().st_mtime_ns)
+
+    def is_stale(self):
+        """Объекты менялись после последнего пересчета (например, пока процесс не работал)"""
+        from .models import DeletionLog, InfrastructureObject
+
+        since = datetime.fromtimestamp(self.synced_at, tz=timezone.utc)
+        return (InfrastructureObject.objects.filter(updated_at__gt=since).exists()
+                or DeletionLog.objects.filter(model='object', deleted_at__gt=since).exists())
+
+
+def build():
+    """Полный растр по всем точкам подключения (None, если их нет)"""
+    from django.db.models import Max, Min
+
+    from .models import InfrastructureObject
+
+    extent = InfrastructureObject.objects.filter(is_active=True, free_ports__gt=0).aggregate(
+        min_lat=Min('lat'), max_lat=Max('lat'), min_lng=Min('lng'), max_lng=Max('lng')
+    )
+    if extent['min_lat'] is None:
+        return None
+    started = time.time()
+    marker = versions.current(VERSION)
+    raster = Raster.empty_for(extent['min_lat'], extent['max_lat'], extent['min_lng'], extent['max_lng'])
+    raster.built_at = raster.synced_at = started
+    raster.marker = marker
+    raster.compute(slice(0, raster.shape[0]), slice(0, raster.shape[1]))
+    return raster
+
+
+def update(raster, points):
+    """
+    Пересчитать ячейки вокруг точек (lat, lng). False, если точка выходит
+    за растр — тогда нужен полный пересчет.
+    """
+    for lat, lng in points:
+        if not raster.covers(lat, lng):
+            return False
+    for lat, lng in points:
+        window = raster.window(lat, lng)
+        if window is not None:
+            raster.compute(*window)
+    return True
+
+
+_raster = None
+_lock = threading.Lock()
+# Ожидающие пересчета точки и время запроса полного пересчета (None — не нужен)
+_pending = []
+_rebuild = None
+# Версия VERSION, для которой этот процесс уже запросил полный пересчет
+_requested = None
+_worker = None
+
+
+def background():
+    """Пересчет в фоновом потоке; COVERAGE_BACKGROUND = False — сразу в вызывающем (тесты)"""
+    return getattr(settings, 'COVERAGE_BACKGROUND', True)
+
+
+def file_version(path):
+    """mtime_ns файла растра (None — файла нет)"""
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def get_raster():
+    """
+    Растр из файла (перечитывается, если файл обновил другой процесс).
+    None, если растра еще нет — тогда запускается его построение.
+    """
+    global _raster
+    path = raster_path()
+    if not path.exists():
+        if _worker is None:
+            schedule(rebuild=True)
+        if not path.exists():
+            return None
+    mtime = path.stat().st_mtime_ns
+    raster = _raster
+    if raster is None or raster.version != mtime:
+        with _lock:
+            first = _raster is None
+            if _raster is None or _raster.version != mtime:
+                _raster = Raster.load(path)
+            raster = _raster
+        # Первая загрузка в процессе: изменения без сигналов этого процесса
+        # (другой процесс, перезапуск) — полный пересчет, пока отдается старый
+        if first and raster.is_stale():
+            schedule(rebuild=True)
+            raster = _raster
+    # Массовое изменение после полного пересчета — в том числе в другом процессе
+    marker = versions.current(VERSION)
+    if raster.marker != marker and _requested != marker:
+        request_rebuild(marker)
+        raster = _raster
+    return raster
+
+
+def is_tracked():
+    """Растр загружен в этом процессе — изменения объектов нужно в него вносить"""
+    return _raster is not None
+
+
+def run_pending():
+    """Выполнить накопленные пересчеты в текущем потоке"""
+    global _raster, _pending, _rebuild
+    while True:
+        with _lock:
+            points, rebuild, _pending, _rebuild = _pending, _rebuild, [], None
+            raster = _raster
+        if not points and rebuild is None:
+            return
+        path = raster_path()
+        started = time.time()
+        while True:
+            # Файл мог обновить другой процесс — пересчет поверх свежей версии
+            if path.exists() and (raster is None or raster.version != file_version(path)):
+                raster = Raster.load(path)
+            # Полный пересчет, начатый после запроса, мог уже выполнить другой процесс
+            full = rebuild is not None and (raster is None or raster.built_at < rebuild)
+            if not full and raster is not None and not points:
+                break
+            if full or raster is None or not update(raster, points):
+                raster = build()
+            else:
+                raster.synced_at = max(raster.synced_at, started)
+                # Другой процесс записал файл во время пересчета — повторить поверх его версии
+                if file_version(path) not in (None, raster.version):
+                    continue
+            if raster is None:
+                # Точек подключения нет — нет и покрытия
+                path.unlink(missing_ok=True)
+            else:
+                raster.save(path)
+            break
+        with _lock:
+            _raster = raster
+
+
+def _work():
+    global _worker
+    try:
+        run_pending()
+    except Exception:
+        logger.exception('Ошибка пересчета растра покрытия')
+    finally:
+        close_old_connections()
+        with _lock:
+            _worker = None
+            restart = bool(_pending) or _rebuild is not None
+        if restart:
+            schedule()
+
+
+def schedule(points=(), rebuild=False):
+    """Поставить в очередь пересчет ячеек вокруг points (lat, lng) или всего растра"""
+    global _rebuild, _worker
+    worker = None
+    with _lock:
+        _pending.extend(points)
+        if rebuild and _rebuild is None:
+            _rebuild = time.time()
+        if background() and _worker is None:
+            worker = _worker = threading.Thread(target=_work, name='coverage', daemon=True)
+    if not background():
+        run_pending()
+    elif worker is not None:
+        worker.start()
+
+
+def request_rebuild(marker):
+    """Полный пересчет для версии marker — не больше одного на версию в процессе"""
+    global _requested
+    _requested = marker
+    schedule(rebuild=True)
+
+
+def reset():
+    """Забыть растр процесса и очередь (тесты)"""
+    global _raster, _pending, _rebuild, _requested
+    with _lock:
+        _raster, _pending, _rebuild, _requested = None, [], None, None
+
+
+def invalidate():
+    """Массовое изменение объектов в обход сигналов: полный пересчет растра во всех процессах"""
+    marker = versions.bump(VERSION)
+    if is_tracked():
+        request_rebuild(marker)
+
+
+def objects_changed(points):
+    """Точки подключения около points изменились: пересчитать их окрестность в растре процесса или в файле"""
+    if is_tracked() or raster_path().exists():
+        schedule(points)
+
+
+# ---------------------------
+#        PNG-тайлы
+# ---------------------------
+
+def is_valid_tile(z, x, y):
+    return COVERAGE_MIN_ZOOM <= z <= COVERAGE_MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def render_tile(raster, z, x, y):
+    """PNG тайла z/x/y: центры пикселей Web Mercator -> уровни растра -> палитра"""
+    n = 2 ** z
+    pixels = (np.arange(TILE_SIZE) + 0.5) / TILE_SIZE
+    lngs = (x + pixels) / n * 360.0 - 180.0
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + pixels) / n))))
+    grid_lats, grid_lngs = np.meshgrid(lats, lngs, indexing='ij')
+    levels = raster.sample(grid_lats, grid_lngs) if raster is not None else np.zeros((TILE_SIZE, TILE_SIZE), np.uint8)
+
+    image = Image.frombytes('P', (TILE_SIZE, TILE_SIZE), np.ascontiguousarray(levels).tobytes())
+    palette, alpha = [0, 0, 0], [0]
+    for level in range(1, max(PALETTE) + 1):
+        r, g, b, a = PALETTE[level]
+        palette += [r, g, b]
+        alpha.append(a)
+    image.putpalette(palette)
+    buffer = BytesIO()
+    image.save(buffer, format='PNG', transparency=bytes(alpha), optimize=True)
+    return buffer.getvalue()
+
+
+def get_tile(z, x, y):
+    """PNG тайла из кэша (ключ — по версии растра)"""
+    raster = get_raster()
+    if raster is None:
+        return render_tile(None, z, x, y)
+    key = f'coverage:{raster.version}:{z}:{x}:{y}'
+    content = cache.get(key)
+    if content is None:
+        content = render_tile(raster, z, x, y)
+        cache.set(key, content, TILE_CACHE_TIMEOUT)
+    return content
+
+
+def level_at(lat, lng):
+    """Уровень покрытия в точке по растру (None, если растра еще нет)"""
+    raster = get_raster()
+    if raster is None:
+        return None
+    return int(raster.sample(np.array([lat]), np.array([lng]))[0])
@@ -0,0 +1,68 @@
+"""
+Чтение горячих эндпоинтов с реплики.
+
+Если в DATABASES есть псевдоним REPLICA (см. DB_READ_REPLICA в settings),
+views, помеченные read_from_replica, читают из него: это соединение только
+на чтение к тому же файлу или к копии БД. Запись и все остальные запросы
+идут в default. Признак хранится в contextvar, поэтому действует и в
+асинхронных views, и в потоках sync_to_async.
+"""
+
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA = 'replica'
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replica_available():
+    return REPLICA in connections.settings
+
+
+@contextmanager
+def replica_reads():
+    """Чтения внутри блока идут в реплику (если она настроена)"""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def read_from_replica(view):
+    """Декоратор view: все чтения ORM внутри — из реплики"""
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(*args, **kwargs):
+            with replica_reads():
+                return await view(*args, **kwargs)
+    else:
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with replica_reads():
+                return view(*args, **kwargs)
+    return wrapper
+
+
+class ReadReplicaRouter:
+    """Чтения из read_from_replica-views — в REPLICA, остальное — в default"""
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and replica_available():
+            return REPLICA
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика — те же данные, связи между записями из разных псевдонимов допустимы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,120 @@
+"""
+Потоковый экспорт объектов и трасс: GeoJSON FeatureCollection, NDJSON
+(по одной Feature на строку) и CSV.
+
+Строки читаются из БД через values() и .iterator(chunk_size), сразу
+превращаются в текст и отдаются порциями — в памяти не больше одной
+пачки, независимо от размера сети. Колонки CSV совпадают с форматом
+импорта (importer.py): ссылки на объекты — через object_id.
+"""
+
+import csv
+import json
+from itertools import islice
+
+from .filters import filter_objects, filter_routes
+from .models import CableRoute, InfrastructureObject
+
+FORMATS = {
+    'geojson': 'application/geo+json',
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+KINDS = ('objects', 'routes')
+
+CHUNK_SIZE = 2000
+# Строк в одной порции ответа
+ROWS_PER_PART = 500
+
+# Колонка выгрузки -> поле values()
+OBJECT_COLUMNS = {
+    'id': 'id', 'object_id': 'object_id', 'object_type': 'object_type', 'name': 'name',
+    'address': 'address', 'lat': 'lat', 'lng': 'lng', 'technology': 'technology',
+    'capacity': 'capacity', 'free_ports': 'free_ports', 'status': 'status', 'is_active': 'is_active',
+    'parent': 'parent__object_id', 'technical_notes': 'technical_notes', 'notes': 'notes',
+}
+ROUTE_COLUMNS = {
+    'id': 'id', 'name': 'name', 'from_object': 'from_object__object_id', 'to_object': 'to_object__object_id',
+    'cable_type': 'cable_type', 'route_type': 'route_type', 'length': 'length',
+    'fiber_count': 'fiber_count', 'is_active': 'is_active',
+    'installation_notes': 'installation_notes', 'notes': 'notes',
+}
+ROUTE_GEOMETRY = ('from_object__lat', 'from_object__lng', 'to_object__lat', 'to_object__lng')
+
+
+def object_rows(params):
+    queryset = filter_objects(InfrastructureObject.objects.all(), params).order_by('id')
+    for row in queryset.values_list(*OBJECT_COLUMNS.values()).iterator(chunk_size=CHUNK_SIZE):
+        properties = dict(zip(OBJECT_COLUMNS, row))
+        geometry = {'type': 'Point', 'coordinates': [properties['lng'], properties['lat']]}
+        yield properties, geometry
+
+
+def route_rows(params):
+    queryset = filter_routes(CableRoute.objects.all(), params).order_by('id')
+    fields = (*ROUTE_COLUMNS.values(), *ROUTE_GEOMETRY)
+    for row in queryset.values_list(*fields).iterator(chunk_size=CHUNK_SIZE):
+        properties = dict(zip(ROUTE_COLUMNS, row))
+        from_lat, from_lng, to_lat, to_lng = row[len(ROUTE_COLUMNS):]
+        geometry = {'type': 'LineString', 'coordinates': [[from_lng, from_lat], [to_lng, to_lat]]}
+        yield properties, geometry
+
+
+def feature(properties, geometry):
+    return json.dumps(
+        {'type': 'Feature', 'id': properties['id'], 'geometry': geometry, 'properties': properties},
+        ensure_ascii=False,
+    )
+
+
+def geojson_lines(rows):
+    yield '{"type": "FeatureCollection", "features": [\n'
+    separator = ''
+    for properties, geometry in rows:
+        yield separator + feature(properties, geometry)
+        separator = ',\n'
+    yield '\n]}\n'
+
+
+def ndjson_lines(rows):
+    for properties, geometry in rows:
+        yield feature(properties, geometry) + '\n'
+
+
+class LineBuffer:
+    """Файлоподобный объект для csv.writer: write возвращает строку"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows, columns):
+    writer = csv.writer(LineBuffer())
+    yield writer.writerow(columns)
+    for properties, _ in rows:
+        yield writer.writerow([properties[column] for column in columns])
+
+
+def export_lines(kind, fmt, params):
+    """Строки выгрузки kind (objects/routes) в формате fmt с фильтрами params"""
+    if kind not in KINDS:
+        raise ValueError(f'kind должен быть одним из: {", ".join(KINDS)}')
+    if fmt not in FORMATS:
+        raise ValueError(f'Формат должен быть одним из: {", ".join(FORMATS)}')
+    rows = object_rows(params) if kind == 'objects' else route_rows(params)
+    if fmt == 'geojson':
+        return geojson_lines(rows)
+    if fmt == 'ndjson':
+        return ndjson_lines(rows)
+    return csv_lines(rows, list(OBJECT_COLUMNS if kind == 'objects' else ROUTE_COLUMNS))
+
+
+def batched(lines, rows_per_part=ROWS_PER_PART):
+    """Склеить строки в порции по rows_per_part (меньше мелких записей в сокет)"""
+    while part := ''.join(islice(lines, rows_per_part)):
+        yield part
+
+
+def export_parts(kind, fmt, params, rows_per_part=ROWS_PER_PART):
+    """Порции выгрузки; ValueError сразу, до начала потока"""
+    return batched(export_lines(kind, fmt, params), rows_per_part)
@@ -0,0 +1,70 @@
+"""
+Фильтры списков объектов и трасс по параметрам запроса.
+
+Общие для viewset'ов и экспорта (export.py): params — любой словарь
+параметров (request.query_params, request.GET или опции команды).
+"""
+
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from . import fulltext
+
+
+def filter_objects(queryset, params):
+    # Фильтрация по типу объекта
+    object_type = params.get('object_type')
+    if object_type:
+        queryset = queryset.filter(object_type=object_type)
+    
+    # Фильтрация по технологии
+    technology = params.get('technology')
+    if technology:
+        queryset = queryset.filter(technology=technology)
+    
+    # Фильтрация по статусу
+    status = params.get('status')
+    if status:
+        queryset = queryset.filter(status=status)
+    
+    # Фильтрация по активности
+    is_active = params.get('is_active')
+    if is_active is not None:
+        queryset = queryset.filter(is_active=is_active.lower() == 'true')
+    
+    # Поиск
+    search = params.get('search')
+    if search and fulltext.is_available():
+        expression = fulltext.match_expression(search)
+        if expression is None:
+            return queryset.none()
+        queryset = queryset.filter(id__in=RawSQL(*fulltext.match_subquery('object', expression)))
+    elif search:
+        queryset = queryset.filter(
+            Q(object_id__icontains=search) |
+            Q(name__icontains=search) |
+            Q(address__icontains=search) |
+            Q(technical_notes__icontains=search) |
+            Q(notes__icontains=search)
+        )
+    
+    return queryset
+
+
+def filter_routes(queryset, params):
+    # Фильтрация по типу кабеля
+    cable_type = params.get('cable_type')
+    if cable_type:
+        queryset = queryset.filter(cable_type=cable_type)
+    
+    # Фильтрация по типу прокладки
+    route_type = params.get('route_type')
+    if route_type:
+        queryset = queryset.filter(route_type=route_type)
+    
+    # Фильтрация по активности
+    is_active = params.get('is_active')
+    if is_active is not None:
+        queryset = queryset.filter(is_active=is_active.lower() == 'true')
+    
+    return queryset
@@ -0,0 +1,106 @@
+"""
+Полнотекстовый поиск на SQLite FTS5.
+
+Таблицы telecom_net_object_fts и telecom_net_route_fts — external content
+индексы над текстовыми полями объектов и трасс. Их синхронизируют триггеры
+SQLite (миграция 0007), поэтому изменения через ORM, админку и bulk-операции
+попадают в индекс в той же транзакции. Токенизатор unicode61 сам приводит
+кириллицу и латиницу к нижнему регистру и снимает диакритику.
+
+На других СУБД FTS недоступен — вызывающий код использует icontains.
+"""
+
+import re
+
+from django.db import connection, connections, router
+
+TOKENIZE = "unicode61 remove_diacritics 2"
+
+OBJECT_FTS_TABLE = 'telecom_net_object_fts'
+OBJECT_FTS_COLUMNS = ('object_id', 'name', 'address', 'technical_notes', 'notes')
+# Веса bm25 в порядке OBJECT_FTS_COLUMNS: совпадение в ID и названии важнее
+OBJECT_FTS_WEIGHTS = (10.0, 5.0, 3.0, 1.0, 1.0)
+
+ROUTE_FTS_TABLE = 'telecom_net_route_fts'
+ROUTE_FTS_COLUMNS = ('name', 'installation_notes', 'notes')
+ROUTE_FTS_WEIGHTS = (5.0, 1.0, 1.0)
+
+INDEXES = {
+    'object': (OBJECT_FTS_TABLE, 'telecom_net_infrastructureobject', OBJECT_FTS_COLUMNS, OBJECT_FTS_WEIGHTS),
+    'route': (ROUTE_FTS_TABLE, 'telecom_net_cableroute', ROUTE_FTS_COLUMNS, ROUTE_FTS_WEIGHTS),
+}
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(query, columns=None):
+    """
+    Выражение MATCH из пользовательского запроса: каждое слово — префиксный
+    поиск ("слово"*), все слова обязательны. None, если слов нет.
+    """
+    tokens = TOKEN_RE.findall(query)
+    if not tokens:
+        return None
+    expression = ' '.join(f'"{token}"*' for token in tokens)
+    if columns:
+        expression = '{%s} : (%s)' % (' '.join(columns), expression)
+    return expression
+
+
+def match_subquery(kind, expression):
+    """SQL и параметры подзапроса rowid, совпавших с expression (для RawSQL / id__in)"""
+    table = INDEXES[kind][0]
+    return f'SELECT rowid FROM {table} WHERE {table} MATCH %s', [expression]
+
+
+def search(kind, expression, limit):
+    """
+    Ранжированный поиск по активным записям: (список id по релевантности,
+    общее число совпадений). Общее число считается оконной функцией в том же
+    запросе, без отдельного COUNT.
+    """
+    table, content_table, _, weights = INDEXES[kind]
+    rank = 'bm25({table}, {weights})'.format(table=table, weights=', '.join(map(str, weights)))
+    # bm25 нельзя вызвать в запросе с оконной функцией — ранг считается в CTE
+    sql = (
+        f'WITH hits AS (SELECT c.id, {rank} AS score FROM {table} '
+        f'JOIN {content_table} c ON c.id = {table}.rowid '
+        f'WHERE {table} MATCH %s AND c.is_active) '
+        f'SELECT id, count(*) OVER () FROM hits ORDER BY score, id LIMIT %s'
+    )
+    # Сырой SQL не привязан к модели — псевдоним для чтения берется у роутера (реплика)
+    with connections[router.db_for_read(None)].cursor() as cursor:
+        cursor.execute(sql, [expression, limit])
+        rows = cursor.fetchall()
+    return [row[0] for row in rows], (rows[0][1] if rows else 0)
+
+
+def create_sql(kind):
+    """DDL индекса и триггеров синхронизации для kind ('object' / 'route')"""
+    table, content_table, columns, _ = INDEXES[kind]
+    cols = ', '.join(columns)
+    new_cols = ', '.join(f'new.{col}' for col in columns)
+    old_cols = ', '.join(f'old.{col}' for col in columns)
+    return [
+        f"CREATE VIRTUAL TABLE {table} USING fts5({cols}, content='{content_table}', "
+        f"content_rowid='id', tokenize='{TOKENIZE}')",
+        f"CREATE TRIGGER {table}_ai AFTER INSERT ON {content_table} BEGIN "
+        f"INSERT INTO {table}(rowid, {cols}) VALUES (new.id, {new_cols}); END",
+        f"CREATE TRIGGER {table}_ad AFTER DELETE ON {content_table} BEGIN "
+        f"INSERT INTO {table}({table}, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); END",
+        f"CREATE TRIGGER {table}_au AFTER UPDATE ON {content_table} BEGIN "
+        f"INSERT INTO {table}({table}, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); "
+        f"INSERT INTO {table}(rowid, {cols}) VALUES (new.id, {new_cols}); END",
+        f"INSERT INTO {table}({table}) VALUES ('rebuild')",
+    ]
+
+
+def drop_sql(kind):
+    table = INDEXES[kind][0]
+    return [f'DROP TRIGGER IF EXISTS {table}_{suffix}' for suffix in ('ai', 'ad', 'au')] + [
+        f'DROP TABLE IF EXISTS {table}',
+    ]
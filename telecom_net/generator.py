@@ -0,0 +1,226 @@
+"""
+Синтетическая сеть для замеров на реалистичном объеме данных.
+
+Топология — деревья по parent: станция (OLT, АТС или коммутатор) →
+сплиттер-боксы → дома → клиентские точки. Станции разбросаны по районам
+вокруг центра города, каждый следующий уровень — нормальным разбросом
+вокруг родителя, поэтому точки сгущаются в кварталы. Каждая связь
+родитель → потомок — кабельная трасса длиной «по улицам» (расстояние ×
+ROAD_FACTOR); у станций и сплиттеров есть записи истории.
+
+Запись — bulk_create по STATIONS_PER_BATCH станций в транзакции, сигналы
+не вызываются, поэтому в конце производные структуры сбрасываются во
+всех процессах (общие версии, versions.py) и статистика пересобирается,
+как после импорта (importer.py).
+"""
+
+import random
+from datetime import date, timedelta
+
+import numpy as np
+from django.db import connection, reset_queries, transaction
+
+from . import autocomplete, coverage, geo, graph, impact, spatial, stats, tiles
+from .models import CableRoute, DeletionLog, InfrastructureObject, ObjectHistory
+
+# Центр синтетических данных — Худжанд (как центр карты в map.html)
+CITY_CENTER = (40.291, 69.622)
+DEFAULT_PREFIX = 'GEN'
+
+# Станция: (тип, технология, доля станций)
+STATIONS = (('olt', 'gpon', 0.8), ('ats', 'adsl', 0.1), ('switch', 'ethernet', 0.1))
+SPLITTERS_PER_STATION = 16
+BUILDINGS_PER_SPLITTER = 8
+CLIENTS_PER_BUILDING = (1, 6)
+# Средний размер дерева одной станции
+OBJECTS_PER_STATION = 1 + SPLITTERS_PER_STATION * (1 + BUILDINGS_PER_SPLITTER * (1 + sum(CLIENTS_PER_BUILDING) / 2))
+
+# Разброс координат относительно родителя (градусы): район ≈ 7 км, сплиттер ≈ 600 м,
+# дом ≈ 150 м, клиент ≈ 20 м
+DISTRICT_SPREAD = 0.06
+SPLITTER_SPREAD = 0.006
+BUILDING_SPREAD = 0.0015
+CLIENT_SPREAD = 0.0002
+# Кабель идет по улицам, а не по прямой
+ROAD_FACTOR = 1.3
+
+# Статусы: (status, is_active, доля)
+STATUSES = (('active', True, 0.92), ('maintenance', True, 0.03), ('planned', True, 0.03), ('inactive', False, 0.02))
+# Записей истории на станцию или сплиттер (кроме записи о создании)
+HISTORY_PER_OBJECT = (0, 3)
+STATIONS_PER_BATCH = 8
+
+STREETS = (
+    'ул. Ленина', 'пр. Исмоили Сомони', 'ул. Камоли Худжанди', 'ул. Гагарина', 'ул. Сырдарьинская',
+    'ул. Мирзо Турсунзаде', 'ул. Шарафа Рашидова', 'ул. Бободжона Гафурова', 'ул. Айни', '12 мкр.', '20 мкр.',
+)
+TECHNICIANS = ('Каримов А.', 'Рахимов Б.', 'Назаров Д.', 'Юсупов Ф.', 'Саидов Р.')
+TYPE_CODES = {'olt': 'OLT', 'ats': 'ATS', 'switch': 'SW', 'splitter': 'SPL', 'building': 'BLD', 'client': 'CL'}
+
+
+class Generator:
+    def __init__(self, seed, prefix):
+        self.rnd = random.Random(seed)
+        self.prefix = prefix
+        self.counters = dict.fromkeys(TYPE_CODES, 0)
+        self.counts = {'objects': 0, 'routes': 0, 'history': 0}
+
+    def object_id(self, object_type):
+        self.counters[object_type] += 1
+        return f'{self.prefix}-{TYPE_CODES[object_type]}-{self.counters[object_type]:07d}'
+
+    def status(self):
+        status, is_active, _ = self.rnd.choices(STATUSES, weights=[share for *_, share in STATUSES])[0]
+        return status, is_active
+
+    def around(self, lat, lng, spread):
+        return lat + self.rnd.gauss(0, spread), lng + self.rnd.gauss(0, spread)
+
+    def new_object(self, object_type, technology, lat, lng, parent=None, capacity=0, used=0):
+        status, is_active = self.status()
+        object_id = self.object_id(object_type)
+        installed = date.today() - timedelta(days=self.rnd.randint(30, 3650))
+        return InfrastructureObject(
+            object_id=object_id, object_type=object_type, technology=technology,
+            name=f'{dict(InfrastructureObject.OBJECT_TYPES)[object_type]} {object_id}',
+            address=f'{self.rnd.choice(STREETS)}, {self.rnd.randint(1, 120)}',
+            lat=round(lat, 6), lng=round(lng, 6), parent=parent,
+            capacity=capacity, free_ports=max(capacity - used, 0) if is_active else 0,
+            status=status, is_active=is_active, installation_date=installed,
+            technical_notes=f'Синтетический объект, установлен {installed:%d.%m.%Y}',
+        )
+
+    def stations(self, count):
+        """Деревья count станций: объекты по уровням (станции, сплиттеры, дома, клиенты)"""
+        levels = [[], [], [], []]
+        kinds = self.rnd.choices(STATIONS, weights=[share for *_, share in STATIONS], k=count)
+        for object_type, technology, _ in kinds:
+            station = self.new_object(object_type, technology, *self.around(*CITY_CENTER, DISTRICT_SPREAD),
+                                      capacity=SPLITTERS_PER_STATION * 2, used=SPLITTERS_PER_STATION)
+            levels[0].append(station)
+            for _ in range(SPLITTERS_PER_STATION):
+                clients = [self.rnd.randint(*CLIENTS_PER_BUILDING) for _ in range(BUILDINGS_PER_SPLITTER)]
+                splitter = self.new_object('splitter', technology, *self.around(station.lat, station.lng, SPLITTER_SPREAD),
+                                           parent=station, capacity=32, used=sum(clients))
+                levels[1].append(splitter)
+                for building_clients in clients:
+                    building = self.new_object('building', technology,
+                                               *self.around(splitter.lat, splitter.lng, BUILDING_SPREAD),
+                                               parent=splitter, capacity=8, used=building_clients)
+                    levels[2].append(building)
+                    for _ in range(building_clients):
+                        levels[3].append(self.new_object(
+                            'client', technology, *self.around(building.lat, building.lng, CLIENT_SPREAD),
+                            parent=building, capacity=1, used=1,
+                        ))
+        return levels
+
+    def route(self, parent, child, length):
+        fiber = parent.technology != 'adsl'
+        if child.object_type == 'splitter':
+            route_type, fiber_count = 'underground', 48
+        elif child.object_type == 'building':
+            route_type, fiber_count = self.rnd.choice(('underground', 'aerial')), 12
+        else:
+            route_type, fiber_count = 'indoor', 1
+            fiber = fiber and parent.technology == 'gpon'
+        return CableRoute(
+            name=f'{parent.object_id} → {child.object_id}', from_object=parent, to_object=child,
+            cable_type='fiber' if fiber else 'copper', route_type=route_type,
+            length=max(int(length * ROAD_FACTOR), 5), fiber_count=fiber_count if fiber else 2,
+            is_active=parent.is_active and child.is_active,
+        )
+
+    def history(self, obj):
+        entries = [ObjectHistory(infrastructure_object=obj, action='created', performed_by=self.rnd.choice(TECHNICIANS),
+                                 description=f'Установка {obj.object_id}')]
+        for _ in range(self.rnd.randint(*HISTORY_PER_OBJECT)):
+            action = self.rnd.choice(('maintenance', 'repaired', 'updated'))
+            entries.append(ObjectHistory(infrastructure_object=obj, action=action,
+                                         performed_by=self.rnd.choice(TECHNICIANS),
+                                         description=f'{dict(ObjectHistory.ACTION_CHOICES)[action]}: {obj.object_id}'))
+        return entries
+
+    @transaction.atomic
+    def write(self, levels):
+        for level in levels:
+            # Уровень родителей уже записан (bulk_create на SQLite возвращает pk) — parent_id проставится сам
+            InfrastructureObject.objects.bulk_create(level)
+        routes = []
+        for level in levels[1:]:
+            lengths = geo.haversine(
+                np.array([obj.parent.lat for obj in level]), np.array([obj.parent.lng for obj in level]),
+                np.array([obj.lat for obj in level]), np.array([obj.lng for obj in level]),
+            )
+            routes += [self.route(obj.parent, obj, length) for obj, length in zip(level, lengths.tolist())]
+        CableRoute.objects.bulk_create(routes)
+        history = [entry for obj in levels[0] + levels[1] for entry in self.history(obj)]
+        ObjectHistory.objects.bulk_create(history)
+
+        points = [(obj.lat, obj.lng) for level in levels for obj in level]
+        transaction.on_commit(lambda: tiles.invalidate_points(points))
+        self.counts['objects'] += len(points)
+        self.counts['routes'] += len(routes)
+        self.counts['history'] += len(history)
+
+
+def invalidate():
+    """Сбросить индексы и кэши по объектам и трассам во всех процессах (запись шла в обход сигналов)"""
+    spatial.invalidate()
+    autocomplete.invalidate()
+    graph.invalidate()
+    impact.invalidate()
+    coverage.invalidate()
+
+
+def generate(objects, seed=42, prefix=DEFAULT_PREFIX, progress=None):
+    """
+    Сеть примерно из objects объектов (целое число деревьев станций).
+    Возвращает {'objects', 'routes', 'history'} — сколько записано.
+    """
+    generator = Generator(seed, prefix)
+    remaining = max(1, round(objects / OBJECTS_PER_STATION))
+    while remaining:
+        batch = min(remaining, STATIONS_PER_BATCH)
+        generator.write(generator.stations(batch))
+        remaining -= batch
+        # При DEBUG журнал запросов хранил бы SQL всех пачек
+        reset_queries()
+        if progress:
+            progress(generator.counts)
+    invalidate()
+    stats.rebuild()
+    return generator.counts
+
+
+def clear(prefix=DEFAULT_PREFIX):
+    """
+    Удалить сгенерированные объекты (object_id с префиксом prefix) вместе с
+    их трассами и историей. Удаление массовое, в обход сигналов; удаленные
+    записи попадают в журнал удалений, как при обычном удалении.
+    """
+    objects = InfrastructureObject.objects.filter(object_id__startswith=f'{prefix}-')
+    routes = CableRoute.objects.filter(from_object__in=objects.values('id')) | CableRoute.objects.filter(
+        to_object__in=objects.values('id'))
+    generated = f'SELECT id FROM {InfrastructureObject._meta.db_table} WHERE object_id LIKE %s'
+    pattern = [f'{prefix}-%']
+    with transaction.atomic():
+        route_ids = list(routes.values_list('id', flat=True))
+        object_ids = list(objects.values_list('id', flat=True))
+        DeletionLog.objects.bulk_create(
+            [DeletionLog(model='route', record_id=pk) for pk in route_ids] +
+            [DeletionLog(model='object', record_id=pk) for pk in object_ids],
+            batch_size=5000,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {ObjectHistory._meta.db_table} WHERE infrastructure_object_id IN ({generated})',
+                           pattern)
+            cursor.execute(f'DELETE FROM {CableRoute._meta.db_table} '
+                           f'WHERE from_object_id IN ({generated}) OR to_object_id IN ({generated})', pattern * 2)
+            # Несгенерированные потомки остаются без родителя (как on_delete=SET_NULL)
+            cursor.execute(f'UPDATE {InfrastructureObject._meta.db_table} SET parent_id = NULL '
+                           f'WHERE parent_id IN ({generated}) AND object_id NOT LIKE %s', pattern * 2)
+            cursor.execute(f'DELETE FROM {InfrastructureObject._meta.db_table} WHERE object_id LIKE %s', pattern)
+    invalidate()
+    stats.rebuild()
+    return {'objects': len(object_ids), 'routes': len(route_ids)}
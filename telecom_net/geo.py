@@ -0,0 +1,73 @@
+"""
+Векторный расчёт расстояний (haversine) на NumPy.
+
+Координаты хранятся в непрерывных массивах float64, расстояния до всех
+точек считаются за один проход, а k ближайших выбираются через
+np.argpartition без полной сортировки. Скалярный эталон —
+views.calculate_distance.
+"""
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371000.0
+
+
+def haversine(lat, lng, lats, lngs):
+    """Расстояния (м) от точки (lat, lng) до массивов точек lats/lngs"""
+    lat_r = np.radians(lat)
+    lats_r = np.radians(lats)
+    sin_dlat = np.sin((lats_r - lat_r) / 2)
+    sin_dlng = np.sin(np.radians(np.subtract(lngs, lng)) / 2)
+    a = sin_dlat * sin_dlat + np.cos(lat_r) * np.cos(lats_r) * sin_dlng * sin_dlng
+    return 2 * EARTH_RADIUS_M * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def top_k(distances, k):
+    """Индексы k наименьших расстояний в порядке возрастания"""
+    n = len(distances)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp)
+    if k < n:
+        idx = np.argpartition(distances, k - 1)[:k]
+    else:
+        idx = np.arange(n)
+    return idx[np.argsort(distances[idx], kind='stable')]
+
+
+class PointSet:
+    """Набор точек: ids (int64) и координаты lats/lngs (float64)"""
+
+    __slots__ = ('ids', 'lats', 'lngs')
+
+    def __init__(self, ids, lats, lngs):
+        self.ids = np.ascontiguousarray(ids, dtype=np.int64)
+        self.lats = np.ascontiguousarray(lats, dtype=np.float64)
+        self.lngs = np.ascontiguousarray(lngs, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Из последовательности (id, lat, lng)"""
+        data = np.array(rows, dtype=np.float64).reshape(-1, 3)
+        return cls(data[:, 0], data[:, 1], data[:, 2])
+
+    @classmethod
+    def from_queryset(cls, queryset):
+        """Из queryset InfrastructureObject (одна выборка id, lat, lng)"""
+        return cls.from_rows(list(queryset.values_list('id', 'lat', 'lng')))
+
+    def distances(self, lat, lng):
+        return haversine(lat, lng, self.lats, self.lngs)
+
+    def nearest(self, lat, lng, k=10, max_distance=None):
+        """До k ближайших точек: список (distance, id) по возрастанию расстояния"""
+        distances = self.distances(lat, lng)
+        if max_distance is not None:
+            mask = distances <= max_distance
+            ids, distances = self.ids[mask], distances[mask]
+        else:
+            ids = self.ids
+        idx = top_k(distances, k)
+        return list(zip(distances[idx].tolist(), ids[idx].tolist()))
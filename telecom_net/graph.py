@@ -0,0 +1,231 @@
+"""
+Граф кабельной сети в памяти (CSR).
+
+Вершины — объекты инфраструктуры, ребра — активные кабельные трассы
+(неориентированные, вес — длина в метрах). Смежность хранится в формате
+CSR: соседи вершины i — слоты indptr[i]:indptr[i + 1] массивов indices /
+weights / routes. Каждая трасса дает два встречных слота; twins[slot] —
+слот той же трассы в обратную сторону.
+
+Граф строится лениво и сбрасывается сигналами при любом изменении трасс
+(см. signals.py): сброс повышает общую для процессов версию (versions.py),
+и каждый процесс перестраивает граф при следующем обращении. По версии
+можно кэшировать производные результаты.
+"""
+
+import heapq
+import threading
+
+import numpy as np
+
+from . import versions
+
+INF = float('inf')
+
+
+class CableGraph:
+    def __init__(self, route_ids, from_ids, to_ids, lengths):
+        route_ids = np.asarray(route_ids, dtype=np.int64)
+        from_ids = np.asarray(from_ids, dtype=np.int64)
+        to_ids = np.asarray(to_ids, dtype=np.int64)
+        lengths = np.asarray(lengths, dtype=np.float64)
+
+        # Номера вершин 0..n-1 вместо id объектов
+        self.node_ids, inverse = np.unique(np.concatenate([from_ids, to_ids]), return_inverse=True)
+        m = len(route_ids)
+        src = np.concatenate([inverse[:m], inverse[m:]])
+        dst = np.concatenate([inverse[m:], inverse[:m]])
+        edge = np.concatenate([np.arange(m), np.arange(m)])
+
+        order = np.argsort(src, kind='stable')
+        counts = np.bincount(src, minlength=len(self.node_ids))
+        indptr = np.zeros(len(self.node_ids) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        # Слот встречного направления: слоты k и k + m — одна трасса
+        position = np.empty(2 * m, dtype=np.int64)
+        position[order] = np.arange(2 * m)
+        twin = (order + m) % (2 * m) if m else order
+
+        self.route_count = m
+        # Обход в Python по спискам быстрее, чем поэлементный доступ к ndarray
+        self.indptr = indptr.tolist()
+        self.indices = dst[order].tolist()
+        self.weights = lengths[edge[order]].tolist()
+        self.routes = route_ids[edge[order]].tolist()
+        self.twins = position[twin].tolist()
+        self._index = {pk: i for i, pk in enumerate(self.node_ids.tolist())}
+        # Общая версия, по состоянию на которую построен граф (см. get_graph)
+        self.version = None
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    @classmethod
+    def from_queryset(cls, queryset):
+        """Из queryset CableRoute (одна выборка id, концов и длины)"""
+        rows = list(queryset.values_list('id', 'from_object_id', 'to_object_id', 'length'))
+        columns = list(zip(*rows)) or [(), (), (), ()]
+        return cls(*columns)
+
+    def _dijkstra(self, source, target, flow=None, potential=None):
+        """
+        Дейкстра от source до target (номера вершин) с ранней остановкой.
+        С flow — по остаточной сети: свободный слот стоит weight, отмена
+        потока по встречному слоту — -weight; potential делает стоимости
+        неотрицательными. Возвращает (dist, prev_slot).
+        """
+        indptr, indices, weights, twins = self.indptr, self.indices, self.weights, self.twins
+        dist = {source: 0.0}
+        prev = {}
+        done = set()
+        heap = [(0.0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if u in done:
+                continue
+            done.add(u)
+            if u == target:
+                break
+            pu = potential[u] if potential is not None else 0.0
+            for slot in range(indptr[u], indptr[u + 1]):
+                v = indices[slot]
+                if v in done:
+                    continue
+                if flow is None:
+                    cost = weights[slot]
+                elif flow[twins[slot]]:
+                    cost = -weights[slot]
+                elif not flow[slot]:
+                    cost = weights[slot]
+                else:
+                    continue
+                if potential is not None:
+                    cost += pu - potential[v]
+                nd = d + cost
+                if nd < dist.get(v, INF):
+                    dist[v] = nd
+                    prev[v] = slot
+                    heapq.heappush(heap, (nd, v))
+        return dist, prev
+
+    def _walk_back(self, prev, source, target):
+        """Слоты пути source -> target по prev (от начала к концу)"""
+        slots = []
+        node = target
+        while node != source:
+            slot = prev[node]
+            slots.append(slot)
+            node = self.indices[self.twins[slot]]
+        slots.reverse()
+        return slots
+
+    def _path(self, source, slots):
+        """Описание пути: id объектов, id трасс и суммарная длина"""
+        nodes = [source] + [self.indices[slot] for slot in slots]
+        return {
+            'length': sum(self.weights[slot] for slot in slots),
+            'objects': self.node_ids[nodes].tolist(),
+            'routes': [self.routes[slot] for slot in slots],
+        }
+
+    def shortest_path(self, from_pk, to_pk):
+        """Кратчайший по длине кабеля путь между объектами или None"""
+        source, target = self._index.get(from_pk), self._index.get(to_pk)
+        if source is None or target is None:
+            return None
+        if source == target:
+            return self._path(source, [])
+        dist, prev = self._dijkstra(source, target)
+        if target not in dist:
+            return None
+        return self._path(source, self._walk_back(prev, source, target))
+
+    def disjoint_paths(self, from_pk, to_pk, k=2):
+        """
+        До k путей без общих трасс с минимальной суммарной длиной (поток
+        минимальной стоимости: последовательные кратчайшие пути по остаточной
+        сети с потенциалами, как в алгоритме Суурбалле). Жадное удаление
+        ребер первого кратчайшего пути может не найти резервный путь, а поток —
+        находит, если он существует. Пути отсортированы по длине.
+        """
+        source, target = self._index.get(from_pk), self._index.get(to_pk)
+        if source is None or target is None or source == target:
+            return []
+        flow = bytearray(len(self.indices))
+        potential = [0.0] * len(self.node_ids)
+        found = 0
+        for _ in range(k):
+            dist, prev = self._dijkstra(source, target, flow, potential)
+            if target not in dist:
+                break
+            # Потенциал += min(dist, dist[target]); недостигнутые вершины
+            # получают dist[target] — вместо этого сдвигаются все остальные
+            limit = dist[target]
+            for node, d in dist.items():
+                potential[node] += min(d, limit) - limit
+            for slot in self._walk_back(prev, source, target):
+                twin = self.twins[slot]
+                if flow[twin]:
+                    flow[twin] = 0
+                else:
+                    flow[slot] = 1
+            found += 1
+        return sorted(
+            (self._path(source, slots) for slots in self._decompose(flow, source, target, found)),
+            key=lambda path: path['length'],
+        )
+
+    def _decompose(self, flow, source, target, count):
+        """Разложить единичный поток на count путей source -> target"""
+        indptr, indices = self.indptr, self.indices
+        paths = []
+        for _ in range(count):
+            slots = []
+            seen = {source: 0}
+            node = source
+            while node != target:
+                slot = next(s for s in range(indptr[node], indptr[node + 1]) if flow[s])
+                flow[slot] = 0
+                node = indices[slot]
+                if node in seen:
+                    # Цикл нулевой длины — выбросить его из пути
+                    del slots[seen[node]:]
+                    seen = {n: i for n, i in seen.items() if i <= seen[node]}
+                else:
+                    seen[node] = len(slots) + 1
+                    slots.append(slot)
+            paths.append(slots)
+        return paths
+
+
+VERSION = 'graph'
+_graph = None
+_lock = threading.Lock()
+
+
+def current_version():
+    return versions.current(VERSION)
+
+
+def get_graph():
+    """Граф активных трасс; строится из БД при первом обращении и после каждого сброса"""
+    global _graph
+    version = current_version()
+    graph = _graph
+    if graph is None or graph.version != version:
+        with _lock:
+            version = current_version()
+            if _graph is None or _graph.version != version:
+                from .models import CableRoute
+                _graph = CableGraph.from_queryset(CableRoute.objects.filter(is_active=True))
+                _graph.version = version
+            graph = _graph
+    return graph
+
+
+def invalidate():
+    """Сбросить граф во всех процессах после изменения трасс"""
+    global _graph
+    with _lock:
+        versions.bump(VERSION)
+        _graph = None
@@ -0,0 +1,96 @@
+"""
+Иерархия объектов (parent): поддерево и цепочка родителей одним запросом
+WITH RECURSIVE.
+
+В каждой строке рекурсии хранится путь ',id,id,...,' от начального
+объекта. Если следующий объект уже есть в пути — это цикл (родитель
+ссылается на потомка): строка помечается cycle=1 и дальше не раскрывается.
+"""
+
+from django.db import connection
+
+from .models import InfrastructureObject
+
+# Предел глубины, если depth не задан, — защита от очень длинных цепочек
+MAX_DEPTH = 100
+
+FIELDS = ('id', 'object_id', 'name', 'object_type', 'status', 'is_active', 'capacity', 'free_ports',
+          'parent_id', 'lat', 'lng')
+
+TABLE = InfrastructureObject._meta.db_table
+
+SUBTREE_SQL = f"""
+WITH RECURSIVE tree(id, depth, path, cycle) AS (
+    SELECT id, 0, ',' || id || ',', 0 FROM {TABLE} WHERE id = %s
+    UNION ALL
+    SELECT c.id, t.depth + 1, t.path || c.id || ',',
+           CASE WHEN t.path LIKE '%%,' || c.id || ',%%' THEN 1 ELSE 0 END
+    FROM {TABLE} c JOIN tree t ON c.parent_id = t.id
+    WHERE t.cycle = 0 AND t.depth < %s
+)
+SELECT tree.depth, tree.cycle, {', '.join(f'o.{field}' for field in FIELDS)}
+FROM tree JOIN {TABLE} o ON o.id = tree.id
+ORDER BY tree.depth, o.object_id
+"""
+
+ANCESTORS_SQL = f"""
+WITH RECURSIVE chain(id, parent_id, depth, path, cycle) AS (
+    SELECT id, parent_id, 0, ',' || id || ',', 0 FROM {TABLE} WHERE id = %s
+    UNION ALL
+    SELECT p.id, p.parent_id, c.depth + 1, c.path || p.id || ',',
+           CASE WHEN c.path LIKE '%%,' || p.id || ',%%' THEN 1 ELSE 0 END
+    FROM {TABLE} p JOIN chain c ON p.id = c.parent_id
+    WHERE c.cycle = 0 AND c.depth < %s
+)
+SELECT chain.depth, chain.cycle, {', '.join(f'o.{field}' for field in FIELDS)}
+FROM chain JOIN {TABLE} o ON o.id = chain.id
+ORDER BY chain.depth
+"""
+
+
+def _fetch(sql, pk, depth):
+    """Строки обхода: (список dict с depth, id объектов, на которых замкнулся цикл)"""
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [pk, MAX_DEPTH if depth is None else depth])
+        rows = cursor.fetchall()
+    nodes, cycles = [], []
+    for depth_, cycle, *values in rows:
+        if cycle:
+            cycles.append(values[0])
+        else:
+            nodes.append({'depth': depth_, **dict(zip(FIELDS, values))})
+    return nodes, cycles
+
+
+def aggregate(nodes):
+    """Сводка по объектам: количество, по типам, суммарная емкость и свободные порты"""
+    by_type = {}
+    for node in nodes:
+        by_type[node['object_type']] = by_type.get(node['object_type'], 0) + 1
+    return {
+        'count': len(nodes),
+        'by_type': by_type,
+        'total_capacity': sum(node['capacity'] for node in nodes),
+        'total_free_ports': sum(node['free_ports'] for node in nodes),
+    }
+
+
+def subtree(pk, depth=None, object_types=None):
+    """
+    Объект pk и его потомки до глубины depth: None, если объекта нет.
+    object_types ограничивает выдачу и сводку, но не обход.
+    """
+    nodes, cycles = _fetch(SUBTREE_SQL, pk, depth)
+    if not nodes:
+        return None
+    if object_types:
+        nodes = [node for node in nodes if node['object_type'] in object_types]
+    return {'root': pk, **aggregate(nodes), 'cycles': cycles, 'objects': nodes}
+
+
+def ancestors(pk, depth=None):
+    """Цепочка родителей объекта pk от ближайшего (depth=1) вверх: None, если объекта нет"""
+    nodes, cycles = _fetch(ANCESTORS_SQL, pk, depth)
+    if not nodes:
+        return None
+    return {'object': pk, 'cycles': cycles, 'objects': nodes[1:]}
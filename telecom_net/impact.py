@@ -0,0 +1,189 @@
+"""
+Анализ последствий отказа объекта или кабельной трассы.
+
+Сигнал идет от работающих источников (OLT, АТС) по кабельным трассам и
+связям «родитель — дочерний объект»; объект работает, если он активен и в
+статусе active. Затронутые отказом объекты — те, что достижимы от
+источников при исправном элементе и недостижимы при отказавшем. Отказавший
+объект считается исправным в «до», даже если уже переведен в maintenance —
+так можно оценить последствия уже случившегося отказа.
+
+Топология хранится в памяти процесса, результаты — в кэше Django по
+версии топологии. Версия общая для процессов (versions.py) и меняется
+сигналами при изменении трасс и связей объектов (см. signals.py), а также
+командами импорта и генерации сети.
+"""
+
+import threading
+from collections import deque
+
+from django.core.cache import cache
+
+from . import versions
+from .models import CableRoute, InfrastructureObject
+
+SOURCE_TYPES = ('olt', 'ats')
+# Поля объекта, изменение которых меняет топологию или результат анализа
+TRACKED_FIELDS = ('object_id', 'name', 'object_type', 'status', 'is_active', 'parent_id')
+
+VERSION = 'impact'
+IMPACT_CACHE_TIMEOUT = 60 * 60
+
+TYPE_ORDER = [choice for choice, _ in InfrastructureObject.OBJECT_TYPES]
+
+
+def is_working(status, is_active):
+    return bool(is_active) and status == 'active'
+
+
+def topology_version():
+    return versions.current(VERSION)
+
+
+def invalidate():
+    """Новая версия топологии: кэш результатов и топологии процессов устаревает"""
+    versions.bump(VERSION)
+
+
+class Topology:
+    """Объекты и связи сети: смежность по спискам, связи помечены id трассы (0 — родитель)"""
+
+    def __init__(self, objects, routes, version=None):
+        self.version = version
+        self.index = {}
+        self.info = []
+        self.working = bytearray(len(objects))
+        self.sources = []
+        parents = []
+        for i, (pk, object_id, name, object_type, status, is_active, parent_id) in enumerate(objects):
+            self.index[pk] = i
+            self.info.append((pk, object_id, name, object_type))
+            self.working[i] = is_working(status, is_active)
+            if object_type in SOURCE_TYPES:
+                self.sources.append(i)
+            if parent_id is not None:
+                parents.append((pk, parent_id))
+
+        self.adjacency = [[] for _ in objects]
+        self.routes = {}
+        for pk, from_id, to_id, is_active in routes:
+            a, b = self.index.get(from_id), self.index.get(to_id)
+            if a is None or b is None:
+                continue
+            self.routes[pk] = bool(is_active)
+            self.adjacency[a].append((b, pk))
+            self.adjacency[b].append((a, pk))
+        for child_id, parent_id in parents:
+            a, b = self.index[child_id], self.index.get(parent_id)
+            if b is not None:
+                self.adjacency[a].append((b, 0))
+                self.adjacency[b].append((a, 0))
+        self._baseline = None
+
+    @classmethod
+    def load(cls, version=None):
+        objects = InfrastructureObject.objects.values_list(
+            'id', 'object_id', 'name', 'object_type', 'status', 'is_active', 'parent_id'
+        ).order_by()
+        routes = CableRoute.objects.values_list('id', 'from_object_id', 'to_object_id', 'is_active').order_by()
+        return cls(list(objects.iterator(chunk_size=5000)), list(routes.iterator(chunk_size=5000)), version)
+
+    def reachable(self, up_node=None, down_node=None, up_route=None, down_route=None):
+        """
+        Вершины, достижимые от работающих источников (bytearray по номерам).
+        up_*/down_* принудительно включают или выключают объект или трассу.
+        """
+        working = self.working
+        routes = self.routes
+        seen = bytearray(len(working))
+
+        def passable(i):
+            if i == down_node:
+                return False
+            return i == up_node or working[i]
+
+        queue = deque()
+        for i in self.sources:
+            if passable(i) and not seen[i]:
+                seen[i] = 1
+                queue.append(i)
+        while queue:
+            u = queue.popleft()
+            for v, route in self.adjacency[u]:
+                if seen[v] or not passable(v):
+                    continue
+                if route and (route == down_route or not (routes[route] or route == up_route)):
+                    continue
+                seen[v] = 1
+                queue.append(v)
+        return seen
+
+    def baseline(self):
+        """Достижимость при текущем состоянии сети (считается один раз)"""
+        if self._baseline is None:
+            self._baseline = self.reachable()
+        return self._baseline
+
+    def object_impact(self, pk):
+        node = self.index[pk]
+        before = self.baseline() if self.working[node] else self.reachable(up_node=node)
+        after = self.reachable(down_node=node)
+        return self._lost(before, after, exclude=node)
+
+    def route_impact(self, pk):
+        before = self.baseline() if self.routes[pk] else self.reachable(up_route=pk)
+        after = self.reachable(down_route=pk)
+        return self._lost(before, after)
+
+    def _lost(self, before, after, exclude=None):
+        return [i for i in range(len(before)) if before[i] and not after[i] and i != exclude]
+
+    def describe(self, nodes):
+        """Затронутые объекты по типам: список {object_type, count, objects}"""
+        groups = {}
+        for i in nodes:
+            pk, object_id, name, object_type = self.info[i]
+            groups.setdefault(object_type, []).append({'id': pk, 'object_id': object_id, 'name': name})
+        return [
+            {'object_type': object_type, 'count': len(groups[object_type]),
+             'objects': sorted(groups[object_type], key=lambda obj: obj['object_id'])}
+            for object_type in sorted(groups, key=lambda t: TYPE_ORDER.index(t) if t in TYPE_ORDER else len(TYPE_ORDER))
+        ]
+
+
+_topology = None
+_load_lock = threading.Lock()
+
+
+def get_topology():
+    """Топология текущей версии; перестраивается, если версия сменилась"""
+    global _topology
+    version = topology_version()
+    topology = _topology
+    if topology is None or topology.version != version:
+        with _load_lock:
+            if _topology is None or _topology.version != version:
+                _topology = Topology.load(version)
+            topology = _topology
+    return topology
+
+
+def analyse(kind, pk):
+    """
+    Последствия отказа объекта (kind='object') или трассы (kind='route').
+    None, если элемента нет. Результат кэшируется до смены топологии.
+    """
+    topology = get_topology()
+    if pk not in (topology.index if kind == 'object' else topology.routes):
+        return None
+    key = f'impact:{topology.version}:{kind}:{pk}'
+    result = cache.get(key)
+    if result is None:
+        lost = topology.object_impact(pk) if kind == 'object' else topology.route_impact(pk)
+        result = {
+            'element': {'kind': kind, 'id': pk},
+            'total_affected': len(lost),
+            'by_type': topology.describe(lost),
+        }
+        cache.set(key, result, IMPACT_CACHE_TIMEOUT)
+    return result
@@ -0,0 +1,439 @@
+"""
+Потоковый импорт объектов и кабельных трасс из CSV, GeoJSON и XLSX.
+
+Строки читаются по одной и обрабатываются пачками по chunk_size: каждая
+пачка проверяется (поля модели, правило free_ports <= capacity из
+InfrastructureObject.clean), записывается одним bulk_create (для объектов —
+с ON CONFLICT по object_id, трассы обновляются bulk_update) в отдельной
+транзакции, после чего сообщается прогресс. В памяти держится
+только текущая пачка, поэтому объем файла не ограничен.
+
+Объекты сопоставляются по object_id (существующие обновляются), родитель
+(`parent`) и концы трасс (`from_object`/`to_object`) задаются object_id.
+Родитель, который встретится в файле позже ребенка, привязывается в конце
+импорта. Трассы сопоставляются по (from_object, to_object, name).
+
+bulk-операции не вызывают сигналы моделей, поэтому после импорта
+производные структуры сбрасываются и статистика пересобирается — и когда
+чтение файла прервано ошибкой, ведь записанные пачки остаются в БД. Сброс
+повышает общие версии (versions.py) и доходит до воркеров сервера, даже
+если импорт запущен командой import_network в отдельном процессе.
+"""
+
+import csv
+import io
+import json
+from collections import defaultdict
+from itertools import chain, islice
+
+from django.core.exceptions import ValidationError
+from django.db import reset_queries, transaction
+from django.utils import timezone
+
+from . import autocomplete, coverage, graph, impact, spatial, stats, tiles
+from .models import CableRoute, InfrastructureObject
+from .signals import route_neighbour_points
+
+FORMATS = ('csv', 'geojson', 'xlsx')
+KINDS = ('objects', 'routes')
+
+DEFAULT_CHUNK_SIZE = 2000
+# Сколько ошибок хранить в отчете (считаются все)
+MAX_REPORTED_ERRORS = 100
+
+OBJECT_COLUMNS = (
+    'object_id', 'object_type', 'name', 'address', 'lat', 'lng', 'technology', 'capacity',
+    'free_ports', 'status', 'is_active', 'technical_notes', 'notes',
+)
+OBJECT_REQUIRED = ('object_type', 'name', 'lat', 'lng')
+
+ROUTE_COLUMNS = (
+    'name', 'cable_type', 'route_type', 'length', 'fiber_count', 'is_active', 'installation_notes', 'notes',
+)
+ROUTE_REQUIRED = ('name', 'length')
+
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y', 'да'}
+FALSE_VALUES = {'0', 'false', 'f', 'no', 'n', 'нет'}
+
+GEOJSON_READ_SIZE = 64 * 1024
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []
+
+    def error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def as_dict(self):
+        return {
+            'rows': self.rows, 'created': self.created, 'updated': self.updated,
+            'error_count': self.error_count, 'errors': self.errors,
+        }
+
+
+def error_message(exc):
+    if isinstance(exc, ValidationError):
+        if hasattr(exc, 'error_dict'):
+            return '; '.join(f'{field}: {" ".join(messages)}' for field, messages in exc.message_dict.items())
+        return ' '.join(exc.messages)
+    return str(exc)
+
+
+def detect_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension == 'json':
+        return 'geojson'
+    return extension if extension in FORMATS else None
+
+
+# ---------------------------
+#       Чтение файлов
+# ---------------------------
+
+def text_stream(stream):
+    if isinstance(stream, io.TextIOBase):
+        return stream
+    return io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+
+def read_csv(stream):
+    """Строки CSV (разделитель , или ;): (номер строки, dict)"""
+    text = text_stream(stream)
+    header = text.readline()
+    delimiter = ';' if header.count(';') > header.count(',') else ','
+    reader = csv.DictReader(chain([header], text), delimiter=delimiter)
+    for row in reader:
+        yield reader.line_num, {key.strip(): value.strip() if isinstance(value, str) else value
+                                for key, value in row.items() if key}
+
+
+def iter_geojson_features(stream, read_size=GEOJSON_READ_SIZE):
+    """
+    Объекты массива "features" по одному, не загружая файл целиком:
+    буфер дочитывается, пока json.raw_decode не разберет очередной объект.
+    """
+    text = text_stream(stream)
+    decoder = json.JSONDecoder()
+    buffer = ''
+    while True:
+        start = buffer.find('"features"')
+        bracket = buffer.find('[', start) if start >= 0 else -1
+        if bracket >= 0:
+            break
+        chunk = text.read(read_size)
+        if not chunk:
+            raise ValueError('В GeoJSON нет массива "features"')
+        buffer += chunk
+    buffer = buffer[bracket + 1:]
+    pos = 0
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        if pos < len(buffer) and buffer[pos] == ']':
+            return
+        try:
+            feature, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            chunk = text.read(read_size)
+            if not chunk:
+                raise ValueError('Некорректный GeoJSON: массив "features" не завершен')
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+        yield feature
+        pos = end
+        if pos > read_size:
+            buffer, pos = buffer[pos:], 0
+
+
+def read_geojson(stream):
+    """Свойства Feature; координаты Point дополняют lat/lng: (номер Feature, dict)"""
+    for number, feature in enumerate(iter_geojson_features(stream), start=1):
+        row = dict(feature.get('properties') or {})
+        geometry = feature.get('geometry') or {}
+        if geometry.get('type') == 'Point' and len(geometry.get('coordinates') or ()) >= 2:
+            row.setdefault('lng', geometry['coordinates'][0])
+            row.setdefault('lat', geometry['coordinates'][1])
+        yield number, row
+
+
+def read_xlsx(stream):
+    """Строки первого листа XLSX, первая строка — заголовки (нужен openpyxl)"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError('Для импорта XLSX установите openpyxl')
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell).strip() if cell is not None else '' for cell in next(rows, ())]
+        for number, values in enumerate(rows, start=2):
+            if any(value is not None for value in values):
+                yield number, {key: value for key, value in zip(header, values) if key}
+    finally:
+        workbook.close()
+
+
+READERS = {'csv': read_csv, 'geojson': read_geojson, 'xlsx': read_xlsx}
+
+
+# ---------------------------
+#       Проверка строк
+# ---------------------------
+
+def clean_values(model, columns, raw):
+    """Значения непустых колонок, приведенные и проверенные полями модели"""
+    values = {}
+    errors = {}
+    for name in columns:
+        value = raw.get(name)
+        if value is None or value == '':
+            continue
+        field = model._meta.get_field(name)
+        try:
+            if field.get_internal_type() == 'BooleanField' and not isinstance(value, bool):
+                value = str(value).strip().lower()
+                if value not in TRUE_VALUES | FALSE_VALUES:
+                    raise ValidationError('Ожидается да/нет')
+                values[name] = value in TRUE_VALUES
+            else:
+                values[name] = field.clean(value, None)
+        except ValidationError as exc:
+            errors[name] = exc.messages
+    if errors:
+        raise ValidationError(errors)
+    return values
+
+
+def reference(raw, name):
+    value = raw.get(name)
+    return str(value).strip() if value not in (None, '') else None
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+# ---------------------------
+#       Объекты
+# ---------------------------
+
+def write_objects(chunk, report):
+    """Записать пачку объектов; вернуть ссылки на родителей (child, parent, line)"""
+    parsed = {}
+    for line, raw in chunk:
+        report.rows += 1
+        try:
+            values = clean_values(InfrastructureObject, OBJECT_COLUMNS, raw)
+            if 'object_id' not in values:
+                raise ValidationError('Не указан object_id')
+        except ValidationError as exc:
+            report.error(line, error_message(exc))
+            continue
+        # Повтор object_id внутри пачки — действует последняя строка
+        parsed[values['object_id']] = (line, values, reference(raw, 'parent'))
+
+    existing = InfrastructureObject.objects.in_bulk(list(parsed), field_name='object_id')
+    # Родители, уже загруженные в БД, проставляются сразу при записи
+    parent_ids = dict(InfrastructureObject.objects.filter(
+        object_id__in={parent for _, _, parent in parsed.values() if parent is not None}
+    ).values_list('object_id', 'id'))
+    to_write, update_fields = [], set()
+    created = updated = 0
+    links, points, moved = [], [], []
+    for object_id, (line, values, parent) in parsed.items():
+        obj = existing.get(object_id)
+        try:
+            if obj is None:
+                missing = [name for name in OBJECT_REQUIRED if name not in values]
+                if missing:
+                    raise ValidationError(f'Не указаны поля: {", ".join(missing)}')
+                obj = InfrastructureObject(**values)
+            else:
+                points.append((obj.lat, obj.lng))
+                if values.get('lat', obj.lat) != obj.lat or values.get('lng', obj.lng) != obj.lng:
+                    moved.append(obj.pk)
+                for name, value in values.items():
+                    setattr(obj, name, value)
+            obj.clean()
+        except ValidationError as exc:
+            report.error(line, error_message(exc))
+            continue
+        if obj.pk is None:
+            created += 1
+        else:
+            # Существующая строка перезаписывается через INSERT ... ON CONFLICT (object_id)
+            obj.pk = None
+            update_fields.update(values)
+            updated += 1
+        to_write.append(obj)
+        points.append((obj.lat, obj.lng))
+        if parent is not None and parent != object_id and parent in parent_ids:
+            obj.parent_id = parent_ids[parent]
+            update_fields.add('parent')
+        elif parent is not None:
+            links.append((object_id, parent, line))
+
+    if update_fields:
+        InfrastructureObject.objects.bulk_create(
+            to_write, update_conflicts=True, unique_fields=['object_id'],
+            update_fields=sorted((update_fields - {'object_id'}) | {'updated_at'}),
+        )
+    else:
+        InfrastructureObject.objects.bulk_create(to_write)
+    report.created += created
+    report.updated += updated
+    if moved:
+        # Трассы перемещенных объектов видны и в тайлах их других концов (как в signals.py)
+        points += route_neighbour_points(moved)
+    transaction.on_commit(lambda: tiles.invalidate_points(points))
+    return links
+
+
+def link_parents(links, report, final=False):
+    """Проставить родителей по object_id; вернуть ссылки на еще не загруженных родителей"""
+    ids = {child for child, _, _ in links} | {parent for _, parent, _ in links}
+    id_map = dict(InfrastructureObject.objects.filter(object_id__in=ids).values_list('object_id', 'id'))
+    now = timezone.now()
+    children = defaultdict(list)
+    unresolved = []
+    for child, parent, line in links:
+        if child not in id_map:
+            continue
+        if parent == child:
+            report.error(line, 'Объект не может быть родителем самому себе')
+        elif parent in id_map:
+            children[id_map[parent]].append(id_map[child])
+        elif final:
+            report.error(line, f'Родитель {parent} не найден')
+        else:
+            unresolved.append((child, parent, line))
+    # Один UPDATE на родителя: в иерархии у родителя обычно много детей
+    for parent_id, child_ids in children.items():
+        InfrastructureObject.objects.filter(id__in=child_ids).update(parent_id=parent_id, updated_at=now)
+    return unresolved
+
+
+def import_objects(rows, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    report = ImportReport()
+    pending = []
+    try:
+        for chunk in chunked(rows, chunk_size):
+            with transaction.atomic():
+                links = write_objects(chunk, report)
+                pending += link_parents(links, report)
+            # При DEBUG журнал запросов хранил бы SQL всех пачек
+            reset_queries()
+            if progress:
+                progress(report)
+        for links in chunked(pending, chunk_size):
+            with transaction.atomic():
+                link_parents(links, report, final=True)
+    finally:
+        # Ошибка чтения файла посреди импорта не откатывает записанные пачки
+        spatial.invalidate()
+        autocomplete.invalidate()
+        impact.invalidate()
+        coverage.invalidate()
+        stats.rebuild()
+    return report
+
+
+# ---------------------------
+#       Трассы
+# ---------------------------
+
+def write_routes(chunk, report):
+    parsed = []
+    for line, raw in chunk:
+        report.rows += 1
+        try:
+            values = clean_values(CableRoute, ROUTE_COLUMNS, raw)
+            ends = reference(raw, 'from_object'), reference(raw, 'to_object')
+            missing = [name for name in ROUTE_REQUIRED if name not in values]
+            missing += [name for name, end in zip(('from_object', 'to_object'), ends) if end is None]
+            if missing:
+                raise ValidationError(f'Не указаны поля: {", ".join(missing)}')
+        except ValidationError as exc:
+            report.error(line, error_message(exc))
+            continue
+        parsed.append((line, values, *ends))
+
+    refs = {ref for _, _, start, end in parsed for ref in (start, end)}
+    objects = {
+        object_id: (pk, lat, lng)
+        for object_id, pk, lat, lng in InfrastructureObject.objects.filter(
+            object_id__in=refs
+        ).values_list('object_id', 'id', 'lat', 'lng')
+    }
+    ids = {pk for pk, _, _ in objects.values()}
+    existing = {
+        (route.from_object_id, route.to_object_id, route.name): route
+        for route in CableRoute.objects.filter(from_object__in=ids, to_object__in=ids).only(
+            'id', 'name', 'from_object_id', 'to_object_id'
+        )
+    }
+
+    now = timezone.now()
+    to_create, to_update, update_fields, points = {}, {}, set(), []
+    for line, values, start, end in parsed:
+        unknown = [ref for ref in (start, end) if ref not in objects]
+        if unknown:
+            report.error(line, f'Объект не найден: {", ".join(unknown)}')
+            continue
+        key = (objects[start][0], objects[end][0], values['name'])
+        route = existing.get(key)
+        if route is None:
+            to_create[key] = CableRoute(from_object_id=key[0], to_object_id=key[1], **values)
+        else:
+            for name, value in values.items():
+                setattr(route, name, value)
+            route.updated_at = now
+            update_fields.update(values)
+            to_update[key] = route
+        points += [objects[start][1:], objects[end][1:]]
+
+    CableRoute.objects.bulk_create(to_create.values())
+    if to_update:
+        CableRoute.objects.bulk_update(to_update.values(), sorted(update_fields | {'updated_at'}))
+    report.created += len(to_create)
+    report.updated += len(to_update)
+    transaction.on_commit(lambda: tiles.invalidate_points(points))
+
+
+def import_routes(rows, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    report = ImportReport()
+    try:
+        for chunk in chunked(rows, chunk_size):
+            with transaction.atomic():
+                write_routes(chunk, report)
+            reset_queries()
+            if progress:
+                progress(report)
+    finally:
+        graph.invalidate()
+        impact.invalidate()
+    return report
+
+
+def import_network(stream, kind, fmt, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """
+    Импорт из файла: kind — objects или routes, fmt — csv, geojson или xlsx.
+    Ошибка формата файла — ValueError; ошибки строк — в отчете.
+    """
+    if kind not in KINDS:
+        raise ValueError(f'kind должен быть одним из: {", ".join(KINDS)}')
+    if fmt not in READERS:
+        raise ValueError(f'Формат должен быть одним из: {", ".join(FORMATS)}')
+    rows = READERS[fmt](stream)
+    importer = import_objects if kind == 'objects' else import_routes
+    return importer(rows, chunk_size, progress)
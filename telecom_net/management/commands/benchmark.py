@@ -0,0 +1,63 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from telecom_net.benchmarks import BENCHMARKS
+
+
+class Command(BaseCommand):
+    help = "Запуск бенчмарков производительности (см. telecom_net/benchmarks.py)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(BENCHMARKS), help="Название бенчмарка")
+        parser.add_argument('--sizes', type=int, nargs='+', help="Размеры сети (количество объектов)")
+        parser.add_argument('--output', help="Сохранить результаты в JSON-файл")
+        parser.add_argument('--compare', help="JSON-файл предыдущего запуска: вывести изменения относительно него")
+
+    def handle(self, *args, **options):
+        func = BENCHMARKS.get(options['name'])
+        if func is None:
+            raise CommandError(f"Неизвестный бенчмарк: {options['name']}")
+        baseline = self.load(options['compare'], options['name']) if options['compare'] else None
+        sizes = options['sizes'] or func.default_sizes
+        results = func(sizes, self.stdout)
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps({
+                'benchmark': options['name'], 'sizes': sizes,
+                'timestamp': timezone.now().isoformat(timespec='seconds'), 'results': results,
+            }, ensure_ascii=False, indent=2), encoding='utf-8')
+            self.stdout.write(self.style.SUCCESS(f"Результаты сохранены: {options['output']}"))
+        if baseline is not None:
+            self.compare(baseline, results, func.key)
+
+    def load(self, path, name):
+        try:
+            data = json.loads(Path(path).read_text(encoding='utf-8'))
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Не удалось прочитать {path}: {e}")
+        if data.get('benchmark') != name:
+            raise CommandError(f"{path} — результаты бенчмарка {data.get('benchmark')!r}, а не {name!r}")
+        return data
+
+    def compare(self, baseline, results, key):
+        """Числовые поля строк с одинаковым ключом: было → стало (изменение в %)"""
+        previous = {tuple(row.get(field) for field in key): row for row in baseline['results']}
+        self.stdout.write(f"Сравнение с запуском {baseline.get('timestamp', '?')}:")
+        for row in results:
+            label = ', '.join(str(row.get(field)) for field in key)
+            old = previous.get(tuple(row.get(field) for field in key))
+            if old is None:
+                self.stdout.write(f"  {label}: нет в предыдущем запуске")
+                continue
+            changes = []
+            for field, value in row.items():
+                before = old.get(field)
+                if field in key or isinstance(value, bool) or not isinstance(value, (int, float)) \
+                        or not isinstance(before, (int, float)):
+                    continue
+                delta = f" ({(value - before) / before:+.0%})" if before else ''
+                changes.append(f"{field} {before} → {value}{delta}")
+            self.stdout.write(f"  {label}: " + ('; '.join(changes) or 'нет числовых полей'))
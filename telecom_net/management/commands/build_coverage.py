@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from telecom_net import coverage
+
+
+class Command(BaseCommand):
+    help = "Полный пересчет растра покрытия (доступность подключения и технология по сетке)"
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        raster = coverage.build()
+        path = coverage.raster_path()
+        if raster is None:
+            path.unlink(missing_ok=True)
+            self.stdout.write(self.style.WARNING("Точек подключения нет — растр удален"))
+            return
+        raster.save(path)
+        covered = int((raster.levels > coverage.NONE).sum())
+        self.stdout.write(self.style.SUCCESS(
+            f"Растр {raster.shape[0]}×{raster.shape[1]} ячеек ({covered} с покрытием) "
+            f"за {time.perf_counter() - start:.1f} с: {path}"
+        ))
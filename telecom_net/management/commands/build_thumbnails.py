@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from telecom_net import thumbnails
+from telecom_net.models import CableRoute, InfrastructureObject
+
+
+class Command(BaseCommand):
+    help = "Построить миниатюры для изображений, у которых их еще нет (или для всех с --all)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', dest='rebuild',
+                            help="Проверить все изображения, а не только без миниатюр")
+
+    def handle(self, *args, rebuild, **options):
+        done = failed = 0
+        for model in (InfrastructureObject, CableRoute):
+            for field, hash_field in thumbnails.image_fields(model):
+                queryset = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+                if not rebuild:
+                    queryset = queryset.filter(**{hash_field: ''})
+                for pk in queryset.values_list('pk', flat=True).iterator():
+                    try:
+                        thumbnails.process(model, pk, field, hash_field)
+                        done += 1
+                    except Exception as exc:
+                        failed += 1
+                        self.stderr.write(f"  {model.__name__} #{pk} ({field}): {exc}")
+        self.stdout.write(self.style.SUCCESS(f"Миниатюры готовы: {done}, ошибок: {failed}"))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from telecom_net import export
+
+
+class Command(BaseCommand):
+    help = "Потоковая выгрузка объектов или кабельных трасс в GeoJSON, NDJSON или CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=export.KINDS, default='objects',
+                            help="Что выгружать (по умолчанию objects)")
+        parser.add_argument('--format', choices=export.FORMATS, dest='fmt', default='geojson',
+                            help="Формат (по умолчанию geojson)")
+        parser.add_argument('--output', '-o', help="Файл для записи (по умолчанию stdout)")
+        parser.add_argument('--filter', action='append', default=[], metavar='KEY=VALUE', dest='filters',
+                            help="Фильтр как в API, например status=active (можно повторять)")
+
+    def handle(self, *args, kind, fmt, output, filters, **options):
+        params = {}
+        for item in filters:
+            key, sep, value = item.partition('=')
+            if not sep:
+                raise CommandError(f"Фильтр должен быть вида KEY=VALUE: {item}")
+            params[key] = value
+
+        parts = export.export_parts(kind, fmt, params)
+        if output is None:
+            for part in parts:
+                self.stdout.write(part, ending='')
+            return
+
+        # newline='' — csv.writer сам пишет \r\n
+        try:
+            with open(output, 'w', encoding='utf-8', newline='') as stream:
+                for part in parts:
+                    stream.write(part)
+        except OSError as exc:
+            raise CommandError(str(exc))
+        self.stderr.write(self.style.SUCCESS(f"Выгрузка записана в {output}"))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from telecom_net import generator
+
+
+class Command(BaseCommand):
+    help = ("Синтетическая сеть для замеров: станции → сплиттеры → дома → клиенты с трассами "
+            "и историей (см. telecom_net/generator.py)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--objects', type=int, default=10_000, help="Примерное количество объектов")
+        parser.add_argument('--seed', type=int, default=42, help="Зерно генератора (одинаковое — одинаковая сеть)")
+        parser.add_argument('--prefix', default=generator.DEFAULT_PREFIX, help="Префикс object_id сгенерированных объектов")
+        parser.add_argument('--clear', action='store_true',
+                            help="Удалить ранее сгенерированные объекты с этим префиксом и выйти")
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        start = time.perf_counter()
+        if options['clear']:
+            deleted = generator.clear(prefix)
+            self.stdout.write(self.style.SUCCESS(
+                f"Удалено объектов: {deleted['objects']}, трасс: {deleted['routes']} (префикс {prefix})"
+            ))
+            return
+
+        def progress(counts):
+            self.stdout.write(f"  объектов: {counts['objects']}, трасс: {counts['routes']}")
+
+        counts = generator.generate(options['objects'], seed=options['seed'], prefix=prefix,
+                                    progress=progress if options['verbosity'] > 1 else None)
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано объектов: {counts['objects']}, трасс: {counts['routes']}, "
+            f"записей истории: {counts['history']} за {time.perf_counter() - start:.1f} с"
+        ))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from telecom_net import importer
+
+
+class Command(BaseCommand):
+    help = "Импорт объектов или кабельных трасс из CSV, GeoJSON или XLSX (потоково, пачками)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Путь к файлу")
+        parser.add_argument('--kind', choices=importer.KINDS, default='objects',
+                            help="Что импортировать (по умолчанию objects)")
+        parser.add_argument('--format', choices=importer.FORMATS, dest='fmt',
+                            help="Формат файла (по умолчанию по расширению)")
+        parser.add_argument('--chunk-size', type=int, default=importer.DEFAULT_CHUNK_SIZE,
+                            help="Строк в одной транзакции")
+
+    def handle(self, *args, path, kind, fmt, chunk_size, **options):
+        fmt = fmt or importer.detect_format(path)
+        if fmt is None:
+            raise CommandError("Не удалось определить формат по расширению, укажите --format")
+
+        def progress(report):
+            self.stdout.write(f"  обработано {report.rows}: создано {report.created}, "
+                              f"обновлено {report.updated}, ошибок {report.error_count}")
+
+        try:
+            with open(path, 'rb') as stream:
+                report = importer.import_network(stream, kind, fmt, chunk_size, progress)
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        for error in report.errors:
+            self.stderr.write(f"  строка {error['line']}: {error['error']}")
+        if report.error_count > len(report.errors):
+            self.stderr.write(f"  ... и еще {report.error_count - len(report.errors)} ошибок")
+        self.stdout.write(self.style.SUCCESS(
+            f"Импорт завершен: {report.rows} строк, создано {report.created}, "
+            f"обновлено {report.updated}, ошибок {report.error_count}"
+        ))
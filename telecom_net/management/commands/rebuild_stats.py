@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from telecom_net import stats
+
+
+class Command(BaseCommand):
+    help = "Пересобрать сводную статистику объектов (/api/infrastructure/stats/) с нуля"
+
+    def handle(self, *args, **options):
+        rows = stats.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Статистика пересобрана: {rows} строк"))
@@ -0,0 +1,229 @@
+"""
+Метрики запросов в памяти процесса и их выдача в формате Prometheus.
+
+MetricsMiddleware (middleware.py) заводит на каждый запрос Sample и кладет
+его в contextvar; SQL-запросы учитывает обертка execute_wrapper, которая
+ставится на каждое соединение при его создании, — поэтому учитываются и
+запросы асинхронных views из потоков sync_to_async. Время сериализации —
+.data сериализаторов (serializers.py) и render() JSON-рендереров
+(renderers.py); остальная обработка ответа в middleware в него не входит.
+
+Гистограммы агрегируются по имени view (resolver_match.view_name) и
+отдаются на /api/_metrics. У каждого процесса свои счетчики: Prometheus
+собирает их с каждого воркера. Медленные запросы (SLOW_REQUEST_MS) с
+вероятностью SLOW_REQUEST_SAMPLE пишутся в лог вместе с самыми долгими
+SQL-запросами.
+"""
+
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Запросов, чей SQL хранится для лога медленных (считаются все)
+MAX_RECORDED_QUERIES = 200
+SLOW_LOG_QUERIES = 5
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+_current = ContextVar('metrics_sample', default=None)
+_lock = threading.Lock()
+
+
+def slow_request_ms():
+    return getattr(settings, 'SLOW_REQUEST_MS', 500)
+
+
+def slow_request_sample():
+    return getattr(settings, 'SLOW_REQUEST_SAMPLE', 0.1)
+
+
+class Sample:
+    """Измерения одного запроса"""
+
+    __slots__ = ('start', 'queries', 'db_time', 'sql', 'serialize_time')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.sql = []
+        self.serialize_time = 0.0
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values, extra=''):
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labels):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.series = {}
+
+    def inc(self, values, amount=1):
+        self.series[values] = self.series.get(values, 0) + amount
+
+    def lines(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} counter'
+        for values, total in sorted(self.series.items()):
+            yield f'{self.name}{format_labels(self.labels, values)} {total}'
+
+
+class Histogram:
+    """Счетчики по корзинам хранятся некумулятивно, суммируются при выдаче"""
+
+    def __init__(self, name, documentation, labels, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, values, value):
+        series = self.series.get(values)
+        if series is None:
+            series = self.series[values] = [[0] * (len(self.buckets) + 1), 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def lines(self):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        for values, (counts, total) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f'{self.name}_bucket{format_labels(self.labels, values, le)} {cumulative}'
+            yield f'{self.name}_sum{format_labels(self.labels, values)} {format_number(total)}'
+            yield f'{self.name}_count{format_labels(self.labels, values)} {cumulative}'
+
+
+requests_total = Counter('telecom_http_requests_total', 'Запросы по view, методу и коду ответа',
+                         ('view', 'method', 'status'))
+request_duration = Histogram('telecom_http_request_duration_seconds', 'Полное время обработки запроса',
+                             ('view',), SECONDS_BUCKETS)
+db_queries = Histogram('telecom_db_queries_per_request', 'SQL-запросов на запрос', ('view',), QUERIES_BUCKETS)
+db_duration = Histogram('telecom_db_duration_seconds', 'Время SQL-запросов за запрос', ('view',), SECONDS_BUCKETS)
+serialize_duration = Histogram('telecom_serialize_duration_seconds',
+                               'Время сериализаторов DRF и рендеринга ответа за запрос', ('view',), SECONDS_BUCKETS)
+response_bytes = Histogram('telecom_http_response_bytes', 'Размер тела ответа (кроме потоковых)',
+                           ('view',), BYTES_BUCKETS)
+METRICS = (requests_total, request_duration, db_queries, db_duration, serialize_duration, response_bytes)
+
+
+def reset():
+    with _lock:
+        for metric in METRICS:
+            metric.series.clear()
+
+
+def render():
+    """Все метрики в текстовом формате Prometheus"""
+    with _lock:
+        lines = [line for metric in METRICS for line in metric.lines()]
+    return '\n'.join(lines) + '\n'
+
+
+# ---------------------------
+#   Измерение запроса
+# ---------------------------
+
+def begin():
+    sample = Sample()
+    return sample, _current.set(sample)
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def timed_serialization():
+    """Учесть время блока как сериализацию текущего запроса"""
+    sample = _current.get()
+    if sample is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        sample.serialize_time += time.perf_counter() - start
+
+
+def record_sql(execute, sql, params, many, context):
+    """execute_wrapper: число и время SQL-запросов текущего запроса"""
+    sample = _current.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        sample.queries += 1
+        sample.db_time += duration
+        if len(sample.sql) < MAX_RECORDED_QUERIES:
+            sample.sql.append((duration, sql))
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    # Список оберток у объекта соединения переживает переподключения. В начало:
+    # connection.execute_wrapper() снимает свою обертку с конца списка
+    if record_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_sql)
+
+
+def finish(sample, token, request, response):
+    """Записать измерения запроса в метрики; медленный — в лог с вероятностью SLOW_REQUEST_SAMPLE"""
+    _current.reset(token)
+    duration = time.perf_counter() - sample.start
+    match = getattr(request, 'resolver_match', None)
+    view = match.view_name if match else 'unmatched'
+    labels = (view,)
+    size = None if response.streaming else len(response.content)
+    with _lock:
+        requests_total.inc((view, request.method, str(response.status_code)))
+        request_duration.observe(labels, duration)
+        db_queries.observe(labels, sample.queries)
+        db_duration.observe(labels, sample.db_time)
+        serialize_duration.observe(labels, sample.serialize_time)
+        if size is not None:
+            response_bytes.observe(labels, size)
+
+    if duration * 1000 >= slow_request_ms() and random.random() < slow_request_sample():
+        slowest = sorted(sample.sql, key=lambda item: item[0], reverse=True)[:SLOW_LOG_QUERIES]
+        logger.warning(
+            'Медленный запрос %s %s (%s): %.0f мс, SQL %d шт. / %.0f мс, сериализация %.0f мс%s',
+            request.method, request.get_full_path(), view, duration * 1000, sample.queries,
+            sample.db_time * 1000, sample.serialize_time * 1000,
+            ''.join(f'\n  {seconds * 1000:.1f} мс: {sql}' for seconds, sql in slowest),
+        )
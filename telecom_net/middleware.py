@@ -0,0 +1,35 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from . import metrics
+
+
+class MetricsMiddleware:
+    """
+    Время, SQL, сериализация и размер ответа каждого запроса — в метрики
+    (metrics.py). Стоит первым в MIDDLEWARE, чтобы учитывать весь запрос.
+    Сериализацию замеряют сами сериализаторы и рендереры (serializers.py,
+    renderers.py).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        sample, token = metrics.begin()
+        response = self.get_response(request)
+        metrics.finish(sample, token, request, response)
+        return response
+
+    async def __acall__(self, request):
+        sample, token = metrics.begin()
+        response = await self.get_response(request)
+        metrics.finish(sample, token, request, response)
+        return response
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-17 18:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telecom_net', '0002_alter_cableroute_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='infrastructureobject',
+            name='technology',
+            field=models.CharField(blank=True, choices=[('gpon', 'GPON'), ('adsl', 'ADSL'), ('ethernet', 'Оптика'), ('hybrid', 'Гибридный')], max_length=20, verbose_name='Технология'),
+        ),
+        migrations.AddIndex(
+            model_name='infrastructureobject',
+            index=models.Index(fields=['lat', 'lng'], name='infra_lat_lng_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-17 18:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telecom_net', '0003_infrastructureobject_lat_lng_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletionLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(choices=[('object', 'Объект инфраструктуры'), ('route', 'Кабельная трасса')], max_length=20, verbose_name='Модель')),
+                ('record_id', models.BigIntegerField(verbose_name='ID записи')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата удаления')),
+            ],
+            options={
+                'verbose_name': 'Удаленная запись',
+                'verbose_name_plural': 'Журнал удалений',
+                'ordering': ['-deleted_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='cableroute',
+            index=models.Index(fields=['updated_at'], name='route_updated_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='infrastructureobject',
+            index=models.Index(fields=['updated_at'], name='infra_updated_at_idx'),
+        ),
+    ]
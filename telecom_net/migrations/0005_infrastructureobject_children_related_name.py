@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-17 18:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telecom_net', '0004_deletionlog_and_updated_at_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='infrastructureobject',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='children', to='telecom_net.infrastructureobject', verbose_name='Родительский объект'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-17 18:29
+
+from django.db import migrations, models
+
+
+def build_stats(apps, schema_editor):
+    from telecom_net.stats import rebuild
+
+    rebuild(apps.get_model('telecom_net', 'InfrastructureStat'),
+            apps.get_model('telecom_net', 'InfrastructureObject'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telecom_net', '0005_infrastructureobject_children_related_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InfrastructureStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_type', models.CharField(max_length=20, verbose_name='Тип объекта')),
+                ('technology', models.CharField(blank=True, max_length=20, verbose_name='Технология')),
+                ('status', models.CharField(max_length=20, verbose_name='Статус')),
+                ('is_active', models.BooleanField(verbose_name='Активный')),
+                ('count', models.BigIntegerField(default=0, verbose_name='Количество объектов')),
+                ('capacity', models.BigIntegerField(default=0, verbose_name='Общая емкость')),
+                ('free_ports', models.BigIntegerField(default=0, verbose_name='Свободные порты')),
+            ],
+            options={
+                'verbose_name': 'Статистика объектов',
+                'verbose_name_plural': 'Статистика объектов',
+                'constraints': [models.UniqueConstraint(fields=('object_type', 'technology', 'status', 'is_active'), name='infra_stat_dimensions_uniq')],
+            },
+        ),
+        migrations.RunPython(build_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 5.2.7 on 2026-10-17 19:15
+
+from django.db import migrations, models
+
+
+class SQLiteRunSQL(migrations.RunSQL):
+    """RunSQL только для SQLite: на других СУБД FTS5 нет, поиск идет через icontains"""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'sqlite':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'sqlite':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+CREATE_OBJECT_FTS = [
+    "CREATE VIRTUAL TABLE telecom_net_object_fts USING fts5("
+    "object_id, name, address, technical_notes, notes, "
+    "content='telecom_net_infrastructureobject', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER telecom_net_object_fts_ai AFTER INSERT ON telecom_net_infrastructureobject BEGIN "
+    "INSERT INTO telecom_net_object_fts(rowid, object_id, name, address, technical_notes, notes) "
+    "VALUES (new.id, new.object_id, new.name, new.address, new.technical_notes, new.notes); END",
+    "CREATE TRIGGER telecom_net_object_fts_ad AFTER DELETE ON telecom_net_infrastructureobject BEGIN "
+    "INSERT INTO telecom_net_object_fts(telecom_net_object_fts, rowid, object_id, name, address, technical_notes, notes) "
+    "VALUES ('delete', old.id, old.object_id, old.name, old.address, old.technical_notes, old.notes); END",
+    "CREATE TRIGGER telecom_net_object_fts_au AFTER UPDATE ON telecom_net_infrastructureobject BEGIN "
+    "INSERT INTO telecom_net_object_fts(telecom_net_object_fts, rowid, object_id, name, address, technical_notes, notes) "
+    "VALUES ('delete', old.id, old.object_id, old.name, old.address, old.technical_notes, old.notes); "
+    "INSERT INTO telecom_net_object_fts(rowid, object_id, name, address, technical_notes, notes) "
+    "VALUES (new.id, new.object_id, new.name, new.address, new.technical_notes, new.notes); END",
+    "INSERT INTO telecom_net_object_fts(telecom_net_object_fts) VALUES ('rebuild')",
+]
+
+DROP_OBJECT_FTS = [
+    "DROP TRIGGER IF EXISTS telecom_net_object_fts_ai",
+    "DROP TRIGGER IF EXISTS telecom_net_object_fts_ad",
+    "DROP TRIGGER IF EXISTS telecom_net_object_fts_au",
+    "DROP TABLE IF EXISTS telecom_net_object_fts",
+]
+
+CREATE_ROUTE_FTS = [
+    "CREATE VIRTUAL TABLE telecom_net_route_fts USING fts5("
+    "name, installation_notes, notes, "
+    "content='telecom_net_cableroute', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER telecom_net_route_fts_ai AFTER INSERT ON telecom_net_cableroute BEGIN "
+    "INSERT INTO telecom_net_route_fts(rowid, name, installation_notes, notes) "
+    "VALUES (new.id, new.name, new.installation_notes, new.notes); END",
+    "CREATE TRIGGER telecom_net_route_fts_ad AFTER DELETE ON telecom_net_cableroute BEGIN "
+    "INSERT INTO telecom_net_route_fts(telecom_net_route_fts, rowid, name, installation_notes, notes) "
+    "VALUES ('delete', old.id, old.name, old.installation_notes, old.notes); END",
+    "CREATE TRIGGER telecom_net_route_fts_au AFTER UPDATE ON telecom_net_cableroute BEGIN "
+    "INSERT INTO telecom_net_route_fts(telecom_net_route_fts, rowid, name, installation_notes, notes) "
+    "VALUES ('delete', old.id, old.name, old.installation_notes, old.notes); "
+    "INSERT INTO telecom_net_route_fts(rowid, name, installation_notes, notes) "
+    "VALUES (new.id, new.name, new.installation_notes, new.notes); END",
+    "INSERT INTO telecom_net_route_fts(telecom_net_route_fts) VALUES ('rebuild')",
+]
+
+DROP_ROUTE_FTS = [
+    "DROP TRIGGER IF EXISTS telecom_net_route_fts_ai",
+    "DROP TRIGGER IF EXISTS telecom_net_route_fts_ad",
+    "DROP TRIGGER IF EXISTS telecom_net_route_fts_au",
+    "DROP TABLE IF EXISTS telecom_net_route_fts",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telecom_net', '0007_fulltext_search'),
+    ]
+
+    # SQLite добавляет и удаляет NOT NULL-поля пересозданием таблицы, а вместе с ней
+    # пропадают триггеры FTS5 (см. 0007) — индекс создается заново тем же DDL
+    # после изменения таблиц в обе стороны.
+    operations = [
+        SQLiteRunSQL(migrations.RunSQL.noop, DROP_OBJECT_FTS + CREATE_OBJECT_FTS),
+        SQLiteRunSQL(migrations.RunSQL.noop, DROP_ROUTE_FTS + CREATE_ROUTE_FTS),
+        migrations.AddField(
+            model_name='cableroute',
+            name='route_photo_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='infrastructureobject',
+            name='diagram_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='infrastructureobject',
+            name='photo_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        SQLiteRunSQL(DROP_OBJECT_FTS + CREATE_OBJECT_FTS, migrations.RunSQL.noop),
+        SQLiteRunSQL(DROP_ROUTE_FTS + CREATE_ROUTE_FTS, migrations.RunSQL.noop),
+    ]
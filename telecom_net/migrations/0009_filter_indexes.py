@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-17 19:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telecom_net', '0008_image_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cableroute',
+            index=models.Index(fields=['name'], name='route_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cableroute',
+            index=models.Index(fields=['cable_type', 'name'], name='route_cable_type_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cableroute',
+            index=models.Index(fields=['route_type', 'name'], name='route_route_type_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='infrastructureobject',
+            index=models.Index(fields=['object_type', 'object_id'], name='infra_type_object_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='infrastructureobject',
+            index=models.Index(fields=['technology', 'object_id'], name='infra_tech_object_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='infrastructureobject',
+            index=models.Index(fields=['status', 'object_id'], name='infra_status_object_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='infrastructureobject',
+            index=models.Index(condition=models.Q(('free_ports__gt', 0), ('is_active', True)), fields=['lat', 'lng'], name='infra_connection_point_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('telecom_net', '0009_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='objecthistory',
+            index=models.Index(fields=['performed_date'], name='history_performed_date_idx'),
+        ),
+    ]
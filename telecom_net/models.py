@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, router, transaction
 from django.core.exceptions import ValidationError
 
 
@@ -36,11 +36,14 @@ class InfrastructureObject(models.Model):
     technology = models.CharField(max_length=20, choices=TECHNOLOGIES, blank=True, verbose_name="Технология")
     capacity = models.IntegerField(default=0, verbose_name="Общая емкость")
     free_ports = models.IntegerField(default=0, verbose_name="Свободные порты")
-    parent = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Родительский объект")
+    parent = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='children', verbose_name="Родительский объект")
     
     # Новые поля для изображений
     photo = models.ImageField(upload_to='infrastructure_photos/', blank=True, null=True, verbose_name="Фотография объекта")
     diagram = models.ImageField(upload_to='infrastructure_diagrams/', blank=True, null=True, verbose_name="Схема подключения")
+    # SHA-256 содержимого изображения; заполняется, когда миниатюры готовы (см. thumbnails.py)
+    photo_hash = models.CharField(max_length=64, blank=True, editable=False)
+    diagram_hash = models.CharField(max_length=64, blank=True, editable=False)
     
     # Дополнительные поля для комментариев
     technical_notes = models.TextField(blank=True, verbose_name="Технические примечания")
@@ -59,11 +62,35 @@ class InfrastructureObject(models.Model):
         verbose_name = "Объект инфраструктуры"
         verbose_name_plural = "Объекты инфраструктуры"
         ordering = ['object_id']
+        indexes = [
+            # Выборка по видимой области карты (bbox)
+            models.Index(fields=['lat', 'lng'], name='infra_lat_lng_idx'),
+            # Версия данных карты и инкрементальная синхронизация (since)
+            models.Index(fields=['updated_at'], name='infra_updated_at_idx'),
+            # Фильтры списка (filters.py) и map-data: равенство по полю и
+            # порядок object_id из того же индекса, без сортировки. На is_active
+            # индекса нет: SQLite не использует его для условия WHERE "is_active"
+            models.Index(fields=['object_type', 'object_id'], name='infra_type_object_id_idx'),
+            models.Index(fields=['technology', 'object_id'], name='infra_tech_object_id_idx'),
+            models.Index(fields=['status', 'object_id'], name='infra_status_object_id_idx'),
+            # Точки подключения (check-connection, пакетная проверка, покрытие):
+            # только активные объекты со свободными портами
+            models.Index(fields=['lat', 'lng'], condition=models.Q(is_active=True, free_ports__gt=0),
+                         name='infra_connection_point_idx'),
+        ]
 
     def clean(self):
         if self.free_ports > self.capacity:
             raise ValidationError('Свободных портов не может быть больше общей емкости')
-        
+
+    def save(self, *args, **kwargs):
+        # Прежние значения (pre_save) читаются и дельта статистики (post_save)
+        # пишется в одной транзакции с объектом; в режиме IMMEDIATE она берет
+        # блокировку записи сразу, поэтому параллельные сохранения не смешиваются
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.object_id} - {self.name}"
 
@@ -91,6 +118,7 @@ class CableRoute(models.Model):
     
     # Новые поля для изображений
     route_photo = models.ImageField(upload_to='route_photos/', blank=True, null=True, verbose_name="Фото трассы")
+    route_photo_hash = models.CharField(max_length=64, blank=True, editable=False)
     documentation = models.FileField(upload_to='route_docs/', blank=True, null=True, verbose_name="Документация")
     
     # Дополнительные поля для комментариев
@@ -110,6 +138,13 @@ class CableRoute(models.Model):
         verbose_name = "Кабельная трасса"
         verbose_name_plural = "Кабельные трассы"
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['updated_at'], name='route_updated_at_idx'),
+            # Порядок списка и фильтры filter_routes — без сортировки всей таблицы
+            models.Index(fields=['name'], name='route_name_idx'),
+            models.Index(fields=['cable_type', 'name'], name='route_cable_type_name_idx'),
+            models.Index(fields=['route_type', 'name'], name='route_route_type_name_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.length}м)"
@@ -135,6 +170,56 @@ class ObjectHistory(models.Model):
         verbose_name = "История объекта"
         verbose_name_plural = "История объектов"
         ordering = ['-performed_date']
+        indexes = [
+            # Порядок списка и курсор страниц (pagination.py): performed_date, id — из индекса
+            models.Index(fields=['performed_date'], name='history_performed_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.infrastructure_object} - {self.action} - {self.performed_date}"
+
+
+# Журнал удалений для инкрементальной синхронизации карты (map-data?since=)
+class DeletionLog(models.Model):
+    MODEL_CHOICES = [
+        ('object', 'Объект инфраструктуры'),
+        ('route', 'Кабельная трасса'),
+    ]
+
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES, verbose_name="Модель")
+    record_id = models.BigIntegerField(verbose_name="ID записи")
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Дата удаления")
+
+    class Meta:
+        verbose_name = "Удаленная запись"
+        verbose_name_plural = "Журнал удалений"
+        ordering = ['-deleted_at']
+
+    def __str__(self):
+        return f"{self.get_model_display()} #{self.record_id} - {self.deleted_at}"
+
+
+# Сводная статистика (read model) для /api/infrastructure/stats/.
+# Одна строка на сочетание измерений; поддерживается дельтами из сигналов
+# (см. stats.py) и перестраивается командой rebuild_stats.
+class InfrastructureStat(models.Model):
+    object_type = models.CharField(max_length=20, verbose_name="Тип объекта")
+    technology = models.CharField(max_length=20, blank=True, verbose_name="Технология")
+    status = models.CharField(max_length=20, verbose_name="Статус")
+    is_active = models.BooleanField(verbose_name="Активный")
+    count = models.BigIntegerField(default=0, verbose_name="Количество объектов")
+    capacity = models.BigIntegerField(default=0, verbose_name="Общая емкость")
+    free_ports = models.BigIntegerField(default=0, verbose_name="Свободные порты")
+
+    class Meta:
+        verbose_name = "Статистика объектов"
+        verbose_name_plural = "Статистика объектов"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['object_type', 'technology', 'status', 'is_active'],
+                name='infra_stat_dimensions_uniq',
+            ),
+        ]
 
     def __str__(self):
-        return f"{self.infrastructure_object} - {self.action} - {self.performed_date}"
\ No newline at end of file
+        return f"{self.object_type}/{self.technology}/{self.status}/{self.is_active}: {self.count}"
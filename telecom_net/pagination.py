@@ -0,0 +1,139 @@
+"""
+Постраничная выдача списков по ключу (keyset): курсор хранит значения
+полей сортировки последней строки страницы, следующая страница — строки
+строго после них. В отличие от OFFSET, страница на любой глубине — это
+диапазон индекса длиной page_size + 1, без пропуска предыдущих строк.
+
+Последнее поле ordering — уникальное (id), поэтому порядок полный и
+строки с одинаковым name или performed_date не теряются на границе страниц.
+"""
+
+import base64
+import binascii
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Ответ: {'next': url, 'previous': url, 'results': [...]}; ordering задается в подклассе"""
+
+    ordering = ('id',)
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    invalid_cursor_message = 'Некорректный курсор'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return api_settings.PAGE_SIZE or 100
+        return min(max(size, 1), self.max_page_size)
+
+    # ---------------------------
+    #   Курсор
+    # ---------------------------
+
+    def encode_cursor(self, obj, reverse):
+        position = [getattr(obj, name.lstrip('-')) for name in self.ordering]
+        data = json.dumps({'p': position, 'r': int(reverse)}, default=str, separators=(',', ':'))
+        cursor = base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request, model):
+        """(значения полей сортировки, назад ли) или None для первой страницы"""
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            position, reverse = data['p'], bool(data['r'])
+            if len(position) != len(self.ordering):
+                raise ValueError
+            values = [model._meta.get_field(name.lstrip('-')).to_python(value)
+                      for name, value in zip(self.ordering, position)]
+        except (binascii.Error, ValueError, TypeError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    def after(self, values, reverse):
+        """
+        Строки после позиции values в порядке ordering (перед ней, если reverse):
+        f1 > v1 OR (f1 = v1 AND f2 > v2) ... Условие f1 >= v1 дублирует первую
+        ветку — по нему SQLite выбирает диапазон индекса вместо просмотра.
+        """
+        lookups = []
+        for name in self.ordering:
+            descending = name.startswith('-') != reverse
+            lookups.append((name.lstrip('-'), 'lt' if descending else 'gt'))
+
+        branches = []
+        for i, (name, lookup) in enumerate(lookups):
+            equal = {field: value for (field, _), value in zip(lookups[:i], values)}
+            branches.append(Q(**equal, **{f'{name}__{lookup}': values[i]}))
+        first, lookup = lookups[0]
+        return Q(**{f'{first}__{lookup}e': values[0]}) & reduce(or_, branches)
+
+    # ---------------------------
+    #   Страница
+    # ---------------------------
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        self.base_url = remove_query_param(request.build_absolute_uri(), self.cursor_query_param)
+        position = self.decode_cursor(request, queryset.model)
+        reverse = position is not None and position[1]
+
+        ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering] \
+            if reverse else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(*position))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        page = rows[:self.page_size]
+        if reverse:
+            page.reverse()
+
+        # Назад от курсора — впереди есть хотя бы строка, с которой пришли; вперед — то же для предыдущих
+        has_next = has_more if not reverse else True
+        has_previous = has_more if reverse else position is not None
+        self.next = self.encode_cursor(page[-1], reverse=False) if page and has_next else None
+        self.previous = self.encode_cursor(page[0], reverse=True) if page and has_previous else None
+        return page
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.next, 'previous': self.previous, 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class ObjectPagination(KeysetPagination):
+    ordering = ('object_id', 'id')
+
+
+class RoutePagination(KeysetPagination):
+    ordering = ('name', 'id')
+
+
+class HistoryPagination(KeysetPagination):
+    ordering = ('-performed_date', '-id')
@@ -0,0 +1,214 @@
+"""
+Пакетная проверка подключения (квалификация адресов списком).
+
+Точки подключения (активные объекты со свободными портами) в прямоугольнике
+вокруг всех точек запроса загружаются одним запросом в снимок — массивы,
+отсортированные по широте. Точки запроса группируются по ячейкам сетки
+(как в spatial), и для каждой группы расстояния до кандидатов из полосы
+широт считаются одной матрицей haversine. Результаты отдаются частями в
+порядке входа, поэтому ответ можно стримить.
+"""
+
+import math
+
+import numpy as np
+
+from .geo import haversine
+from .spatial import CELL_SIZE_DEG, METERS_PER_DEGREE
+
+# Радиус, в котором подключение считается возможным (м)
+CONNECTION_RADIUS = 2000
+# Радиус поиска ближайшей точки, если в CONNECTION_RADIUS ничего нет (м)
+SEARCH_RADIUS = 5000
+NEAREST_LIMIT = 10
+# Точек запроса в одной части выдачи
+POINTS_PER_PART = 1000
+# Предел размера матрицы расстояний (точки × кандидаты), ≈ 16 МБ float64
+MATRIX_LIMIT = 2_000_000
+
+
+def connection_technology(technologies):
+    """Технология подключения по набору технологий ближайших точек (как в check_connection)"""
+    if not technologies:
+        return None
+    return 'GPON' if 'gpon' in technologies else 'ADSL' if 'adsl' in technologies else 'Ethernet'
+
+
+def degree_margins(lat, radius):
+    """Запас в градусах (широта, долгота), покрывающий radius (м) около широты lat"""
+    cos_lat = max(math.cos(math.radians(min(abs(lat), 89.0))), 1e-6)
+    return radius / METERS_PER_DEGREE, radius / (METERS_PER_DEGREE * cos_lat)
+
+
+def parse_point(raw):
+    """(address, lat, lng) из dict точки; ValueError с описанием ошибки"""
+    if not isinstance(raw, dict):
+        raise ValueError('Точка должна быть объектом с lat и lng')
+    try:
+        lat, lng = float(raw['lat']), float(raw['lng'])
+    except KeyError as exc:
+        raise ValueError(f'Не указано поле {exc.args[0]}')
+    except (TypeError, ValueError):
+        raise ValueError('Некорректные координаты')
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError('Координаты вне допустимого диапазона')
+    return str(raw.get('address') or ''), lat, lng
+
+
+def connection_points_in(min_lat, max_lat, min_lng, max_lng):
+    """Строки снимка: точки подключения в прямоугольнике (частичный индекс, без сортировки)"""
+    from .models import InfrastructureObject
+
+    return InfrastructureObject.objects.filter(
+        is_active=True, free_ports__gt=0, lat__range=(min_lat, max_lat), lng__range=(min_lng, max_lng),
+    ).order_by().values_list('id', 'object_id', 'name', 'technology', 'free_ports', 'lat', 'lng')
+
+
+class Snapshot:
+    """Точки подключения: массивы по возрастанию широты и карточки для выдачи"""
+
+    def __init__(self, rows):
+        rows = sorted(rows, key=lambda row: row[5])
+        self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.lats = np.array([row[5] for row in rows], dtype=np.float64)
+        self.lngs = np.array([row[6] for row in rows], dtype=np.float64)
+        self.cards = [
+            {'id': pk, 'object_id': object_id, 'name': name, 'technology': technology, 'free_ports': free_ports}
+            for pk, object_id, name, technology, free_ports, _, _ in rows
+        ]
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def load(cls, lats, lngs, radius):
+        """Точки подключения в прямоугольнике вокруг lats/lngs с запасом radius (м)"""
+        if not len(lats):
+            return cls([])
+        dlat, dlng = degree_margins(max(abs(lats.min()), abs(lats.max())), radius)
+        rows = connection_points_in(lats.min() - dlat, lats.max() + dlat, lngs.min() - dlng, lngs.max() + dlng)
+        return cls(rows.iterator(chunk_size=5000))
+
+    def candidates(self, min_lat, max_lat, min_lng, max_lng):
+        """Номера кандидатов в прямоугольнике: полоса широт двумя searchsorted, затем долгота"""
+        lo = np.searchsorted(self.lats, min_lat, side='left')
+        hi = np.searchsorted(self.lats, max_lat, side='right')
+        window = np.arange(lo, hi)
+        lngs = self.lngs[lo:hi]
+        return window[(lngs >= min_lng) & (lngs <= max_lng)]
+
+
+class BatchChecker:
+    """Проверка набора точек по общему снимку точек подключения"""
+
+    def __init__(self, snapshot, connection_radius, search_radius, limit=NEAREST_LIMIT):
+        self.snapshot = snapshot
+        self.connection_radius = connection_radius
+        self.search_radius = search_radius
+        self.limit = limit
+
+    def check(self, lats, lngs):
+        """
+        Для каждой точки: список (distance, номер в снимке) — до limit
+        ближайших в connection_radius, а если таких нет — одна ближайшая в
+        search_radius (или пустой список).
+        """
+        result = [[] for _ in range(len(lats))]
+        for block, nearest, distances in self.nearest(lats, lngs):
+            for row, point in enumerate(block.tolist()):
+                in_range = distances[row] <= self.connection_radius
+                if in_range.any():
+                    result[point] = list(zip(distances[row][in_range].tolist(), nearest[row][in_range].tolist()))
+                elif distances[row][0] <= self.search_radius:
+                    result[point] = [(float(distances[row][0]), int(nearest[row][0]))]
+        return result
+
+    def nearest(self, lats, lngs):
+        """
+        Ближайшие кандидаты блоками: (номера точек, номера в снимке, расстояния) —
+        матрицы до limit столбцов по возрастанию расстояния. Точки без
+        кандидатов в search_radius в блоки не попадают.
+        """
+        if not len(lats) or not len(self.snapshot):
+            return
+        rows = np.floor(lats / CELL_SIZE_DEG).astype(np.int64)
+        cols = np.floor(lngs / CELL_SIZE_DEG).astype(np.int64)
+        order = np.lexsort((cols, rows))
+        # Границы групп — смена ячейки в отсортированном порядке
+        changes = np.flatnonzero((np.diff(rows[order]) != 0) | (np.diff(cols[order]) != 0)) + 1
+        for group in np.split(order, changes):
+            yield from self._nearest_in_group(group, lats, lngs)
+
+    def _nearest_in_group(self, group, lats, lngs):
+        group_lats, group_lngs = lats[group], lngs[group]
+        dlat, dlng = degree_margins(max(abs(group_lats.min()), abs(group_lats.max())), self.search_radius)
+        candidates = self.snapshot.candidates(
+            group_lats.min() - dlat, group_lats.max() + dlat, group_lngs.min() - dlng, group_lngs.max() + dlng
+        )
+        if not len(candidates):
+            return
+        cand_lats, cand_lngs = self.snapshot.lats[candidates], self.snapshot.lngs[candidates]
+        step = max(1, MATRIX_LIMIT // len(candidates))
+        k = min(self.limit, len(candidates))
+        for start in range(0, len(group), step):
+            block = group[start:start + step]
+            distances = haversine(lats[block, None], lngs[block, None], cand_lats[None, :], cand_lngs[None, :])
+            nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+            nearest_distances = np.take_along_axis(distances, nearest, axis=1)
+            ranked = np.argsort(nearest_distances, axis=1, kind='stable')
+            yield (block, candidates[np.take_along_axis(nearest, ranked, axis=1)],
+                   np.take_along_axis(nearest_distances, ranked, axis=1))
+
+    def describe(self, address, lat, lng, nearest):
+        """Результат по точке для выдачи"""
+        cards = self.snapshot.cards
+        objects = [{**cards[i], 'distance': int(distance)} for distance, i in nearest]
+        available = bool(objects) and nearest[0][0] <= self.connection_radius
+        technologies = {obj['technology'] for obj in objects if obj['technology']} if available else set()
+        return {
+            'address': address,
+            'lat': lat,
+            'lng': lng,
+            'status': 'available' if available else 'unavailable',
+            'available': available,
+            'technology': connection_technology(technologies),
+            'distance': objects[0]['distance'] if objects else None,
+            'nearest_objects': objects,
+        }
+
+
+def check_points(points, connection_radius=CONNECTION_RADIUS, search_radius=SEARCH_RADIUS,
+                 part_size=POINTS_PER_PART):
+    """
+    Проверка списка точек (dict с lat, lng и необязательным address).
+    Снимок загружается сразу; возвращает генератор частей — списков
+    результатов в порядке входа (index — номер точки во входе).
+    """
+    parsed, errors = [], {}
+    for number, raw in enumerate(points):
+        try:
+            parsed.append((number, *parse_point(raw)))
+        except ValueError as exc:
+            errors[number] = str(exc)
+    lats = np.array([lat for _, _, lat, _ in parsed], dtype=np.float64)
+    lngs = np.array([lng for _, _, _, lng in parsed], dtype=np.float64)
+    checker = BatchChecker(Snapshot.load(lats, lngs, search_radius), connection_radius, search_radius)
+    return _parts(checker, parsed, errors, lats, lngs, len(points), part_size)
+
+
+def _parts(checker, parsed, errors, lats, lngs, total, part_size):
+    position = 0
+    for start in range(0, total, part_size):
+        stop = min(start + part_size, total)
+        # Разобранные точки этой части входа — подряд идущий срез parsed
+        end = position
+        while end < len(parsed) and parsed[end][0] < stop:
+            end += 1
+        nearest = checker.check(lats[position:end], lngs[position:end])
+        found = {number: checker.describe(address, lat, lng, nearest[i - position])
+                 for i, (number, address, lat, lng) in enumerate(parsed[position:end], start=position)}
+        position = end
+        yield [
+            {'index': number, **found[number]} if number in found else {'index': number, 'error': errors[number]}
+            for number in range(start, stop)
+        ]
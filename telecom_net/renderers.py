@@ -0,0 +1,23 @@
+from rest_framework.renderers import JSONRenderer
+
+from . import metrics
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer, время render() которого учитывается в метриках запроса
+    как сериализация (metrics.py). Рендерер по умолчанию для DRF.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with metrics.timed_serialization():
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class CompactJSONRenderer(TimedJSONRenderer):
+    """
+    JSON без отступов, выбирается параметром ?format=compact.
+    View определяет по request.accepted_renderer.format, что нужен
+    колоночный компактный ответ.
+    """
+    format = 'compact'
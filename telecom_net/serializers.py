@@ -1,29 +1,56 @@
+from django.db.models import Func, IntegerField, OuterRef, Subquery
 from django.urls import reverse
 from rest_framework import serializers
+from . import metrics, thumbnails
 from .models import InfrastructureObject, CableRoute, ObjectHistory
 
+# Подстановочный id для шаблона ссылки на админку (reverse один раз на список)
+EDIT_URL_PLACEHOLDER = 'OBJECT_ID'
 
-class InfrastructureObjectSerializer(serializers.ModelSerializer):
+
+class TimedListSerializer(serializers.ListSerializer):
+    @property
+    def data(self):
+        with metrics.timed_serialization():
+            return super().data
+
+
+class TimedModelSerializer(serializers.ModelSerializer):
+    """
+    Время .data учитывается в метриках запроса как сериализация (metrics.py);
+    для many=True — через Meta.list_serializer_class = TimedListSerializer.
+    """
+
+    @property
+    def data(self):
+        with metrics.timed_serialization():
+            return super().data
+
+
+class InfrastructureObjectSerializer(TimedModelSerializer):
     object_type_display = serializers.CharField(source='get_object_type_display', read_only=True)
     technology_display = serializers.CharField(source='get_technology_display', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     parent_name = serializers.CharField(source='parent.name', read_only=True)
 
     photo_url = serializers.SerializerMethodField()
+    photo_thumbnails = serializers.SerializerMethodField()
     diagram_url = serializers.SerializerMethodField()
+    diagram_thumbnails = serializers.SerializerMethodField()
     children_count = serializers.SerializerMethodField()
 
     edit_url = serializers.SerializerMethodField()
 
     class Meta:
         model = InfrastructureObject
+        list_serializer_class = TimedListSerializer
         fields = [
             'id', 'object_id', 'name', 'object_type', 'object_type_display',
             'technology', 'technology_display', 'status', 'status_display',
             'address', 'lat', 'lng', 'capacity', 'free_ports',
             'parent', 'parent_name',
-            'photo', 'photo_url',
-            'diagram', 'diagram_url',
+            'photo', 'photo_url', 'photo_thumbnails',
+            'diagram', 'diagram_url', 'diagram_thumbnails',
             'technical_notes',
             'installation_date',
             'last_maintenance',
@@ -36,28 +63,55 @@ class InfrastructureObjectSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Родитель и число дочерних объектов в том же запросе, что и список.
+        Число — коррелированным подзапросом по индексу parent_id: с
+        Count('children') весь список группировался во временном B-дереве.
+        """
+        children = InfrastructureObject.objects.filter(parent=OuterRef('pk')).order_by().annotate(
+            count=Func('pk', function='COUNT', output_field=IntegerField())
+        ).values('count')
+        return queryset.select_related('parent').annotate(children_count=Subquery(children))
+
     # Фото объекта
     def get_photo_url(self, obj):
         if obj.photo:
             return obj.photo.url
         return None
 
+    # Миниатюры фото {size: {webp, jpeg}}; None, пока не построены
+    def get_photo_thumbnails(self, obj):
+        return thumbnails.urls(obj.photo_hash) if obj.photo else None
+
     # Файл схемы
     def get_diagram_url(self, obj):
         if obj.diagram:
             return obj.diagram.url
         return None
 
-    # ❗ Исправленный children_count
+    def get_diagram_thumbnails(self, obj):
+        return thumbnails.urls(obj.diagram_hash) if obj.diagram else None
+
+    # Аннотация из setup_eager_loading; без нее — отдельный COUNT
     def get_children_count(self, obj):
-        return InfrastructureObject.objects.filter(parent=obj).count()
+        count = getattr(obj, 'children_count', None)
+        if count is None:
+            count = obj.children.count()
+        return count
 
     # ✅ Ссылка на редактирование объекта в Django Admin
     def get_edit_url(self, obj):
-        return reverse('admin:telecom_net_infrastructureobject_change', args=[obj.id])
+        template = getattr(self, '_edit_url_template', None)
+        if template is None:
+            template = self._edit_url_template = reverse(
+                'admin:telecom_net_infrastructureobject_change', args=[EDIT_URL_PLACEHOLDER]
+            )
+        return template.replace(EDIT_URL_PLACEHOLDER, str(obj.id))
 
 
-class CableRouteSerializer(serializers.ModelSerializer):
+class CableRouteSerializer(TimedModelSerializer):
     from_object_name = serializers.CharField(source='from_object.name', read_only=True)
     from_object_type = serializers.CharField(source='from_object.object_type', read_only=True)
 
@@ -68,9 +122,11 @@ class CableRouteSerializer(serializers.ModelSerializer):
     route_type_display = serializers.CharField(source='get_route_type_display', read_only=True)
 
     route_photo_url = serializers.SerializerMethodField()
+    route_photo_thumbnails = serializers.SerializerMethodField()
 
     class Meta:
         model = CableRoute
+        list_serializer_class = TimedListSerializer
         fields = [
             'id', 'name',
             'from_object', 'from_object_name', 'from_object_type',
@@ -78,7 +134,7 @@ class CableRouteSerializer(serializers.ModelSerializer):
             'cable_type', 'cable_type_display',
             'route_type', 'route_type_display',
             'length', 'fiber_count',
-            'route_photo', 'route_photo_url',
+            'route_photo', 'route_photo_url', 'route_photo_thumbnails',
             'documentation',
             'installation_notes',
             'technical_specs',
@@ -90,18 +146,26 @@ class CableRouteSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('from_object', 'to_object')
+
     def get_route_photo_url(self, obj):
         if obj.route_photo:
             return obj.route_photo.url
         return None
 
+    def get_route_photo_thumbnails(self, obj):
+        return thumbnails.urls(obj.route_photo_hash) if obj.route_photo else None
+
 
-class ObjectHistorySerializer(serializers.ModelSerializer):
+class ObjectHistorySerializer(TimedModelSerializer):
     action_display = serializers.CharField(source='get_action_display', read_only=True)
     photo_url = serializers.SerializerMethodField()
 
     class Meta:
         model = ObjectHistory
+        list_serializer_class = TimedListSerializer
         fields = '__all__'
 
     def get_photo_url(self, obj):
@@ -0,0 +1,149 @@
+"""
+Сигналы моделей: поддержка производных структур в актуальном состоянии.
+
+Изменения применяются через transaction.on_commit, чтобы откатанные
+транзакции не попадали в индексы и кэши.
+"""
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import autocomplete, coverage, graph, impact, spatial, stats, thumbnails, tiles
+from .models import CableRoute, DeletionLog, InfrastructureObject
+
+# Поля, прежние значения которых нужны обработчикам post_save
+OBJECT_TRACKED_FIELDS = tuple(dict.fromkeys(
+    ('lat', 'lng', 'photo', 'diagram') + stats.TRACKED_FIELDS + impact.TRACKED_FIELDS + coverage.TRACKED_FIELDS
+))
+ROUTE_TRACKED_FIELDS = ('from_object_id', 'to_object_id', 'route_photo')
+
+
+def remember_previous(instance, fields):
+    """Сохранить в instance._previous значения полей до сохранения (None для новых)"""
+    previous = None
+    if instance.pk is not None:
+        previous = type(instance).objects.filter(pk=instance.pk).values(*fields).first()
+    instance._previous = previous
+
+
+def reset_thumbnails(instance):
+    """Новое изображение: миниатюры прежнего больше не подходят"""
+    for _, hash_field in thumbnails.changed_fields(instance, instance._previous):
+        setattr(instance, hash_field, '')
+
+
+def schedule_thumbnails(instance):
+    """После коммита построить миниатюры для загруженных изображений"""
+    model, pk = type(instance), instance.pk
+    for field, hash_field in thumbnails.changed_fields(instance, getattr(instance, '_previous', None)):
+        if getattr(instance, field):
+            transaction.on_commit(lambda field=field, hash_field=hash_field: thumbnails.schedule(model, pk, field, hash_field))
+
+
+def object_points(ids):
+    """Координаты объектов по списку id"""
+    return list(InfrastructureObject.objects.filter(pk__in=ids).values_list('lat', 'lng'))
+
+
+def route_neighbour_points(obj_pks):
+    """Координаты противоположных концов трасс, подключенных к объектам obj_pks"""
+    obj_pks = set(obj_pks)
+    ends = CableRoute.objects.filter(
+        Q(from_object__in=obj_pks) | Q(to_object__in=obj_pks)
+    ).values_list('from_object_id', 'to_object_id')
+    return object_points({pk for pair in ends for pk in pair} - obj_pks)
+
+
+@receiver(pre_save, sender=InfrastructureObject)
+def infrastructure_object_pre_save(sender, instance, **kwargs):
+    remember_previous(instance, OBJECT_TRACKED_FIELDS)
+    reset_thumbnails(instance)
+
+
+@receiver(post_save, sender=InfrastructureObject)
+def infrastructure_object_saved(sender, instance, created, **kwargs):
+    pk, lat, lng = instance.pk, instance.lat, instance.lng
+    eligible = spatial.is_connection_point(instance)
+    transaction.on_commit(lambda: spatial.sync_point(pk, lat, lng, eligible))
+    fields = (instance.object_id, instance.name, instance.address, instance.object_type, lat, lng)
+    indexed = autocomplete.is_indexed(instance)
+    transaction.on_commit(lambda: autocomplete.sync_object(pk, fields, indexed))
+    schedule_thumbnails(instance)
+
+    previous = getattr(instance, '_previous', None)
+    # Транзакцию открывает InfrastructureObject.save: previous прочитан в ней же
+    stats.object_changed(
+        {field: previous[field] for field in stats.TRACKED_FIELDS} if previous else None,
+        stats.snapshot(instance),
+    )
+
+    if previous is None or any(previous[field] != getattr(instance, field) for field in impact.TRACKED_FIELDS):
+        transaction.on_commit(impact.invalidate)
+
+    points = [(lat, lng)]
+    if previous:
+        points.append((previous['lat'], previous['lng']))
+
+    # Покрытие меняет только точка подключения — до или после сохранения
+    was_connection_point = bool(previous) and previous['is_active'] and (previous['free_ports'] or 0) > 0
+    if (eligible or was_connection_point) and (
+        previous is None or any(previous[field] != getattr(instance, field) for field in coverage.TRACKED_FIELDS)
+    ):
+        coverage_points = list(points)
+        transaction.on_commit(lambda: coverage.objects_changed(coverage_points))
+
+    if not created:
+        # Геометрия подключенных трасс видна и в тайлах их других концов
+        points += route_neighbour_points([pk])
+    transaction.on_commit(lambda: tiles.invalidate_points(points))
+
+
+@receiver(pre_delete, sender=InfrastructureObject)
+def infrastructure_object_pre_delete(sender, instance, **kwargs):
+    # Удаление (Collector) идет в транзакции с pre_delete и post_delete: значения
+    # для статистики — из БД в ней же, а не из экземпляра, который мог устареть
+    remember_previous(instance, stats.TRACKED_FIELDS)
+
+
+@receiver(post_delete, sender=InfrastructureObject)
+def infrastructure_object_deleted(sender, instance, **kwargs):
+    pk = instance.pk
+    DeletionLog.objects.create(model='object', record_id=pk)
+    stats.object_deleted(getattr(instance, '_previous', None) or stats.snapshot(instance))
+    points = [(instance.lat, instance.lng)]
+    transaction.on_commit(lambda: spatial.remove_object(pk))
+    transaction.on_commit(lambda: autocomplete.remove_object(pk))
+    transaction.on_commit(impact.invalidate)
+    if spatial.is_connection_point(instance):
+        transaction.on_commit(lambda: coverage.objects_changed(points))
+    transaction.on_commit(lambda: tiles.invalidate_points(points))
+
+
+@receiver(pre_save, sender=CableRoute)
+def cable_route_pre_save(sender, instance, **kwargs):
+    remember_previous(instance, ROUTE_TRACKED_FIELDS)
+    reset_thumbnails(instance)
+
+
+@receiver(post_save, sender=CableRoute)
+def cable_route_saved(sender, instance, **kwargs):
+    schedule_thumbnails(instance)
+    ids = {instance.from_object_id, instance.to_object_id}
+    previous = getattr(instance, '_previous', None)
+    if previous:
+        ids |= {previous['from_object_id'], previous['to_object_id']}
+    points = object_points(ids)
+    transaction.on_commit(lambda: tiles.invalidate_points(points))
+    transaction.on_commit(graph.invalidate)
+    transaction.on_commit(impact.invalidate)
+
+
+@receiver(post_delete, sender=CableRoute)
+def cable_route_deleted(sender, instance, **kwargs):
+    DeletionLog.objects.create(model='route', record_id=instance.pk)
+    points = object_points({instance.from_object_id, instance.to_object_id})
+    transaction.on_commit(lambda: tiles.invalidate_points(points))
+    transaction.on_commit(graph.invalidate)
+    transaction.on_commit(impact.invalidate)
@@ -0,0 +1,214 @@
+"""
+Пространственный индекс точек подключения (grid / geohash-ячейки).
+
+Индекс хранит только «точки подключения» — активные объекты со свободными
+портами — и разбивает их по ячейкам фиксированного размера в градусах.
+Поиск в радиусе просматривает только ячейки, попадающие в bounding box
+окружности, поэтому стоимость запроса зависит от плотности сети рядом с
+точкой, а не от общего числа объектов.
+
+Индекс живёт в памяти процесса: строится лениво из БД при первом обращении
+и поддерживается в актуальном состоянии сигналами модели (см. signals.py).
+Каждое изменение повышает общую версию (versions.py): процесс, применивший
+его сам, обновляет свой индекс на месте, остальные процессы перестраивают
+индекс при следующем обращении.
+"""
+
+import math
+import threading
+from collections import defaultdict
+
+from . import versions
+from .geo import PointSet
+
+# ≈ 2.2 км по широте — радиус 2 км покрывает не больше 3x3 ячеек
+CELL_SIZE_DEG = 0.02
+
+METERS_PER_DEGREE = 111320.0
+
+
+def is_connection_point(obj):
+    """Объект пригоден для подключения: активен и есть свободные порты"""
+    return bool(obj.is_active) and (obj.free_ports or 0) > 0
+
+
+class GridIndex:
+    """Индекс точек по ячейкам сетки: cell -> {id: (lat, lng)}"""
+
+    def __init__(self, cell_size=CELL_SIZE_DEG):
+        self.cell_size = cell_size
+        self._cells = defaultdict(dict)
+        self._points = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, pk):
+        return pk in self._points
+
+    def cell_of(self, lat, lng):
+        return (math.floor(lat / self.cell_size), math.floor(lng / self.cell_size))
+
+    def insert(self, pk, lat, lng):
+        with self._lock:
+            self.remove(pk)
+            cell = self.cell_of(lat, lng)
+            self._cells[cell][pk] = (lat, lng)
+            self._points[pk] = cell
+
+    def remove(self, pk):
+        with self._lock:
+            cell = self._points.pop(pk, None)
+            if cell is None:
+                return
+            bucket = self._cells[cell]
+            bucket.pop(pk, None)
+            if not bucket:
+                del self._cells[cell]
+
+    def clear(self):
+        with self._lock:
+            self._cells.clear()
+            self._points.clear()
+
+    @staticmethod
+    def margins(lat, radius):
+        """Полуразмеры bounding box окружности радиусом radius (м) в градусах"""
+        dlat = radius / METERS_PER_DEGREE
+        cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+        return dlat, radius / (METERS_PER_DEGREE * cos_lat)
+
+    def cells_in_radius(self, lat, lng, radius):
+        """Ячейки, пересекающие bounding box окружности радиусом radius (м)"""
+        dlat, dlng = self.margins(lat, radius)
+        min_row, min_col = self.cell_of(lat - dlat, lng - dlng)
+        max_row, max_col = self.cell_of(lat + dlat, lng + dlng)
+        for row in range(min_row, max_row + 1):
+            for col in range(min_col, max_col + 1):
+                yield (row, col)
+
+    def candidates(self, lat, lng, radius):
+        """Точки из ячеек вокруг (lat, lng): список (id, lat, lng)"""
+        result = []
+        with self._lock:
+            for cell in self.cells_in_radius(lat, lng, radius):
+                bucket = self._cells.get(cell)
+                if bucket:
+                    result.extend((pk, p_lat, p_lng) for pk, (p_lat, p_lng) in bucket.items())
+        return result
+
+    def point_set(self, lat, lng, radius):
+        """Кандидаты вокруг (lat, lng) в виде массивов для geo-движка"""
+        return PointSet.from_rows(self.candidates(lat, lng, radius))
+
+    def nearest(self, lat, lng, radius, k=10):
+        """
+        До k ближайших точек в радиусе radius (м): список (distance, id),
+        отсортированный по расстоянию.
+        """
+        return self.point_set(lat, lng, radius).nearest(lat, lng, k=k, max_distance=radius)
+
+    def cell_count(self, lat, lng, radius):
+        """Число ячеек, которые просмотрит поиск в радиусе radius (м)"""
+        dlat, dlng = self.margins(lat, radius)
+        min_row, min_col = self.cell_of(lat - dlat, lng - dlng)
+        max_row, max_col = self.cell_of(lat + dlat, lng + dlng)
+        return (max_row - min_row + 1) * (max_col - min_col + 1)
+
+    def nearest_any(self, lat, lng, radius):
+        """
+        Ближайшая точка на любом расстоянии: [(distance, id)] или [], если
+        индекс пуст. Радиус удваивается от radius, пока в него не попадет точка;
+        когда ячеек в радиусе больше, чем занятых, — перебор всех точек.
+        """
+        while True:
+            with self._lock:
+                if not self._points:
+                    return []
+                if self.cell_count(lat, lng, radius) > len(self._cells):
+                    rows = [(pk, p_lat, p_lng) for bucket in self._cells.values()
+                            for pk, (p_lat, p_lng) in bucket.items()]
+                    return PointSet.from_rows(rows).nearest(lat, lng, k=1)
+            found = self.nearest(lat, lng, radius, k=1)
+            if found:
+                return found
+            radius *= 2
+
+
+connection_points = GridIndex()
+VERSION = 'spatial'
+# Общая версия, которой соответствует индекс процесса (None — не загружен)
+_version = None
+_load_lock = threading.Lock()
+
+
+def get_index():
+    """Индекс точек подключения; строится из БД при первом обращении и после изменений в других процессах"""
+    if _version != versions.current(VERSION):
+        with _load_lock:
+            version = versions.current(VERSION)
+            if _version != version:
+                rebuild(version)
+    return connection_points
+
+
+def rebuild(version=None):
+    """Полностью перестроить индекс по текущему состоянию БД"""
+    global _version
+    from .models import InfrastructureObject
+
+    # Версия — до чтения: изменение, закоммиченное во время чтения, вызовет еще одну перестройку
+    if version is None:
+        version = versions.current(VERSION)
+    # Без сортировки — покрывающий частичный индекс infra_connection_point_idx
+    rows = InfrastructureObject.objects.filter(
+        is_active=True, free_ports__gt=0
+    ).order_by().values_list('id', 'lat', 'lng')
+
+    with connection_points._lock:
+        connection_points.clear()
+        for pk, lat, lng in rows.iterator(chunk_size=5000):
+            connection_points.insert(pk, lat, lng)
+        _version = version
+
+
+def invalidate():
+    """Сбросить индекс во всех процессах — он будет перестроен при следующем обращении"""
+    global _version
+    with _load_lock:
+        versions.bump(VERSION)
+        connection_points.clear()
+        _version = None
+
+
+def changed():
+    """
+    Новая версия после изменения объекта. True — индекс процесса был актуален
+    и изменение нужно применить к нему на месте; иначе он перестроится сам.
+    Вызывается под _load_lock.
+    """
+    global _version
+    version = versions.bump(VERSION)
+    if _version != version - 1:
+        return False
+    _version = version
+    return True
+
+
+def sync_point(pk, lat, lng, eligible):
+    """Обновить индекс после сохранения объекта"""
+    with _load_lock:
+        if not changed():
+            return
+        if eligible:
+            connection_points.insert(pk, lat, lng)
+        else:
+            connection_points.remove(pk)
+
+
+def remove_object(pk):
+    """Убрать объект из индекса после удаления"""
+    with _load_lock:
+        if changed():
+            connection_points.remove(pk)
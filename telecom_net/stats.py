@@ -0,0 +1,131 @@
+"""
+Сводная статистика сети (read model).
+
+Таблица InfrastructureStat хранит количество объектов, сумму емкости и
+свободных портов для каждого сочетания (object_type, technology, status,
+is_active). Сигналы сохранения и удаления InfrastructureObject применяют
+к ней дельты, поэтому /api/infrastructure/stats/ читает несколько сотен
+строк вместо агрегатов по всей таблице объектов.
+
+Массовые операции в обход сигналов (queryset.update, bulk_create) требуют
+пересборки: python manage.py rebuild_stats.
+"""
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+DIMENSIONS = ('object_type', 'technology', 'status', 'is_active')
+MEASURES = ('capacity', 'free_ports')
+TRACKED_FIELDS = DIMENSIONS + MEASURES
+
+
+def snapshot(obj):
+    """Значения отслеживаемых полей объекта"""
+    return {field: getattr(obj, field) for field in TRACKED_FIELDS}
+
+
+def apply_delta(values, sign):
+    """Добавить (sign=1) или вычесть (sign=-1) объект со значениями values"""
+    from .models import InfrastructureStat
+
+    key = {field: values[field] for field in DIMENSIONS}
+    key['technology'] = key['technology'] or ''
+    row, _ = InfrastructureStat.objects.get_or_create(**key)
+    InfrastructureStat.objects.filter(pk=row.pk).update(
+        count=F('count') + sign,
+        capacity=F('capacity') + sign * (values['capacity'] or 0),
+        free_ports=F('free_ports') + sign * (values['free_ports'] or 0),
+    )
+
+
+def object_changed(previous, current):
+    """Дельта для сохраненного объекта; previous — None для нового"""
+    if previous == current:
+        return
+    if previous is not None:
+        apply_delta(previous, -1)
+    apply_delta(current, 1)
+
+
+def object_deleted(previous):
+    apply_delta(previous, -1)
+
+
+def aggregate_rows(queryset):
+    """Строки статистики, посчитанные напрямую по queryset объектов"""
+    return queryset.values(*DIMENSIONS).annotate(
+        count=Count('id'),
+        capacity_sum=Sum('capacity'),
+        free_ports_sum=Sum('free_ports'),
+    ).order_by()
+
+
+@transaction.atomic
+def rebuild(stat_model=None, object_model=None):
+    """Пересобрать таблицу статистики с нуля; возвращает число строк"""
+    if stat_model is None or object_model is None:
+        from .models import InfrastructureObject, InfrastructureStat
+        stat_model, object_model = InfrastructureStat, InfrastructureObject
+
+    stat_model.objects.all().delete()
+    rows = [
+        stat_model(
+            object_type=row['object_type'],
+            technology=row['technology'] or '',
+            status=row['status'],
+            is_active=row['is_active'],
+            count=row['count'],
+            capacity=row['capacity_sum'] or 0,
+            free_ports=row['free_ports_sum'] or 0,
+        )
+        for row in aggregate_rows(object_model.objects.all())
+    ]
+    stat_model.objects.bulk_create(rows)
+    return len(rows)
+
+
+def stat_rows():
+    """Непустые строки сводной таблицы (queryset values)"""
+    from .models import InfrastructureStat
+
+    return InfrastructureStat.objects.filter(count__gt=0).values(*DIMENSIONS, 'count', 'capacity', 'free_ports')
+
+
+def read_stats():
+    """Ответ /api/infrastructure/stats/ из сводной таблицы"""
+    return summarize(stat_rows())
+
+
+def summarize(rows):
+    """Ответ stats по строкам сводной таблицы"""
+    total_objects = active_objects = total_capacity = total_free_ports = 0
+    by_dimension = {'object_type': {}, 'technology': {}, 'status': {}}
+
+    for row in rows:
+        total_objects += row['count']
+        if row['is_active']:
+            active_objects += row['count']
+        total_capacity += row['capacity']
+        total_free_ports += row['free_ports']
+        for field, counts in by_dimension.items():
+            counts[row[field]] = counts.get(row[field], 0) + row['count']
+
+    used_ports = total_capacity - total_free_ports
+    return {
+        'total_objects': total_objects,
+        'active_objects': active_objects,
+        'objects_by_type': [
+            {'object_type': key, 'count': count} for key, count in sorted(by_dimension['object_type'].items())
+        ],
+        'objects_by_technology': [
+            {'technology': key, 'count': count} for key, count in sorted(by_dimension['technology'].items())
+        ],
+        'objects_by_status': [
+            {'status': key, 'count': count} for key, count in sorted(by_dimension['status'].items())
+        ],
+        'total_capacity': total_capacity,
+        'total_free_ports': total_free_ports,
+        'used_ports': used_ports,
+        # Доля занятых портов от общей емкости
+        'utilization_rate': round(used_ports / total_capacity * 100, 2) if total_capacity else 0,
+    }
@@ -1,3 +1,1600 @@
-from django.test import TestCase
+import importlib
+import io
+import json
+import random
+import tempfile
+import time
+import unittest
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, modify_settings, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import (autocomplete, coverage, db_router, export, fulltext, generator, geo, graph, impact, importer,
+               metrics, qualification, spatial, thumbnails, tiles, versions)
+from . import stats as network_stats
+from .models import CableRoute, DeletionLog, InfrastructureObject, ObjectHistory
+from .views import calculate_distance
+
+
+def setUpModule():
+    # Общие версии индексов — во временном каталоге: запущенный сервер не должен видеть изменений тестов
+    versions_dir = tempfile.TemporaryDirectory()
+    settings = override_settings(VERSIONS_DIR=versions_dir.name)
+    settings.enable()
+    unittest.addModuleCleanup(versions_dir.cleanup)
+    unittest.addModuleCleanup(settings.disable)
+
+
+def make_object(object_id, lat, lng, **kwargs):
+    defaults = {
+        'object_type': 'splitter',
+        'name': object_id,
+        'technology': 'gpon',
+        'capacity': 16,
+        'free_ports': 8,
+    }
+    defaults.update(kwargs)
+    return InfrastructureObject.objects.create(object_id=object_id, lat=lat, lng=lng, **defaults)
+
+
+class GeoEngineTests(TestCase):
+    def setUp(self):
+        rnd = random.Random(1)
+        self.rows = [
+            (pk, rnd.uniform(38.0, 41.0), rnd.uniform(67.0, 71.0))
+            for pk in range(500)
+        ]
+        self.points = geo.PointSet.from_rows(self.rows)
+
+    def test_haversine_matches_scalar_reference(self):
+        lat, lng = 40.291, 69.622
+        distances = self.points.distances(lat, lng)
+        for (_, p_lat, p_lng), distance in zip(self.rows, distances):
+            self.assertAlmostEqual(distance, calculate_distance(lat, lng, p_lat, p_lng), places=6)
+
+    def test_nearest_matches_sorted_scan(self):
+        lat, lng = 39.5, 69.0
+        expected = sorted(
+            (calculate_distance(lat, lng, p_lat, p_lng), pk) for pk, p_lat, p_lng in self.rows
+        )
+        nearest = self.points.nearest(lat, lng, k=10)
+        self.assertEqual([pk for _, pk in nearest], [pk for _, pk in expected[:10]])
+
+        in_range = self.points.nearest(lat, lng, k=500, max_distance=50000)
+        self.assertEqual(len(in_range), len([d for d, _ in expected if d <= 50000]))
+
+    def test_top_k_edge_cases(self):
+        distances = np.array([5.0, 1.0, 3.0])
+        self.assertEqual(geo.top_k(distances, 10).tolist(), [1, 2, 0])
+        self.assertEqual(geo.top_k(distances, 0).tolist(), [])
+        self.assertEqual(len(geo.PointSet.from_rows([])), 0)
+
+
+class GridIndexTests(TestCase):
+    def test_nearest_matches_full_scan(self):
+        index = spatial.GridIndex()
+        points = {pk: (40.28 + pk * 0.0007, 69.61 + (pk % 7) * 0.001) for pk in range(200)}
+        for pk, (lat, lng) in points.items():
+            index.insert(pk, lat, lng)
+
+        lat, lng = 40.30, 69.615
+        expected = sorted(
+            (calculate_distance(lat, lng, p_lat, p_lng), pk)
+            for pk, (p_lat, p_lng) in points.items()
+        )
+        expected = [item for item in expected if item[0] <= 2000][:10]
+
+        nearest = index.nearest(lat, lng, 2000)
+        self.assertEqual([pk for _, pk in nearest], [pk for _, pk in expected])
+        for (distance, _), (reference, _) in zip(nearest, expected):
+            self.assertAlmostEqual(distance, reference, places=6)
+
+    def test_insert_moves_and_remove(self):
+        index = spatial.GridIndex()
+        index.insert(1, 40.0, 69.0)
+        index.insert(1, 41.0, 70.0)
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.candidates(40.0, 69.0, 1000), [])
+        index.remove(1)
+        self.assertEqual(index.candidates(41.0, 70.0, 1000), [])
+
+    def test_nearest_any_distance(self):
+        index = spatial.GridIndex()
+        self.assertEqual(index.nearest_any(40.29, 69.62, 5000), [])
+        index.insert(1, 40.50, 69.62)
+        index.insert(2, 38.56, 68.78)
+        # Далекие точки занимают 2000 ячеек: ≈ 23 км находится расширением радиуса, ≈ 220 км — перебором
+        for n in range(2000):
+            index.insert(100 + n, 45.0 + n // 50 * 0.05, 60.0 + n % 50 * 0.05)
+        self.assertEqual([pk for _, pk in index.nearest_any(40.29, 69.62, 5000)], [1])
+        self.assertEqual([pk for _, pk in index.nearest_any(36.60, 68.78, 5000)], [2])
+        distance, _ = index.nearest_any(36.60, 68.78, 5000)[0]
+        self.assertAlmostEqual(distance, calculate_distance(36.60, 68.78, 38.56, 68.78), places=6)
+
+
+class CheckConnectionTests(TestCase):
+    def setUp(self):
+        spatial.invalidate()
+
+    def check(self, lat, lng):
+        return self.client.get(reverse('check-connection'), {'lat': lat, 'lng': lng}).json()
+
+    def test_nearest_in_radius(self):
+        near = make_object('SPL-1', 40.2910, 69.6220)
+        make_object('SPL-2', 40.2990, 69.6220, technology='adsl')
+        make_object('SPL-FULL', 40.2911, 69.6221, free_ports=0)
+        make_object('SPL-FAR', 40.4000, 69.6220)
+
+        data = self.check(40.2912, 69.6222)
+
+        self.assertTrue(data['available'])
+        self.assertEqual(data['technology'], 'GPON')
+        self.assertEqual([obj['object_id'] for obj in data['nearest_objects']], ['SPL-1', 'SPL-2'])
+        self.assertIn(str(near.id), data['distances'])
+
+    def test_nearest_out_of_radius(self):
+        make_object('SPL-1', 40.3200, 69.6220)
+
+        data = self.check(40.2910, 69.6220)
+
+        self.assertFalse(data['available'])
+        self.assertEqual(data['nearest_objects'], [])
+        self.assertIn('SPL-1', data['message'])
+
+    def test_nearest_beyond_search_radius(self):
+        # Ближайшая точка в ≈ 23 км — все равно называется в сообщении
+        make_object('SPL-FAR', 40.5000, 69.6220)
+
+        data = self.check(40.2910, 69.6220)
+
+        self.assertFalse(data['available'])
+        self.assertIn('SPL-FAR', data['message'])
+
+    def test_index_follows_saves_and_deletes(self):
+        spatial.get_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            obj = make_object('SPL-1', 40.2910, 69.6220)
+        self.assertIn(obj.pk, spatial.connection_points)
+
+        obj.free_ports = 0
+        with self.captureOnCommitCallbacks(execute=True):
+            obj.save()
+        self.assertNotIn(obj.pk, spatial.connection_points)
+
+        obj.free_ports = 4
+        with self.captureOnCommitCallbacks(execute=True):
+            obj.save()
+        pk = obj.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            obj.delete()
+        self.assertNotIn(pk, spatial.connection_points)
+
+    def test_index_follows_other_processes(self):
+        spatial.get_index()
+        # Сохранение в другом процессе: сигналы этого процесса не срабатывают, версия растет
+        obj = make_object('SPL-1', 40.2910, 69.6220)
+        versions.bump(spatial.VERSION)
+        self.assertIn(obj.pk, spatial.get_index())
+
+        # Свое изменение применяется на месте, без перестройки
+        with self.captureOnCommitCallbacks(execute=True):
+            other = make_object('SPL-2', 40.2920, 69.6220)
+        with mock.patch.object(spatial, 'rebuild') as rebuild:
+            self.assertIn(other.pk, spatial.get_index())
+        rebuild.assert_not_called()
+
+
+class CheckConnectionBatchTests(TestCase):
+    def setUp(self):
+        spatial.invalidate()
+
+    def batch(self, points):
+        response = self.client.post(reverse('check-connection-batch'), {'points': points}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+    def test_matches_single_check(self):
+        rnd = random.Random(3)
+        for i in range(60):
+            make_object(f'SPL-{i}', 40.29 + rnd.uniform(-0.05, 0.05), 69.62 + rnd.uniform(-0.05, 0.05),
+                        technology=rnd.choice(['gpon', 'adsl', 'ethernet', '']), free_ports=rnd.choice([0, 4]))
+        points = [{'lat': 40.29 + rnd.uniform(-0.08, 0.08), 'lng': 69.62 + rnd.uniform(-0.08, 0.08)}
+                  for _ in range(40)]
+        results = self.batch(points)
+        self.assertEqual([result['index'] for result in results], list(range(40)))
+        for point, result in zip(points, results):
+            single = self.client.get(reverse('check-connection'), point).json()
+            self.assertEqual(result['available'], single['available'])
+            self.assertEqual(result['technology'], single['technology'])
+            if single['available']:
+                self.assertEqual([obj['id'] for obj in result['nearest_objects']],
+                                 [obj['id'] for obj in single['nearest_objects']])
+
+    def test_unavailable_and_invalid_points(self):
+        make_object('SPL-1', 40.3200, 69.6220)
+        results = self.batch([
+            {'lat': 40.2910, 'lng': 69.6220, 'address': 'ул. Ленина, 1'},
+            {'lat': 'abc', 'lng': 69.62},
+            {'lat': 10.0, 'lng': 10.0},
+        ])
+        self.assertEqual(results[0]['status'], 'unavailable')
+        self.assertEqual(results[0]['address'], 'ул. Ленина, 1')
+        # Ближайшая точка вне радиуса подключения — для сообщения о прокладке кабеля
+        self.assertEqual(results[0]['nearest_objects'][0]['object_id'], 'SPL-1')
+        self.assertEqual(results[1], {'index': 1, 'error': 'Некорректные координаты'})
+        self.assertEqual((results[2]['available'], results[2]['nearest_objects']), (False, []))
+
+    def test_csv_upload_and_parts(self):
+        make_object('SPL-1', 40.2910, 69.6220)
+        upload = SimpleUploadedFile('points.csv', 'lat;lng;address\n40.2912;69.6222;Дом 1\n40.5;69.9;Дом 2\n'.encode())
+        response = self.client.post(reverse('check-connection-batch'), {'file': upload})
+        results = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([(r['address'], r['available']) for r in results], [('Дом 1', True), ('Дом 2', False)])
+
+        points = [{'lat': 40.2912, 'lng': 69.6222}] * 5
+        parts = list(qualification.check_points(points, 2000, 5000, part_size=2))
+        self.assertEqual([[r['index'] for r in part] for part in parts], [[0, 1], [2, 3], [4]])
+
+        response = self.client.post(reverse('check-connection-batch'), {'points': []}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class CoverageTests(TestCase):
+    def setUp(self):
+        spatial.invalidate()
+        coverage.reset()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name, COVERAGE_BACKGROUND=False)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(coverage.reset)
+
+    def test_matches_check_connection(self):
+        rnd = random.Random(5)
+        for i in range(40):
+            make_object(f'SPL-{i}', 40.29 + rnd.uniform(-0.04, 0.04), 69.62 + rnd.uniform(-0.04, 0.04),
+                        technology=rnd.choice(['gpon', 'adsl', 'ethernet', '']), free_ports=rnd.choice([0, 4]))
+        raster = coverage.get_raster()
+        self.assertTrue(coverage.raster_path().exists())
+        for _ in range(40):
+            row, col = rnd.randrange(raster.shape[0]), rnd.randrange(raster.shape[1])
+            lats, lngs = raster.centers(slice(row, row + 1), slice(col, col + 1))
+            level = raster.levels[row, col]
+            data = self.client.get(reverse('check-connection'), {'lat': lats[0], 'lng': lngs[0]}).json()
+            self.assertEqual(level > coverage.NONE, data['available'])
+            if data['available']:
+                self.assertEqual(coverage.LEVEL_TECHNOLOGY[level], data['technology'])
+
+    def test_incremental_update(self):
+        make_object('SPL-1', 40.29, 69.62, technology='adsl')
+        obj = make_object('SPL-2', 40.30, 69.64)
+        raster = coverage.get_raster()
+        self.assertEqual(coverage.level_at(40.30, 69.64), coverage.GPON)
+        version = raster.version
+
+        obj.free_ports = 0
+        # Пересчитывается только окрестность объекта, не весь растр
+        with mock.patch.object(coverage, 'build', side_effect=AssertionError), \
+                self.captureOnCommitCallbacks(execute=True):
+            obj.save()
+        raster = coverage.get_raster()
+        self.assertNotEqual(raster.version, version)
+        self.assertEqual(coverage.level_at(40.29, 69.62), coverage.ADSL)
+        # Совпадает с полным пересчетом (его границы уже — по оставшимся точкам)
+        lats, lngs = raster.centers(slice(0, raster.shape[0]), slice(0, raster.shape[1]))
+        np.testing.assert_array_equal(raster.levels.ravel(), coverage.build().sample(lats, lngs))
+
+        # Объект за пределами растра — полный пересчет с новыми границами
+        with self.captureOnCommitCallbacks(execute=True):
+            make_object('SPL-FAR', 40.50, 69.90, technology='ethernet')
+        self.assertEqual(coverage.level_at(40.50, 69.90), coverage.ETHERNET)
+
+    def test_stale_raster_rebuilt_on_load(self):
+        obj = make_object('SPL-1', 40.29, 69.62)
+        coverage.get_raster()
+        coverage.reset()
+        # Изменение в обход сигналов (другой процесс, пока этот не работал)
+        InfrastructureObject.objects.filter(pk=obj.pk).update(technology='adsl', updated_at=timezone.now())
+        self.assertEqual(coverage.level_at(40.29, 69.62), coverage.ADSL)
+
+    def test_update_in_process_without_raster(self):
+        obj = make_object('SPL-1', 40.29, 69.62)
+        coverage.get_raster()
+        # Процесс, который растр не читал (например, другой воркер), сам пересчитывает файл
+        coverage.reset()
+        obj.technology = 'ethernet'
+        with mock.patch.object(coverage, 'build', side_effect=AssertionError), \
+                self.captureOnCommitCallbacks(execute=True):
+            obj.save()
+        raster = coverage.Raster.load(coverage.raster_path())
+        self.assertEqual(raster.sample(np.array([40.29]), np.array([69.62]))[0], coverage.ETHERNET)
+        # Время частичного пересчета записано — новому процессу полный пересчет не нужен
+        self.assertFalse(raster.is_stale())
+        coverage.reset()
+        with mock.patch.object(coverage, 'build', side_effect=AssertionError):
+            self.assertEqual(coverage.level_at(40.29, 69.62), coverage.ETHERNET)
+
+    def test_invalidate_in_other_process(self):
+        obj = make_object('SPL-1', 40.29, 69.62)
+        coverage.get_raster()
+        InfrastructureObject.objects.filter(pk=obj.pk).update(technology='adsl')
+        # Импорт в другом процессе: растр этого процесса не загружен там, но версия общая
+        versions.bump(coverage.VERSION)
+        self.assertEqual(coverage.level_at(40.29, 69.62), coverage.ADSL)
+        with mock.patch.object(coverage, 'build', side_effect=AssertionError):
+            coverage.get_raster()
+
+    def test_png_tile(self):
+        from PIL import Image
+
+        make_object('SPL-1', 40.29, 69.62)
+        x, y = tiles.tile_for_point(40.29, 69.62, 14)
+        response = self.client.get(reverse('coverage-tile', args=[14, x, y]))
+        self.assertEqual(response['Content-Type'], 'image/png')
+        image = Image.open(io.BytesIO(response.content)).convert('RGBA')
+        self.assertEqual(image.size, (256, 256))
+        self.assertIn(coverage.PALETTE[coverage.GPON], set(image.getdata()))
+        self.assertEqual(self.client.get(reverse('coverage-tile', args=[3, 0, 0])).status_code, 404)
+
+
+class MapDataViewportTests(TestCase):
+    def setUp(self):
+        self.inside = make_object('IN-1', 40.29, 69.62)
+        self.outside = make_object('OUT-1', 40.50, 69.90)
+        self.other = make_object('OUT-2', 40.60, 69.95)
+        CableRoute.objects.create(name='Вход', from_object=self.outside, to_object=self.inside, length=100)
+        CableRoute.objects.create(name='Снаружи', from_object=self.outside, to_object=self.other, length=100)
+
+    def get(self, **params):
+        return self.client.get(reverse('map-data'), params)
+
+    def test_bbox_filters_objects_and_routes(self):
+        data = self.get(bbox='69.60,40.28,69.64,40.30', zoom=15).json()
+
+        self.assertEqual([obj['object_id'] for obj in data['infrastructure_objects']], ['IN-1'])
+        self.assertEqual([route['name'] for route in data['cable_routes']], ['Вход'])
+
+    def test_low_zoom_skips_routes(self):
+        data = self.get(bbox='69.0,40.0,70.0,41.0', zoom=8).json()
+
+        self.assertEqual(sum(c['count'] for c in data['clusters']), 3)
+        self.assertEqual(data['cable_routes'], [])
+
+    def test_invalid_bbox(self):
+        self.assertEqual(self.get(bbox='1,2,3').status_code, 400)
+        self.assertEqual(self.get(bbox='70,40,69,41').status_code, 400)
+        self.assertEqual(self.get(zoom='x').status_code, 400)
+
+    def test_low_zoom_returns_clusters(self):
+        make_object('IN-2', 40.291, 69.621, object_type='client', free_ports=2)
+
+        data = self.get(bbox='69.0,40.0,70.5,41.0', zoom=10).json()
+
+        self.assertEqual(data['mode'], 'clusters')
+        self.assertNotIn('infrastructure_objects', data)
+        clusters = sorted(data['clusters'], key=lambda c: c['lat'])
+        self.assertEqual([c['count'] for c in clusters], [2, 1, 1])
+        self.assertEqual(clusters[0]['types'], {'splitter': 1, 'client': 1})
+        self.assertEqual(clusters[0]['free_ports'], 10)
+        self.assertAlmostEqual(clusters[0]['lat'], 40.2905)
+        self.assertAlmostEqual(clusters[0]['lng'], 69.6205)
+
+
+class MapTileTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.a = make_object('A-1', 40.2910, 69.6220)
+        self.b = make_object('B-1', 40.3500, 69.7000)
+        self.route = CableRoute.objects.create(name='A-B', from_object=self.a, to_object=self.b, length=900)
+
+    def tile_of(self, obj, z=15):
+        return (z, *tiles.tile_for_point(obj.lat, obj.lng, z))
+
+    def get_tile(self, z, x, y):
+        return self.client.get(reverse('map-tile', args=[z, x, y]))
+
+    def features(self, tile):
+        response = self.get_tile(*tile)
+        self.assertEqual(response['Content-Type'], 'application/geo+json')
+        return {f['id'] for f in json.loads(response.content)['features']}
+
+    def test_tile_math_roundtrip(self):
+        z, x, y = self.tile_of(self.a)
+        min_lng, min_lat, max_lng, max_lat = tiles.tile_bbox(z, x, y)
+        self.assertTrue(min_lat <= self.a.lat < max_lat)
+        self.assertTrue(min_lng <= self.a.lng < max_lng)
+
+    def test_tile_contents(self):
+        self.assertEqual(
+            self.features(self.tile_of(self.a)),
+            {f'object:{self.a.pk}', f'route:{self.route.pk}'}
+        )
+        self.assertEqual(self.get_tile(5, 0, 0).status_code, 404)
+
+    def test_save_invalidates_only_touched_tiles(self):
+        tile_a, tile_b = self.tile_of(self.a), self.tile_of(self.b)
+        self.features(tile_a)
+        self.features(tile_b)
+        untouched = (15, 0, 0)
+        self.get_tile(*untouched)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.b.lat, self.b.lng = 40.2912, 69.6222
+            self.b.save()
+
+        self.assertIsNone(cache.get(tiles.cache_key(*tile_a)))
+        self.assertIsNone(cache.get(tiles.cache_key(*tile_b)))
+        self.assertIsNotNone(cache.get(tiles.cache_key(*untouched)))
+        self.assertIn(f'object:{self.b.pk}', self.features(tile_a))
+        self.assertEqual(self.features(tile_b), set())
+
+    def test_route_delete_invalidates_endpoint_tiles(self):
+        tile_a = self.tile_of(self.a)
+        self.features(tile_a)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.route.delete()
+
+        self.assertEqual(self.features(tile_a), {f'object:{self.a.pk}'})
+
+    def test_import_invalidates_route_tiles_at_far_end(self):
+        tile_a = self.tile_of(self.a)
+        self.features(tile_a)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            importer.import_network(io.BytesIO(b'object_id,lat,lng\nB-1,40.3600,69.7100\n'), 'objects', 'csv')
+
+        self.assertIsNone(cache.get(tiles.cache_key(*tile_a)))
+
+
+class MapDataCompactTests(TestCase):
+    def test_compact_columns(self):
+        a = make_object('A-1', 40.29, 69.62, object_type='olt', free_ports=3)
+        b = make_object('B-1', 40.30, 69.63, technology='adsl')
+        make_object('OFF-1', 40.30, 69.63, is_active=False)
+        route = CableRoute.objects.create(name='A-B', from_object=a, to_object=b, length=100)
+
+        response = self.client.get(reverse('map-data'), {'format': 'compact', 'zoom': 15})
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['format'], 'compact')
+        self.assertEqual(data['infrastructure_objects'], {
+            'id': [a.pk, b.pk],
+            'object_type': ['olt', 'splitter'],
+            'lat': [40.29, 40.30],
+            'lng': [69.62, 69.63],
+            'status': ['active', 'active'],
+            'technology': ['gpon', 'adsl'],
+            'free_ports': [3, 8],
+        })
+        self.assertEqual(data['cable_routes']['id'], [route.pk])
+        self.assertEqual(data['cable_routes']['to_lat'], [40.30])
+
+    def test_compact_empty(self):
+        data = self.client.get(reverse('map-data'), {'format': 'compact'}).json()
+        self.assertEqual(data['infrastructure_objects']['id'], [])
+
+
+class MapDataSyncTests(TestCase):
+    def setUp(self):
+        self.a = make_object('A-1', 40.29, 69.62)
+        self.b = make_object('B-1', 40.30, 69.63)
+
+    def get(self, headers=None, **params):
+        params.setdefault('format', 'compact')
+        return self.client.get(reverse('map-data'), params, headers=headers or {})
+
+    def test_conditional_get(self):
+        first = self.get()
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first['ETag'])
+        self.assertTrue(first['Last-Modified'])
+
+        self.assertEqual(self.get(headers={'If-None-Match': first['ETag']}).status_code, 304)
+
+        self.b.free_ports = 1
+        self.b.save()
+        self.assertEqual(self.get(headers={'If-None-Match': first['ETag']}).status_code, 200)
+
+    def test_deletion_changes_etag(self):
+        etag = self.get()['ETag']
+        self.b.delete()
+        self.assertNotEqual(self.get()['ETag'], etag)
+
+    def test_since_returns_only_changes(self):
+        token = self.get().json()['sync_token']
+        self.assertEqual(token, self.b.updated_at.isoformat())
+
+        self.a.name = 'A-1 (обновлен)'
+        self.a.save()
+        c = make_object('C-1', 40.31, 69.64)
+        off = make_object('OFF-1', 40.31, 69.64)
+        off.is_active = False
+        off.save()
+        b_pk = self.b.pk
+        self.b.delete()
+
+        data = self.get(since=token).json()
+
+        self.assertEqual(data['mode'], 'delta')
+        self.assertEqual(sorted(data['infrastructure_objects']['id']), [self.a.pk, c.pk])
+        self.assertEqual(data['created']['infrastructure_objects'], [c.pk])
+        self.assertEqual(data['updated']['infrastructure_objects'], [self.a.pk])
+        self.assertEqual(sorted(data['deleted']['infrastructure_objects']), sorted([off.pk, b_pk]))
+
+    def test_invalid_since(self):
+        self.assertEqual(self.get(since='вчера').status_code, 400)
+
+
+class DatabaseTuningTests(TestCase):
+    def test_pragmas_applied(self):
+        with connection.cursor() as cursor:
+            values = {pragma: cursor.execute(f'PRAGMA {pragma}').fetchone()[0]
+                      for pragma in ('synchronous', 'cache_size', 'busy_timeout', 'temp_store')}
+        # synchronous: 1 — NORMAL, temp_store: 2 — MEMORY
+        self.assertEqual(values, {'synchronous': 1, 'cache_size': -64000, 'busy_timeout': 5000, 'temp_store': 2})
+
+    @mock.patch('telecom_net.db_router.replica_available', return_value=True)
+    def test_router_sends_marked_reads_to_replica(self, _):
+        router = db_router.ReadReplicaRouter()
+
+        @db_router.read_from_replica
+        def view():
+            return router.db_for_read(InfrastructureObject), router.db_for_write(InfrastructureObject)
+
+        @db_router.read_from_replica
+        async def async_view():
+            return await sync_to_async(router.db_for_read)(InfrastructureObject)
+
+        self.assertEqual(view(), ('replica', 'default'))
+        self.assertEqual(async_to_sync(async_view)(), 'replica')
+        self.assertEqual(router.db_for_read(InfrastructureObject), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'telecom_net'))
+
+    def test_router_without_replica(self):
+        with db_router.replica_reads():
+            self.assertEqual(db_router.ReadReplicaRouter().db_for_read(InfrastructureObject), 'default')
+
+
+class AsyncViewsTests(TestCase):
+    """Асинхронные эндпоинты отдают то же, что синхронные"""
+
+    def setUp(self):
+        spatial.invalidate()
+        self.a = make_object('OLT-1', 40.2910, 69.6220, object_type='olt', name='Узел Худжанд')
+        self.b = make_object('SPL-1', 40.2990, 69.6220, technology='adsl', name='Сплиттер Худжанд')
+        make_object('OFF-1', 40.2950, 69.6250, is_active=False)
+        CableRoute.objects.create(name='Магистраль Худжанд', from_object=self.a, to_object=self.b, length=900)
+
+    async def assertSameAsSync(self, sync_name, async_name, params):
+        expected = await sync_to_async(self.client.get)(reverse(sync_name), params)
+        response = await self.async_client.get(reverse(async_name), params)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.json(), expected.json())
+        return response
+
+    async def test_map_data(self):
+        for params in ({}, {'format': 'compact'}, {'zoom': 15, 'bbox': '69.6,40.28,69.63,40.292'},
+                       {'zoom': 10}, {'zoom': 15, 'object_type': 'olt', 'format': 'compact'}):
+            with self.subTest(params=params):
+                await self.assertSameAsSync('map-data', 'async-map-data', params)
+
+    async def test_map_data_since(self):
+        token = (await self.async_client.get(reverse('async-map-data'))).json()['sync_token']
+        await sync_to_async(make_object)('SPL-2', 40.2995, 69.6225)
+        response = await self.assertSameAsSync('map-data', 'async-map-data', {'since': token, 'format': 'compact'})
+        self.assertEqual(len(response.json()['created']['infrastructure_objects']), 1)
+
+    async def test_map_data_conditional_and_errors(self):
+        first = await self.async_client.get(reverse('async-map-data'))
+        again = await self.async_client.get(reverse('async-map-data'), headers={'If-None-Match': first['ETag']})
+        self.assertEqual(again.status_code, 304)
+        await self.assertSameAsSync('map-data', 'async-map-data', {'bbox': '1,2,3'})
+
+    async def test_check_connection(self):
+        for params in ({'lat': 40.2912, 'lng': 69.6222}, {'lat': 40.3200, 'lng': 69.6220}, {'lat': 'x', 'lng': 1}):
+            with self.subTest(params=params):
+                await self.assertSameAsSync('check-connection', 'async-check-connection', params)
+
+    async def test_search(self):
+        for q in ('худж', 'Узел', 'нет такого', 'x'):
+            with self.subTest(q=q):
+                await self.assertSameAsSync('search', 'async-search', {'q': q})
+
+    @mock.patch('telecom_net.fulltext.is_available', return_value=False)
+    async def test_search_without_fulltext(self, _):
+        response = await self.assertSameAsSync('search', 'async-search', {'q': 'Худжанд'})
+        self.assertEqual(response.json()['total_results'], 3)
+
+    async def test_stats(self):
+        await self.assertSameAsSync('infrastructure-stats', 'async-stats', {})
+
+
+def slow_middleware(get_response):
+    """Обработка ответа после рендеринга (как у GZip/сессий), заметная по времени"""
+    def middleware(request):
+        response = get_response(request)
+        time.sleep(0.05)
+        return response
+    return middleware
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.olt = make_object('OLT-1', 40.2910, 69.6220, object_type='olt')
+        make_object('SPL-1', 40.2990, 69.6220, parent=self.olt)
+
+    def scrape(self):
+        response = self.client.get('/api/_metrics')
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        samples = {}
+        for line in response.content.decode().splitlines():
+            if not line.startswith('#'):
+                name, value = line.rsplit(' ', 1)
+                samples[name] = float(value)
+        return samples
+
+    def test_request_metrics(self):
+        stats = self.client.get(reverse('infrastructure-stats'))
+        self.client.get(reverse('infrastructure-list'))
+        self.client.get(reverse('infrastructure-list'), {'object_type': 'olt'})
+        samples = self.scrape()
+
+        self.assertEqual(samples['telecom_http_requests_total{view="infrastructure-list",method="GET",status="200"}'], 2)
+        self.assertEqual(samples['telecom_db_queries_per_request_sum{view="infrastructure-stats"}'], 1)
+        self.assertEqual(samples['telecom_db_queries_per_request_bucket{view="infrastructure-stats",le="0"}'], 0)
+        self.assertEqual(samples['telecom_db_queries_per_request_bucket{view="infrastructure-stats",le="1"}'], 1)
+        self.assertEqual(samples['telecom_http_response_bytes_sum{view="infrastructure-stats"}'], len(stats.content))
+        self.assertEqual(samples['telecom_http_request_duration_seconds_count{view="infrastructure-list"}'], 2)
+        self.assertGreater(samples['telecom_serialize_duration_seconds_sum{view="infrastructure-list"}'], 0)
+        self.assertGreater(samples['telecom_db_duration_seconds_sum{view="infrastructure-list"}'], 0)
+
+    def test_async_views_and_unmatched(self):
+        async_to_sync(self.async_client.get)(reverse('async-search'), {'q': 'OLT'})
+        self.client.get('/api/no-such-endpoint/')
+        samples = self.scrape()
+        # SQL из потоков sync_to_async учитываются в запросе асинхронного view
+        self.assertGreater(samples['telecom_db_queries_per_request_sum{view="async-search"}'], 0)
+        self.assertGreater(samples['telecom_serialize_duration_seconds_sum{view="async-search"}'], 0)
+        self.assertEqual(samples['telecom_http_requests_total{view="unmatched",method="GET",status="404"}'], 1)
+
+    def test_serialization_excludes_middleware(self):
+        with modify_settings(MIDDLEWARE={'append': 'telecom_net.tests.slow_middleware'}):
+            self.client.get(reverse('infrastructure-list'))
+        samples = self.scrape()
+        self.assertGreater(samples['telecom_http_request_duration_seconds_sum{view="infrastructure-list"}'], 0.05)
+        self.assertGreater(samples['telecom_serialize_duration_seconds_sum{view="infrastructure-list"}'], 0)
+        self.assertLess(samples['telecom_serialize_duration_seconds_sum{view="infrastructure-list"}'], 0.05)
+
+    @override_settings(SLOW_REQUEST_MS=0, SLOW_REQUEST_SAMPLE=1)
+    def test_slow_request_log(self):
+        with self.assertLogs('telecom_net.metrics', 'WARNING') as logs:
+            self.client.get(reverse('infrastructure-stats'))
+        self.assertIn('infrastructure-stats', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+    @override_settings(SLOW_REQUEST_MS=0, SLOW_REQUEST_SAMPLE=0)
+    def test_slow_request_sampling(self):
+        with self.assertNoLogs('telecom_net.metrics', 'WARNING'):
+            self.client.get(reverse('infrastructure-stats'))
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.olt = make_object('OLT-1', 40.29, 69.62, object_type='olt')
+        for n in range(7):
+            spl = make_object(f'SPL-{n}', 40.29, 69.62, parent=self.olt)
+            # Одинаковые имена: порядок внутри них держит id
+            CableRoute.objects.create(name=f'Трасса {n // 3}', from_object=self.olt, to_object=spl, length=10)
+            ObjectHistory.objects.create(infrastructure_object=spl, action='created', description='Монтаж',
+                                         performed_by='Инженер')
+
+    def walk(self, url, params, key='previous'):
+        """Все страницы от первой по next, затем обратно по previous"""
+        pages = [self.client.get(url, params).json()]
+        while pages[-1]['next']:
+            pages.append(self.client.get(pages[-1]['next']).json())
+        back = [pages[-1]]
+        while back[-1][key]:
+            back.append(self.client.get(back[-1][key]).json())
+        return pages, back
+
+    def test_pages_cover_all_rows(self):
+        for name, expected in (
+            ('infrastructure-list', list(InfrastructureObject.objects.order_by('object_id').values_list('id', flat=True))),
+            ('cable-routes-list', list(CableRoute.objects.order_by('name', 'id').values_list('id', flat=True))),
+            ('history-list', list(ObjectHistory.objects.order_by('-performed_date', '-id').values_list('id', flat=True))),
+        ):
+            with self.subTest(name=name):
+                pages, back = self.walk(reverse(name), {'page_size': 3})
+                self.assertEqual([row['id'] for page in pages for row in page['results']], expected)
+                self.assertTrue(all(len(page['results']) == 3 for page in pages[:-1]))
+                self.assertIsNone(pages[0]['previous'])
+                # Обратный проход — те же страницы
+                self.assertEqual([page['results'] for page in back], [page['results'] for page in reversed(pages)])
+
+    def test_filters_kept_in_links(self):
+        data = self.client.get(reverse('infrastructure-list'), {'object_type': 'splitter', 'page_size': 5}).json()
+        self.assertEqual(len(data['results']), 5)
+        self.assertIn('object_type=splitter', data['next'])
+        rest = self.client.get(data['next']).json()
+        self.assertEqual([row['object_id'] for row in rest['results']], ['SPL-5', 'SPL-6'])
+        self.assertIsNone(rest['next'])
+
+    def test_page_size_and_invalid_cursor(self):
+        data = self.client.get(reverse('infrastructure-list')).json()
+        self.assertEqual(len(data['results']), 8)
+        self.assertIsNone(data['next'])
+        self.assertEqual(len(self.client.get(reverse('infrastructure-list'), {'page_size': 0}).json()['results']), 1)
+        for cursor in ('!!!', 'eyJwIjpbMV19', 'eyJwIjpbIngiLCJ5Il0sInIiOjB9'):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get(reverse('infrastructure-list'), {'cursor': cursor}).status_code, 404)
+
+
+class QueryBudgetTests(TestCase):
+    """Число запросов списковых endpoint'ов не зависит от объема данных"""
+
+    SIZES = (1, 5, 20)
+
+    def setUp(self):
+        self.olt = make_object('OLT-1', 40.2900, 69.6200, object_type='olt', capacity=64)
+        self.objects = [self.olt]
+
+    def grow_network(self, size):
+        """Достроить сеть до size сплиттеров: родитель, трасса и история у каждого"""
+        while len(self.objects) <= size:
+            n = len(self.objects)
+            obj = make_object(f'SPL-{n}', 40.2900 + n * 0.0001, 69.6200, parent=self.olt,
+                              technical_notes='поиск')
+            CableRoute.objects.create(name=f'Трасса поиск {n}', from_object=self.olt, to_object=obj, length=50)
+            ObjectHistory.objects.create(infrastructure_object=obj, action='created',
+                                         description='Монтаж', performed_by='Инженер')
+            self.objects.append(obj)
+
+    def query_counts(self, url, params=None):
+        counts = []
+        for size in self.SIZES:
+            self.grow_network(size)
+            spatial.invalidate()
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url, params or {})
+            self.assertEqual(response.status_code, 200, response.content)
+            counts.append(len(ctx.captured_queries))
+        return counts
+
+    def assertQueryBudget(self, budget, url, params=None):
+        counts = self.query_counts(url, params)
+        self.assertEqual(counts, [budget] * len(self.SIZES), f'{url} {params or ""}')
+
+    def test_infrastructure_list(self):
+        self.assertQueryBudget(1, reverse('infrastructure-list'))
+
+    def test_infrastructure_detail(self):
+        self.assertQueryBudget(1, reverse('infrastructure-detail', args=[self.olt.pk]))
+
+    def test_cable_routes_list(self):
+        self.assertQueryBudget(1, reverse('cable-routes-list'))
+
+    def test_connected_routes(self):
+        self.assertQueryBudget(2, reverse('connected-routes', args=[self.olt.pk]))
+
+    def test_history_list(self):
+        self.assertQueryBudget(1, reverse('history-list'))
+
+    def test_map_data(self):
+        self.assertQueryBudget(5, reverse('map-data'))
+        self.assertQueryBudget(5, reverse('map-data'), {'format': 'compact'})
+
+    def test_search(self):
+        self.assertQueryBudget(4, reverse('search'), {'q': 'поиск'})
+
+    def test_check_connection(self):
+        self.assertQueryBudget(2, reverse('check-connection'), {'lat': 40.29, 'lng': 69.62})
+
+
+class QueryPlanTests(TestCase):
+    """
+    EXPLAIN QUERY PLAN каждого SELECT горячих эндпоинтов: фильтры — поиск по
+    ожидаемому индексу, без полного просмотра таблицы или индекса и без
+    сортировки или группировки во временном B-дереве.
+    """
+
+    # Последняя запись журнала удалений: ORDER BY id DESC LIMIT 1 — просмотр с конца rowid до первой строки
+    ALLOWED_SCANS = {'telecom_net_deletionlog'}
+    # Уникальный индекс object_id — порядок списка объектов
+    OBJECT_ID_INDEX = 'sqlite_autoindex_telecom_net_infrastructureobject_1'
+    # Версия данных map-data: MAX(updated_at) объектов и трасс
+    VERSION_INDEXES = ('infra_updated_at_idx', 'route_updated_at_idx')
+
+    def setUp(self):
+        spatial.invalidate()
+        a = make_object('OLT-1', 40.29, 69.62, object_type='olt')
+        b = make_object('SPL-1', 40.30, 69.63, parent=a)
+        CableRoute.objects.create(name='A-B', from_object=a, to_object=b, length=100)
+
+    def plans(self, run):
+        """(sql, строки плана) для каждого SELECT, выполненного в run()"""
+        queries = []
+
+        def capture(execute, sql, params, many, context):
+            queries.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capture):
+            run()
+        plans = []
+        with connection.cursor() as cursor:
+            for sql, params in queries:
+                if sql.lstrip().upper().startswith('SELECT'):
+                    cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                    plans.append((sql, [row[3] for row in cursor.fetchall()]))
+        return plans
+
+    @staticmethod
+    def uses_index(detail, name):
+        return f' INDEX {name} ' in detail + ' '
+
+    def assertIndexed(self, run, indexes=(), scans=()):
+        """
+        indexes — индексы, по которым должен идти поиск (SEARCH ... USING INDEX);
+        scans — индексы, которые можно просматривать целиком: порядок списка без фильтра.
+        """
+        plans = self.plans(run)
+        self.assertTrue(plans)
+        for sql, plan in plans:
+            problems = [
+                detail for detail in plan
+                if detail.startswith('USE TEMP B-TREE')
+                or (detail.startswith('SCAN ') and 'VIRTUAL TABLE' not in detail
+                    and detail.split()[1] not in self.ALLOWED_SCANS
+                    and not any(self.uses_index(detail, name) for name in scans))
+            ]
+            self.assertEqual(problems, [], f'{sql}\n' + '\n'.join(plan))
+        searches = [detail for _, plan in plans for detail in plan if detail.startswith('SEARCH ')]
+        for name in indexes:
+            self.assertTrue(any(self.uses_index(detail, name) for detail in searches),
+                            f'Нет поиска по {name}:\n' + '\n\n'.join(f'{sql}\n' + '\n'.join(plan)
+                                                                 for sql, plan in plans))
+
+    def get(self, name, params=None):
+        return lambda: self.assertEqual(self.client.get(reverse(name), params or {}).status_code, 200)
+
+    def test_object_list_filters(self):
+        for params, indexes, scans in (
+            ({}, (), (self.OBJECT_ID_INDEX,)),
+            ({'object_type': 'olt'}, ('infra_type_object_id_idx',), ()),
+            ({'technology': 'gpon'}, ('infra_tech_object_id_idx',), ()),
+            ({'status': 'active'}, ('infra_status_object_id_idx',), ()),
+            # На is_active индекса нет (см. Meta.indexes): просмотр в порядке списка, как без фильтра
+            ({'is_active': 'true'}, (), (self.OBJECT_ID_INDEX,)),
+            ({'object_type': 'olt', 'is_active': 'true'}, ('infra_type_object_id_idx',), ()),
+        ):
+            with self.subTest(params=params):
+                self.assertIndexed(self.get('infrastructure-list', params), indexes, scans)
+
+    def test_route_list_filters(self):
+        for params, indexes, scans in (
+            ({}, (), ('route_name_idx',)),
+            ({'cable_type': 'fiber'}, ('route_cable_type_name_idx',), ()),
+            ({'route_type': 'underground'}, ('route_route_type_name_idx',), ()),
+            ({'is_active': 'false'}, (), ('route_name_idx',)),
+        ):
+            with self.subTest(params=params):
+                self.assertIndexed(self.get('cable-routes-list', params), indexes, scans)
+
+    def test_list_pages(self):
+        # Следующая и предыдущая страница по курсору — диапазон индекса, как и первая
+        spl = make_object('SPL-2', 40.31, 69.63)
+        CableRoute.objects.create(name='A-B', from_object=spl, to_object=spl, length=10)
+        for action in ('created', 'maintenance'):
+            ObjectHistory.objects.create(infrastructure_object=spl, action=action, description='', performed_by='')
+        for name, params, index in (
+            ('infrastructure-list', {}, self.OBJECT_ID_INDEX),
+            ('infrastructure-list', {'object_type': 'splitter'}, 'infra_type_object_id_idx'),
+            ('cable-routes-list', {'cable_type': 'fiber'}, 'route_cable_type_name_idx'),
+            ('history-list', {}, 'history_performed_date_idx'),
+        ):
+            first = self.client.get(reverse(name), {**params, 'page_size': 1}).json()
+            with self.subTest(name=name, params=params):
+                self.assertIndexed(lambda: self.assertEqual(self.client.get(first['next']).status_code, 200), [index])
+                second = self.client.get(first['next']).json()
+                self.assertIndexed(lambda: self.assertEqual(self.client.get(second['previous']).status_code, 200),
+                                   [index])
+
+    def test_map_data(self):
+        # Кластеры (zoom < 13) не проверяются: группировка по вычисляемой ячейке всегда во временном B-дереве
+        bbox = {'bbox': '69.6,40.28,69.64,40.31', 'zoom': 15}
+        for params, indexes, scans in (
+            ({}, (), (self.OBJECT_ID_INDEX, 'route_name_idx')),
+            ({'format': 'compact'}, (), (self.OBJECT_ID_INDEX, 'route_name_idx')),
+            ({'object_type': 'olt'}, ('infra_type_object_id_idx',), ('route_name_idx',)),
+            ({'technology': 'gpon', 'format': 'compact'}, ('infra_tech_object_id_idx',), ('route_name_idx',)),
+            # Трассы области — по концам, найденным в том же индексе координат
+            (bbox, ('infra_lat_lng_idx',), ()),
+            ({**bbox, 'format': 'compact'}, ('infra_lat_lng_idx',), ()),
+        ):
+            with self.subTest(params=params):
+                self.assertIndexed(self.get('map-data', params), self.VERSION_INDEXES + indexes, scans)
+
+    def test_check_connection(self):
+        # Первый запрос строит пространственный индекс из БД: все точки подключения — весь частичный индекс
+        self.assertIndexed(self.get('check-connection', {'lat': 40.29, 'lng': 69.62}),
+                           scans=['infra_connection_point_idx'])
+        self.assertIndexed(lambda: list(qualification.check_points([{'lat': 40.29, 'lng': 69.62}])),
+                           ['infra_connection_point_idx'])
+
+
+class FullTextSearchTests(TestCase):
+    def setUp(self):
+        self.olt = make_object('OLT-7', 40.29, 69.62, object_type='olt', name='Узел Худжанд центр',
+                               address='ул. Ленина, 12')
+        self.spl = make_object('SPL-7', 40.30, 69.63, name='Сплиттер школа',
+                               technical_notes='рядом с узлом Худжанд')
+        self.off = make_object('SPL-8', 40.31, 69.64, name='Худжанд склад', is_active=False)
+        self.route = CableRoute.objects.create(name='Магистраль Худжанд', from_object=self.olt,
+                                               to_object=self.spl, length=120)
+
+    def search(self, q):
+        response = self.client.get(reverse('search'), {'q': q})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_ranked_prefix_search(self):
+        data = self.search('худж')
+        # Совпадение в названии весит больше, чем в примечаниях; неактивные не выдаются
+        self.assertEqual([o['object_id'] for o in data['infrastructure_objects']], ['OLT-7', 'SPL-7'])
+        self.assertEqual([r['name'] for r in data['cable_routes']], ['Магистраль Худжанд'])
+        self.assertEqual(data['total_results'], 3)
+
+    def test_all_words_required(self):
+        data = self.search('Худжанд центр')
+        self.assertEqual([o['object_id'] for o in data['infrastructure_objects']], ['OLT-7'])
+        self.assertEqual(self.search('olt 7')['infrastructure_objects'][0]['object_id'], 'OLT-7')
+
+    def test_index_follows_updates_and_deletes(self):
+        self.spl.technical_notes = ''
+        self.spl.save()
+        self.route.delete()
+        data = self.search('худжанд')
+        self.assertEqual([o['object_id'] for o in data['infrastructure_objects']], ['OLT-7'])
+        self.assertEqual(data['total_results'], 1)
+
+    def test_total_counts_beyond_limit(self):
+        for n in range(25):
+            make_object(f'ATS-{n}', 40.29, 69.62, object_type='ats', name=f'АТС Худжанд {n}')
+        data = self.search('атс')
+        self.assertEqual(len(data['infrastructure_objects']), 20)
+        self.assertEqual(data['total_results'], 25)
+
+    def test_list_filter(self):
+        response = self.client.get(reverse('infrastructure-list'), {'search': 'ленина'})
+        self.assertEqual([o['object_id'] for o in response.json()['results']], ['OLT-7'])
+        response = self.client.get(reverse('infrastructure-list'), {'search': '--'})
+        self.assertEqual(response.json()['results'], [])
+
+    def test_migration_ddl_matches_fulltext(self):
+        # DDL в миграциях записан литералами — при изменении fulltext.py нужна новая миграция
+        for name in ('0007_fulltext_search', '0008_image_thumbnails'):
+            migration = importlib.import_module(f'telecom_net.migrations.{name}')
+            self.assertEqual(migration.CREATE_OBJECT_FTS, fulltext.create_sql('object'))
+            self.assertEqual(migration.DROP_OBJECT_FTS, fulltext.drop_sql('object'))
+            self.assertEqual(migration.CREATE_ROUTE_FTS, fulltext.create_sql('route'))
+            self.assertEqual(migration.DROP_ROUTE_FTS, fulltext.drop_sql('route'))
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        autocomplete.invalidate()
+        self.olt = make_object('OLT-001', 40.29, 69.62, object_type='olt', name='Узел Худжанд центр',
+                               address='ул. Ленина, 12')
+        self.spl = make_object('SPL-002', 40.30, 69.63, name='Сплиттер школа', address='Хуҷанд, ул. Сомони')
+
+    def suggest(self, q):
+        response = self.client.get(reverse('autocomplete'), {'q': q})
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.json()['results']]
+
+    def test_normalize(self):
+        for text in ('Худжанд', 'Хуҷанд', 'Khujand', 'XUJAND'):
+            self.assertEqual(autocomplete.normalize(text), 'hujand')
+
+    def test_prefix_translit_and_typos(self):
+        self.assertEqual(self.suggest('худж'), [self.olt.pk, self.spl.pk])
+        self.assertEqual(self.suggest('khujand tsentr'), [self.olt.pk])
+        self.assertEqual(self.suggest('olt00'), [self.olt.pk])
+        self.assertEqual(self.suggest('somni'), [self.spl.pk])
+        self.assertEqual(self.suggest('ленина 13'), [])
+
+    def test_payload(self):
+        response = self.client.get(reverse('autocomplete'), {'q': 'OLT-001'})
+        self.assertEqual(response.json()['results'], [{
+            'id': self.olt.pk, 'label': 'OLT-001 — Узел Худжанд центр', 'type': 'olt', 'lat': 40.29, 'lng': 69.62,
+        }])
+
+    def test_incremental_updates(self):
+        self.suggest('школа')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.spl.name = 'Сплиттер больница'
+            self.spl.save()
+        self.assertEqual(self.suggest('школа'), [])
+        self.assertEqual(self.suggest('больн'), [self.spl.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.olt.is_active = False
+            self.olt.save()
+        self.assertEqual(self.suggest('худж'), [self.spl.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.spl.delete()
+        self.assertEqual(self.suggest('худж'), [])
+        self.assertEqual(autocomplete.index._vocab, [])
+
+    def test_follows_other_processes(self):
+        self.suggest('школа')
+        InfrastructureObject.objects.filter(pk=self.spl.pk).update(name='Сплиттер больница')
+        self.assertEqual(self.suggest('больн'), [])
+        # Другой процесс изменил объект и повысил версию
+        versions.bump(autocomplete.VERSION)
+        self.assertEqual(self.suggest('больн'), [self.spl.pk])
+
+    def test_invalid_limit(self):
+        response = self.client.get(reverse('autocomplete'), {'q': 'olt', 'limit': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+
+class CableGraphTests(TestCase):
+    def setUp(self):
+        graph.invalidate()
+        # Ловушка для жадного поиска: кратчайший путь a-b-c-d занимает обе
+        # перемычки, а два независимых пути — a-b-d и a-c-d
+        self.a, self.b, self.c, self.d = (
+            make_object(f'N-{n}', 40.29 + n * 0.001, 69.62) for n in range(4)
+        )
+        self.ab = self.route(self.a, self.b, 100)
+        self.bc = self.route(self.b, self.c, 100)
+        self.cd = self.route(self.c, self.d, 100)
+        self.ac = self.route(self.a, self.c, 300)
+        self.bd = self.route(self.b, self.d, 300)
+
+    def route(self, start, end, length, **kwargs):
+        return CableRoute.objects.create(name=f'{start.object_id}-{end.object_id}', from_object=start,
+                                         to_object=end, length=length, **kwargs)
+
+    def get(self, **params):
+        return self.client.get(reverse('graph-path'), params)
+
+    def test_shortest_path(self):
+        data = self.get(**{'from': self.a.pk, 'to': self.d.pk}).json()
+        self.assertEqual(data['paths'], [{
+            'length': 300.0,
+            'objects': [self.a.pk, self.b.pk, self.c.pk, self.d.pk],
+            'routes': [self.ab.pk, self.bc.pk, self.cd.pk],
+        }])
+
+    def test_disjoint_paths(self):
+        paths = self.get(**{'from': self.a.pk, 'to': self.d.pk, 'k': 3}).json()['paths']
+        self.assertEqual(sorted(tuple(p['routes']) for p in paths),
+                         [(self.ab.pk, self.bd.pk), (self.ac.pk, self.cd.pk)])
+        self.assertEqual([p['length'] for p in paths], [400.0, 400.0])
+
+    def test_graph_follows_route_changes(self):
+        self.get(**{'from': self.a.pk, 'to': self.d.pk})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bc.is_active = False
+            self.bc.save()
+        path = self.get(**{'from': self.a.pk, 'to': self.d.pk}).json()['paths'][0]
+        self.assertEqual(path['length'], 400.0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cd.delete()
+            self.bd.delete()
+        self.assertEqual(self.get(**{'from': self.a.pk, 'to': self.d.pk}).json()['paths'], [])
+
+    def test_graph_follows_other_processes(self):
+        self.get(**{'from': self.a.pk, 'to': self.d.pk})
+        CableRoute.objects.filter(pk=self.bc.pk).update(is_active=False)
+        versions.bump(graph.VERSION)
+        path = self.get(**{'from': self.a.pk, 'to': self.d.pk}).json()['paths'][0]
+        self.assertEqual(path['length'], 400.0)
+
+    def test_invalid_params(self):
+        self.assertEqual(self.get(**{'from': self.a.pk}).status_code, 400)
+        self.assertEqual(self.get(**{'from': self.a.pk, 'to': self.d.pk, 'k': 0}).status_code, 400)
+        self.assertEqual(self.get(**{'from': self.a.pk, 'to': 999999}).status_code, 404)
+
+
+class ImpactAnalysisTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        impact.invalidate()
+        self.olt1 = make_object('OLT-1', 40.29, 69.62, object_type='olt')
+        self.olt2 = make_object('OLT-2', 40.30, 69.62, object_type='olt')
+        self.spl1 = make_object('SPL-1', 40.29, 69.63, parent=self.olt1)
+        self.bld1 = make_object('BLD-1', 40.29, 69.64, object_type='building', parent=self.spl1)
+        self.cli1 = make_object('CLI-1', 40.29, 69.65, object_type='client', parent=self.bld1)
+        # SPL-2 запитан от обоих OLT
+        self.spl2 = make_object('SPL-2', 40.30, 69.63)
+        self.cli2 = make_object('CLI-2', 40.30, 69.64, object_type='client', parent=self.spl2)
+        self.r1 = CableRoute.objects.create(name='OLT-1 — SPL-2', from_object=self.olt1, to_object=self.spl2, length=100)
+        self.r2 = CableRoute.objects.create(name='OLT-2 — SPL-2', from_object=self.olt2, to_object=self.spl2, length=100)
+
+    def impact(self, **params):
+        response = self.client.get(reverse('impact'), params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return {group['object_type']: [o['object_id'] for o in group['objects']]
+                for group in response.json()['by_type']}
+
+    def test_object_failure(self):
+        self.assertEqual(self.impact(object=self.olt1.pk),
+                         {'splitter': ['SPL-1'], 'building': ['BLD-1'], 'client': ['CLI-1']})
+        self.assertEqual(self.impact(object=self.bld1.pk), {'client': ['CLI-1']})
+
+    def test_redundant_route(self):
+        self.assertEqual(self.impact(route=self.r2.pk), {})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.r1.delete()
+        self.assertEqual(self.impact(route=self.r2.pk), {'splitter': ['SPL-2'], 'client': ['CLI-2']})
+
+    def test_failed_object_already_in_maintenance(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.spl1.status = 'maintenance'
+            self.spl1.save()
+        self.assertEqual(self.impact(object=self.spl1.pk), {'building': ['BLD-1'], 'client': ['CLI-1']})
+        # Объекты за отказавшим уже без связи — отказ OLT-1 их не затрагивает
+        self.assertEqual(self.impact(object=self.olt1.pk), {})
+
+    def test_results_cached_until_topology_changes(self):
+        response = self.client.get(reverse('impact'), {'object': self.olt1.pk})
+        self.assertEqual(response.json()['total_affected'], 3)
+        with self.assertNumQueries(0):
+            self.client.get(reverse('impact'), {'object': self.olt1.pk})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cli1.free_ports = 0
+            self.cli1.save()
+        with self.assertNumQueries(0):
+            self.client.get(reverse('impact'), {'object': self.olt1.pk})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bld1.parent = self.spl2
+            self.bld1.save()
+        self.assertEqual(self.impact(object=self.olt1.pk), {'splitter': ['SPL-1']})
+
+    def test_invalid_params(self):
+        self.assertEqual(self.client.get(reverse('impact')).status_code, 400)
+        self.assertEqual(self.client.get(reverse('impact'), {'object': 1, 'route': 1}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('impact'), {'route': 999999}).status_code, 404)
+
+
+class HierarchyTests(TestCase):
+    def setUp(self):
+        self.olt = make_object('OLT-1', 40.29, 69.62, object_type='olt', capacity=64, free_ports=10)
+        self.spl = make_object('SPL-1', 40.29, 69.63, parent=self.olt)
+        self.bld = make_object('BLD-1', 40.29, 69.64, object_type='building', parent=self.spl, capacity=4, free_ports=1)
+        self.cli = make_object('CLI-1', 40.29, 69.65, object_type='client', parent=self.bld, capacity=1, free_ports=0)
+        self.spl2 = make_object('SPL-2', 40.30, 69.63, parent=self.olt)
+
+    def get(self, name, obj, **params):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse(name, args=[obj.pk]), params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_subtree(self):
+        data = self.get('infrastructure-subtree', self.olt)
+        self.assertEqual([(o['object_id'], o['depth']) for o in data['objects']],
+                         [('OLT-1', 0), ('SPL-1', 1), ('SPL-2', 1), ('BLD-1', 2), ('CLI-1', 3)])
+        self.assertEqual((data['count'], data['total_capacity'], data['total_free_ports']), (5, 101, 27))
+        self.assertEqual(data['by_type'], {'olt': 1, 'splitter': 2, 'building': 1, 'client': 1})
+        self.assertEqual(data['cycles'], [])
+
+    def test_subtree_depth_and_type(self):
+        data = self.get('infrastructure-subtree', self.olt, depth=2, type='building,client')
+        self.assertEqual([o['object_id'] for o in data['objects']], ['BLD-1'])
+        self.assertEqual(data['total_capacity'], 4)
+
+    def test_ancestors(self):
+        data = self.get('infrastructure-ancestors', self.cli)
+        self.assertEqual([(o['object_id'], o['depth']) for o in data['objects']],
+                         [('BLD-1', 1), ('SPL-1', 2), ('OLT-1', 3)])
+        self.assertEqual(len(self.get('infrastructure-ancestors', self.cli, depth=1)['objects']), 1)
+
+    def test_cycle_detection(self):
+        InfrastructureObject.objects.filter(pk=self.olt.pk).update(parent=self.cli)
+        data = self.get('infrastructure-subtree', self.spl)
+        self.assertEqual([o['object_id'] for o in data['objects']], ['SPL-1', 'BLD-1', 'CLI-1', 'OLT-1', 'SPL-2'])
+        self.assertEqual(data['cycles'], [self.spl.pk])
+        data = self.get('infrastructure-ancestors', self.cli)
+        self.assertEqual([o['object_id'] for o in data['objects']], ['BLD-1', 'SPL-1', 'OLT-1'])
+        self.assertEqual(data['cycles'], [self.cli.pk])
+
+    def test_missing_object(self):
+        self.assertEqual(self.client.get(reverse('infrastructure-subtree', args=[999999])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('infrastructure-subtree', args=[self.olt.pk]),
+                                         {'depth': -1}).status_code, 400)
+
+
+class ImportNetworkTests(TestCase):
+    OBJECTS_CSV = (
+        'object_id,object_type,name,lat,lng,capacity,free_ports,parent,is_active\n'
+        'SPL-1,splitter,Сплиттер 1,40.29,69.63,16,8,OLT-1,да\n'
+        'OLT-1,olt,Станция,40.29,69.62,64,32,,true\n'
+        'BAD-1,splitter,Переполнен,40.29,69.64,4,8,,\n'
+        'BAD-2,router,Неизвестный тип,40.29,69.64,4,2,,\n'
+        'CLI-1,client,Клиент,40.29,69.65,1,0,SPL-1,нет\n'
+    )
+
+    def import_csv(self, content, kind='objects', chunk_size=2):
+        return importer.import_network(io.BytesIO(content.encode()), kind, 'csv', chunk_size=chunk_size)
+
+    def test_objects_csv(self):
+        report = self.import_csv(self.OBJECTS_CSV)
+        self.assertEqual((report.rows, report.created, report.updated, report.error_count), (5, 3, 0, 2))
+        self.assertEqual(sorted(error['line'] for error in report.errors), [4, 5])
+        spl = InfrastructureObject.objects.get(object_id='SPL-1')
+        # Родитель OLT-1 идет в файле позже и привязывается в конце импорта
+        self.assertEqual(spl.parent.object_id, 'OLT-1')
+        self.assertEqual(InfrastructureObject.objects.get(object_id='CLI-1').parent, spl)
+        self.assertFalse(InfrastructureObject.objects.get(object_id='CLI-1').is_active)
+        self.assertEqual(network_stats.read_stats()['total_objects'], 3)
+
+    def test_reimport_updates(self):
+        self.import_csv(self.OBJECTS_CSV)
+        report = self.import_csv('object_id;free_ports;name\nSPL-1;2;Сплиттер школа\nNEW-1;1;Без координат\n')
+        self.assertEqual((report.created, report.updated, report.error_count), (0, 1, 1))
+        spl = InfrastructureObject.objects.get(object_id='SPL-1')
+        self.assertEqual((spl.free_ports, spl.name, spl.parent.object_id), (2, 'Сплиттер школа', 'OLT-1'))
+        self.assertEqual(self.client.get(reverse('search'), {'q': 'школа'}).json()['total_results'], 1)
+
+    def test_routes_csv(self):
+        self.import_csv(self.OBJECTS_CSV)
+        routes = (
+            'name,from_object,to_object,length,fiber_count\n'
+            'Магистраль,OLT-1,SPL-1,120,8\n'
+            'Обрыв,OLT-1,NOPE-1,50,1\n'
+            'Абонент,SPL-1,CLI-1,30,1\n'
+        )
+        report = self.import_csv(routes, kind='routes')
+        self.assertEqual((report.created, report.error_count), (2, 1))
+        report = self.import_csv(routes.replace('120,8', '150,8'), kind='routes')
+        self.assertEqual((report.created, report.updated), (0, 2))
+        self.assertEqual(CableRoute.objects.get(name='Магистраль').length, 150)
+
+    def test_bumps_shared_versions(self):
+        # Импорт идет в обход сигналов, часто в процессе команды: воркеры узнают о нем по версиям
+        names = (spatial.VERSION, autocomplete.VERSION, graph.VERSION, impact.VERSION, coverage.VERSION)
+        before = {name: versions.current(name) for name in names}
+        self.import_csv(self.OBJECTS_CSV)
+        changed = {name for name in names if versions.current(name) != before[name]}
+        self.assertEqual(changed, {spatial.VERSION, autocomplete.VERSION, impact.VERSION, coverage.VERSION})
+        self.import_csv('name,from_object,to_object,length\nМагистраль,OLT-1,SPL-1,120\n', kind='routes')
+        self.assertNotEqual(versions.current(graph.VERSION), before[graph.VERSION])
+
+    def test_geojson_streaming(self):
+        features = [
+            {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [69.62 + n / 100, 40.29]},
+             'properties': {'object_id': f'GJ-{n}', 'object_type': 'splitter', 'name': f'Точка {n}'}}
+            for n in range(5)
+        ]
+        content = json.dumps({'type': 'FeatureCollection', 'features': features})
+        parsed = list(importer.iter_geojson_features(io.StringIO(content), read_size=16))
+        self.assertEqual(parsed, features)
+        report = importer.import_network(io.BytesIO(content.encode()), 'objects', 'geojson')
+        self.assertEqual(report.created, 5)
+        self.assertEqual(InfrastructureObject.objects.get(object_id='GJ-3').lng, 69.65)
+
+    def test_truncated_file_keeps_written_chunks_consistent(self):
+        spatial.get_index()
+        autocomplete.get_index()
+        features = [
+            {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [69.62 + n / 100, 40.29]},
+             'properties': {'object_id': f'GJ-{n}', 'object_type': 'splitter', 'name': f'Точка {n}',
+                            'capacity': 8, 'free_ports': 4}}
+            for n in range(5)
+        ]
+        content = json.dumps({'type': 'FeatureCollection', 'features': features})[:-3]
+        with self.assertRaises(ValueError):
+            importer.import_network(io.BytesIO(content.encode()), 'objects', 'geojson', chunk_size=2)
+        written = set(InfrastructureObject.objects.values_list('id', flat=True))
+        self.assertEqual(len(written), 4)
+        self.assertEqual(network_stats.read_stats()['total_objects'], 4)
+        index = spatial.get_index()
+        self.assertEqual(len(index), 4)
+        self.assertTrue(all(pk in index for pk in written))
+        self.assertEqual({item['id'] for item in autocomplete.get_index().search('точка')}, written)
+
+    def test_api_and_command(self):
+        upload = SimpleUploadedFile('network.csv', self.OBJECTS_CSV.encode())
+        response = self.client.post(reverse('import-network'), {'file': upload, 'kind': 'objects'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 3)
+        upload = SimpleUploadedFile('network.txt', b'x')
+        self.assertEqual(self.client.post(reverse('import-network'), {'file': upload}).status_code, 400)
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8') as f:
+            f.write('name,from_object,to_object,length\nМагистраль,OLT-1,SPL-1,120\n')
+            f.flush()
+            out = io.StringIO()
+            call_command('import_network', f.name, kind='routes', stdout=out)
+        self.assertIn('создано 1', out.getvalue())
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        importer.import_network(io.BytesIO(ImportNetworkTests.OBJECTS_CSV.encode()), 'objects', 'csv')
+        routes = 'name,from_object,to_object,length\nМагистраль,OLT-1,SPL-1,120\nАбонент,SPL-1,CLI-1,30\n'
+        importer.import_network(io.BytesIO(routes.encode()), 'routes', 'csv')
+
+    def export(self, kind, **params):
+        response = self.client.get(reverse('export-network', args=[kind]), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_formats(self):
+        response, content = self.export('objects')
+        self.assertEqual(response['Content-Type'], 'application/geo+json')
+        features = json.loads(content)['features']
+        # Порядок выгрузки — по id (порядку создания)
+        self.assertEqual([f['properties']['object_id'] for f in features], ['SPL-1', 'OLT-1', 'CLI-1'])
+        self.assertEqual(features[0]['geometry'], {'type': 'Point', 'coordinates': [69.63, 40.29]})
+        self.assertEqual(features[0]['properties']['parent'], 'OLT-1')
+
+        _, content = self.export('routes', format='ndjson')
+        lines = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(lines[0]['geometry']['coordinates'], [[69.62, 40.29], [69.63, 40.29]])
+        self.assertEqual((lines[1]['properties']['from_object'], lines[1]['properties']['to_object']),
+                         ('SPL-1', 'CLI-1'))
+
+        response, content = self.export('objects', format='csv', object_type='olt')
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        self.assertEqual(len(content.splitlines()), 2)
+
+        self.assertEqual(self.client.get(reverse('export-network', args=['objects']), {'format': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('export-network', args=['people'])).status_code, 400)
+
+    def test_filters_match_api(self):
+        _, content = self.export('objects', format='ndjson', is_active='true', search='Станция')
+        self.assertEqual([json.loads(line)['properties']['object_id'] for line in content.splitlines()], ['OLT-1'])
+        _, content = self.export('objects', format='ndjson', search='нет-такого')
+        self.assertEqual(content, '')
+
+    def test_round_trip_through_importer(self):
+        _, objects_csv = self.export('objects', format='csv')
+        _, routes_geojson = self.export('routes')
+        CableRoute.objects.all().delete()
+        InfrastructureObject.objects.all().delete()
+
+        report = importer.import_network(io.BytesIO(objects_csv.encode()), 'objects', 'csv')
+        self.assertEqual((report.created, report.error_count), (3, 0))
+        report = importer.import_network(io.BytesIO(routes_geojson.encode()), 'routes', 'geojson')
+        self.assertEqual((report.created, report.error_count), (2, 0))
+        cli = InfrastructureObject.objects.get(object_id='CLI-1')
+        self.assertEqual((cli.parent.object_id, cli.is_active), ('SPL-1', False))
+        self.assertEqual(CableRoute.objects.get(name='Магистраль').to_object.object_id, 'SPL-1')
+
+    def test_small_parts_and_command(self):
+        parts = list(export.export_parts('objects', 'ndjson', {}, rows_per_part=2))
+        self.assertEqual([part.count('\n') for part in parts], [2, 1])
+
+        out = io.StringIO()
+        call_command('export_network', kind='objects', fmt='csv', filters=['status=active'], stdout=out)
+        self.assertEqual(out.getvalue().splitlines()[0].split(',')[:2], ['id', 'object_id'])
+        self.assertEqual(len(out.getvalue().splitlines()), 4)
+
+
+def image_upload(name, size=(2000, 1500), mode='RGB', fmt='JPEG'):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new(mode, size, (200, 40, 40, 128) if mode == 'RGBA' else (200, 40, 40)).save(buffer, fmt)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name, THUMBNAILS_BACKGROUND=False)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.obj = make_object('OLT-1', 40.29, 69.62)
+
+    def upload(self, obj, **images):
+        for field, image in images.items():
+            setattr(obj, field, image)
+        with self.captureOnCommitCallbacks(execute=True):
+            obj.save()
+        obj.refresh_from_db()
+        return obj
+
+    def test_generated_on_upload(self):
+        from PIL import Image
+
+        from django.core.files.storage import default_storage
+
+        obj = self.upload(self.obj, photo=image_upload('photo.jpg'))
+        self.assertEqual(len(obj.photo_hash), 64)
+        for size in thumbnails.SIZES:
+            for fmt in thumbnails.FORMATS:
+                self.assertTrue(default_storage.exists(thumbnails.thumbnail_name(obj.photo_hash, size, fmt)))
+        with default_storage.open(thumbnails.thumbnail_name(obj.photo_hash, 'large', 'webp')) as f:
+            self.assertEqual(Image.open(f).size, (1024, 768))
+
+        data = self.client.get(reverse('infrastructure-detail', args=[obj.pk])).json()
+        self.assertTrue(data['photo_thumbnails']['small']['webp'].endswith(f'{obj.photo_hash}-120.webp'))
+        self.assertIsNone(data['diagram_thumbnails'])
+
+    def test_same_content_reused_and_replaced_photo_reset(self):
+        obj = self.upload(self.obj, photo=image_upload('photo.jpg'))
+        other = self.upload(make_object('OLT-2', 40.29, 69.63), photo=image_upload('copy.jpg'))
+        self.assertEqual(other.photo_hash, obj.photo_hash)
+
+        # Новое фото: хэш прежнего сбрасывается в том же сохранении
+        obj.photo = image_upload('new.png', size=(300, 200), mode='RGBA', fmt='PNG')
+        with mock.patch.object(thumbnails, 'schedule'), self.captureOnCommitCallbacks(execute=True):
+            obj.save()
+        obj.refresh_from_db()
+        self.assertEqual(obj.photo_hash, '')
+        thumbnails.process(InfrastructureObject, obj.pk, 'photo', 'photo_hash')
+        obj.refresh_from_db()
+        self.assertNotIn(obj.photo_hash, ('', other.photo_hash))
+
+        # Сохранение без смены файла миниатюры не трогает
+        with mock.patch.object(thumbnails, 'schedule') as schedule, self.captureOnCommitCallbacks(execute=True):
+            obj.name = 'Станция'
+            obj.save()
+        schedule.assert_not_called()
+
+    def test_command_and_admin_preview(self):
+        from django.contrib.auth.models import User
+
+        obj = self.upload(self.obj, diagram=image_upload('scheme.jpg', size=(400, 300)))
+        InfrastructureObject.objects.filter(pk=obj.pk).update(diagram_hash='')
+        out = io.StringIO()
+        call_command('build_thumbnails', stdout=out)
+        self.assertIn('Миниатюры готовы: 1', out.getvalue())
+        obj.refresh_from_db()
+        self.assertTrue(obj.diagram_hash)
+
+        User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.client.login(username='admin', password='admin')
+        response = self.client.get(reverse('admin:telecom_net_infrastructureobject_change', args=[obj.pk]))
+        self.assertContains(response, f'{obj.diagram_hash}-120.webp')
+
+
+class GeneratorTests(TestCase):
+    def test_topology(self):
+        counts = generator.generate(600, seed=1)
+        objects = InfrastructureObject.objects.all()
+        self.assertEqual(counts['objects'], objects.count())
+        # Каждый объект, кроме станций, связан с родителем и трассой от него
+        self.assertEqual(counts['routes'], objects.filter(parent__isnull=False).count())
+        self.assertEqual(objects.filter(parent__isnull=True).exclude(object_type__in=['olt', 'ats', 'switch']).count(), 0)
+        client = objects.filter(object_type='client').select_related('parent__parent__parent').first()
+        self.assertEqual(client.parent.object_type, 'building')
+        self.assertIn(client.parent.parent.parent.object_type, ['olt', 'ats', 'switch'])
+        route = CableRoute.objects.get(to_object=client)
+        self.assertEqual(route.from_object_id, client.parent_id)
+        self.assertGreaterEqual(route.length, calculate_distance(client.lat, client.lng, client.parent.lat,
+                                                                 client.parent.lng))
+        self.assertEqual(ObjectHistory.objects.filter(action='created').count(),
+                         objects.filter(object_type__in=['olt', 'ats', 'switch', 'splitter']).count())
+        self.assertEqual(network_stats.read_stats()['total_objects'], counts['objects'])
+
+        # Зерно определяет сеть
+        rows = list(objects.order_by('object_id').values_list('object_id', 'lat', 'lng')[:50])
+        generator.clear()
+        generator.generate(600, seed=1)
+        self.assertEqual(rows, list(objects.order_by('object_id').values_list('object_id', 'lat', 'lng')[:50]))
+
+    def test_clear_command(self):
+        olt = make_object('OLT-REAL', 40.29, 69.62, object_type='olt')
+        out = io.StringIO()
+        call_command('generate_network', objects=300, prefix='SYN', stdout=out)
+        self.assertIn('Создано объектов', out.getvalue())
+        station = InfrastructureObject.objects.filter(object_id__startswith='SYN-', parent__isnull=True).first()
+        spl = make_object('SPL-REAL', 40.29, 69.62, parent=station)
+        CableRoute.objects.create(name='Настоящая', from_object=olt, to_object=spl, length=10)
+
+        call_command('generate_network', clear=True, prefix='SYN', stdout=out)
+        self.assertEqual(set(InfrastructureObject.objects.values_list('object_id', flat=True)), {'OLT-REAL', 'SPL-REAL'})
+        self.assertIsNone(InfrastructureObject.objects.get(object_id='SPL-REAL').parent)
+        self.assertEqual(CableRoute.objects.count(), 1)
+        self.assertFalse(ObjectHistory.objects.filter(infrastructure_object__object_id__startswith='SYN-').exists())
+        self.assertTrue(DeletionLog.objects.filter(model='object', record_id=station.pk).exists())
+        self.assertEqual(network_stats.read_stats()['total_objects'], 2)
+
+    def test_bumps_shared_versions(self):
+        names = (spatial.VERSION, autocomplete.VERSION, graph.VERSION, impact.VERSION, coverage.VERSION)
+        for action in (lambda: generator.generate(100, seed=1), generator.clear):
+            before = [versions.current(name) for name in names]
+            action()
+            after = [versions.current(name) for name in names]
+            self.assertTrue(all(new > old for old, new in zip(before, after)))
+
+
+class StatsReadModelTests(TestCase):
+    def stats(self):
+        response = self.client.get(reverse('infrastructure-stats'))
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_deltas_match_rebuild(self):
+        olt = make_object('OLT-1', 40.29, 69.62, object_type='olt', capacity=64, free_ports=16)
+        spl = make_object('SPL-1', 40.30, 69.63, technology='')
+        client = make_object('CL-1', 40.31, 69.64, object_type='client', capacity=1, free_ports=0)
+
+        spl.technology = 'adsl'
+        spl.free_ports = 2
+        spl.save()
+        client.is_active = False
+        client.status = 'inactive'
+        client.save()
+        olt.delete()
+
+        incremental = self.stats()
+        network_stats.rebuild()
+        self.assertEqual(incremental, self.stats())
+
+        self.assertEqual(incremental['total_objects'], 2)
+        self.assertEqual(incremental['active_objects'], 1)
+        self.assertEqual(incremental['objects_by_technology'], [{'technology': 'adsl', 'count': 1},
+                                                               {'technology': 'gpon', 'count': 1}])
+        self.assertEqual(incremental['total_capacity'], 17)
+        self.assertEqual(incremental['total_free_ports'], 2)
+
+    def test_delete_stale_instance(self):
+        obj = make_object('SPL-1', 40.29, 69.62)
+        stale = InfrastructureObject.objects.get(pk=obj.pk)
+        obj.free_ports, obj.technology = 2, 'adsl'
+        obj.save()
+        # Дельта удаления — по значениям из БД, а не из устаревшего экземпляра
+        stale.delete()
+        incremental = self.stats()
+        network_stats.rebuild()
+        self.assertEqual(incremental, self.stats())
+        self.assertEqual(incremental['total_free_ports'], 0)
+
+    def test_utilization_counts_used_ports(self):
+        make_object('OLT-1', 40.29, 69.62, capacity=100, free_ports=25)
+
+        data = self.stats()
+
+        self.assertEqual(data['used_ports'], 75)
+        self.assertEqual(data['utilization_rate'], 75.0)
+
+    def test_empty_network(self):
+        self.assertEqual(self.stats()['utilization_rate'], 0)
+
+    def test_constant_queries(self):
+        for i in range(10):
+            make_object(f'SPL-{i}', 40.29, 69.62, object_type=['olt', 'splitter'][i % 2])
+        with self.assertNumQueries(1):
+            self.client.get(reverse('infrastructure-stats'))
+
+
+class StatsTransactionTests(TransactionTestCase):
+    """Дельта статистики — в транзакции объекта: ошибка в ней откатывает и сохранение"""
+
+    def test_failed_delta_rolls_back(self):
+        obj = make_object('SPL-1', 40.29, 69.62)
+        obj.free_ports = 2
+        with mock.patch.object(network_stats, 'apply_delta', side_effect=RuntimeError), \
+                self.assertRaises(RuntimeError):
+            obj.save()
+        self.assertEqual(InfrastructureObject.objects.get(pk=obj.pk).free_ports, 8)
+
+        with mock.patch.object(network_stats, 'apply_delta', side_effect=RuntimeError), \
+                self.assertRaises(RuntimeError):
+            obj.delete()
+        self.assertTrue(InfrastructureObject.objects.filter(pk=obj.pk).exists())
+        self.assertFalse(DeletionLog.objects.exists())
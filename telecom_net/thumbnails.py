@@ -0,0 +1,157 @@
+"""
+Миниатюры фотографий и схем.
+
+После загрузки изображения (см. signals.py) пул потоков строит миниатюры
+нескольких размеров в WebP и JPEG. Файлы лежат в MEDIA_ROOT/thumbnails/ и
+называются по SHA-256 содержимого: одинаковые файлы обрабатываются один
+раз, а повторная загрузка того же фото ничего не пересчитывает. Хэш
+записывается в поле <поле>_hash, только когда все миниатюры готовы, —
+сериализаторы и админка отдают ссылки на миниатюры по этому полю.
+"""
+
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Наибольшая сторона миниатюры в пикселях
+SIZES = {'small': 120, 'medium': 320, 'large': 1024}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+THUMBNAIL_DIR = 'thumbnails'
+MAX_WORKERS = 2
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def image_fields(model):
+    """Поля изображений модели с миниатюрами: (поле, поле хэша)"""
+    from .models import CableRoute, InfrastructureObject
+
+    return {
+        InfrastructureObject: (('photo', 'photo_hash'), ('diagram', 'diagram_hash')),
+        CableRoute: (('route_photo', 'route_photo_hash'),),
+    }.get(model, ())
+
+
+def thumbnail_name(digest, size, fmt):
+    return f'{THUMBNAIL_DIR}/{digest[:2]}/{digest}-{SIZES[size]}.{fmt}'
+
+
+def urls(digest):
+    """Ссылки на миниатюры: {size: {format: url}} или None, если их еще нет"""
+    if not digest:
+        return None
+    return {
+        size: {fmt: default_storage.url(thumbnail_name(digest, size, fmt)) for fmt in FORMATS}
+        for size in SIZES
+    }
+
+
+def content_hash(name, storage=default_storage):
+    digest = hashlib.sha256()
+    with storage.open(name, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def encode(image, fmt):
+    pil_format, options = FORMATS[fmt]
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        # JPEG без прозрачности — подложка белая, как у схем на бумаге
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A') if image.mode == 'RGBA' else None)
+        image = background
+    buffer = BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def generate(name, storage=default_storage):
+    """Миниатюры для файла name; возвращает хэш содержимого. Готовые не пересоздаются."""
+    digest = content_hash(name, storage)
+    missing = [(size, fmt) for size in SIZES for fmt in FORMATS
+               if not storage.exists(thumbnail_name(digest, size, fmt))]
+    if not missing:
+        return digest
+
+    with storage.open(name, 'rb') as f:
+        image = Image.open(f)
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    # От большего размера к меньшему: каждый следующий уменьшается из предыдущего
+    for size in sorted(SIZES, key=SIZES.get, reverse=True):
+        pixels = SIZES[size]
+        image.thumbnail((pixels, pixels), Image.LANCZOS)
+        for fmt in FORMATS:
+            if (size, fmt) in missing:
+                storage.save(thumbnail_name(digest, size, fmt), ContentFile(encode(image, fmt)))
+    return digest
+
+
+def process(model, pk, field, hash_field):
+    """Построить миниатюры изображения записи и отметить их готовность хэшем"""
+    name = model.objects.filter(pk=pk).values_list(field, flat=True).first()
+    if not name:
+        return None
+    digest = generate(name)
+    # Файл могли заменить, пока строились миниатюры, — тогда хэш не наш.
+    # updated_at — чтобы инкрементальная синхронизация карты увидела ссылки
+    model.objects.filter(pk=pk, **{field: name}).update(**{hash_field: digest, 'updated_at': timezone.now()})
+    return digest
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def background():
+    """Миниатюры в пуле потоков; THUMBNAILS_BACKGROUND = False — сразу (тесты)"""
+    return getattr(settings, 'THUMBNAILS_BACKGROUND', True)
+
+
+def _run(model, pk, field, hash_field):
+    try:
+        process(model, pk, field, hash_field)
+    except Exception:
+        logger.exception('Не удалось построить миниатюры %s #%s (%s)', model.__name__, pk, field)
+    finally:
+        close_old_connections()
+
+
+def schedule(model, pk, field, hash_field):
+    """Поставить построение миниатюр в очередь пула (PIL отпускает GIL при сжатии)"""
+    global _executor
+    if not background():
+        process(model, pk, field, hash_field)
+        return
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='thumbnails')
+    _executor.submit(_run, model, pk, field, hash_field)
+
+
+def changed_fields(instance, previous):
+    """Поля изображений, которые изменились при сохранении: [(поле, поле хэша)]"""
+    changed = []
+    for field, hash_field in image_fields(type(instance)):
+        name = getattr(instance, field).name or ''
+        if previous is None:
+            if name:
+                changed.append((field, hash_field))
+        elif name != (previous.get(field) or ''):
+            changed.append((field, hash_field))
+    return changed
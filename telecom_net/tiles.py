@@ -0,0 +1,123 @@
+"""
+Тайлы карты (slippy map z/x/y) с объектами и кабельными трассами в GeoJSON.
+
+Готовый тайл хранится в кэше Django. При сохранении или удалении объекта
+либо трассы сбрасываются только тайлы, которых коснулось изменение
+(старое и новое положение объекта, концы связанных трасс) — см. signals.py.
+"""
+
+import json
+import math
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import CableRoute, InfrastructureObject
+
+TILE_MIN_ZOOM = 12
+TILE_MAX_ZOOM = 19
+TILE_CACHE_TIMEOUT = 24 * 60 * 60
+
+OBJECT_FIELDS = ('id', 'object_id', 'name', 'object_type', 'technology', 'status', 'free_ports', 'lat', 'lng')
+ROUTE_FIELDS = (
+    'id', 'name', 'cable_type', 'route_type', 'length', 'fiber_count', 'from_object', 'to_object',
+    'from_object__lat', 'from_object__lng', 'to_object__lat', 'to_object__lng',
+)
+
+
+def is_valid_tile(z, x, y):
+    return TILE_MIN_ZOOM <= z <= TILE_MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def tile_for_point(lat, lng, z):
+    """Тайл (x, y) масштаба z, содержащий точку (Web Mercator)"""
+    n = 2 ** z
+    lat = max(min(lat, 85.05112878), -85.05112878)
+    lat_r = math.radians(lat)
+    x = int((lng + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(lat_r)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_bbox(z, x, y):
+    """Границы тайла: (min_lng, min_lat, max_lng, max_lat)"""
+    n = 2 ** z
+
+    def lat_of(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360.0 - 180.0, lat_of(y + 1), (x + 1) / n * 360.0 - 180.0, lat_of(y)
+
+
+def tiles_for_point(lat, lng):
+    """Ключи (z, x, y) всех тайлов, содержащих точку, на всех масштабах"""
+    return [(z, *tile_for_point(lat, lng, z)) for z in range(TILE_MIN_ZOOM, TILE_MAX_ZOOM + 1)]
+
+
+def cache_key(z, x, y):
+    return f'tiles:{z}:{x}:{y}'
+
+
+def build_tile(z, x, y):
+    """
+    Содержимое тайла: активные объекты внутри тайла и активные трассы,
+    у которых хотя бы один конец внутри (как в map-data с bbox).
+    """
+    min_lng, min_lat, max_lng, max_lat = tile_bbox(z, x, y)
+    in_tile = Q(lat__gte=min_lat, lat__lt=max_lat, lng__gte=min_lng, lng__lt=max_lng)
+
+    objects = InfrastructureObject.objects.filter(in_tile, is_active=True).values_list(*OBJECT_FIELDS)
+    endpoints = InfrastructureObject.objects.filter(in_tile).values('id')
+    routes = CableRoute.objects.filter(
+        Q(from_object__in=endpoints) | Q(to_object__in=endpoints),
+        is_active=True,
+    ).values_list(*ROUTE_FIELDS)
+
+    features = []
+    for pk, object_id, name, object_type, technology, status, free_ports, lat, lng in objects:
+        features.append({
+            'type': 'Feature',
+            'id': f'object:{pk}',
+            'geometry': {'type': 'Point', 'coordinates': [lng, lat]},
+            'properties': {
+                'kind': 'object', 'id': pk, 'object_id': object_id, 'name': name,
+                'object_type': object_type, 'technology': technology,
+                'status': status, 'free_ports': free_ports,
+            },
+        })
+    for (pk, name, cable_type, route_type, length, fiber_count, from_id, to_id,
+         from_lat, from_lng, to_lat, to_lng) in routes:
+        features.append({
+            'type': 'Feature',
+            'id': f'route:{pk}',
+            'geometry': {'type': 'LineString', 'coordinates': [[from_lng, from_lat], [to_lng, to_lat]]},
+            'properties': {
+                'kind': 'route', 'id': pk, 'name': name, 'cable_type': cable_type,
+                'route_type': route_type, 'length': length, 'fiber_count': fiber_count,
+                'from_object': from_id, 'to_object': to_id,
+            },
+        })
+
+    return json.dumps({'type': 'FeatureCollection', 'features': features}, ensure_ascii=False)
+
+
+def get_tile(z, x, y):
+    """GeoJSON тайла из кэша; при промахе строится и кладется в кэш"""
+    key = cache_key(z, x, y)
+    content = cache.get(key)
+    if content is None:
+        content = build_tile(z, x, y)
+        cache.set(key, content, TILE_CACHE_TIMEOUT)
+    return content
+
+
+def invalidate_points(points):
+    """Сбросить тайлы, содержащие любую из точек (lat, lng)"""
+    keys = {
+        cache_key(*tile)
+        for lat, lng in points
+        if lat is not None and lng is not None
+        for tile in tiles_for_point(lat, lng)
+    }
+    if keys:
+        cache.delete_many(list(keys))
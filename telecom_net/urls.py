@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import async_views, views
 
 router = DefaultRouter()
 router.register(r'infrastructure', views.InfrastructureObjectViewSet, basename='infrastructure')
@@ -10,8 +10,23 @@ router.register(r'history', views.ObjectHistoryViewSet, basename='history')
 urlpatterns = [
     path('', include(router.urls)),
     path('check-connection/', views.check_connection, name='check-connection'),
+    path('check-connection/batch/', views.check_connection_batch, name='check-connection-batch'),
     path('map-data/', views.map_data, name='map-data'),
+    path('tiles/<int:z>/<int:x>/<int:y>/', views.map_tile, name='map-tile'),
+    path('coverage/<int:z>/<int:x>/<int:y>.png', views.coverage_tile, name='coverage-tile'),
     path('search/', views.search, name='search'),
+    path('autocomplete/', views.autocomplete_view, name='autocomplete'),
+    path('graph/path/', views.graph_path, name='graph-path'),
+    path('impact/', views.impact_analysis, name='impact'),
+    path('import/', views.import_network, name='import-network'),
+    path('export/<str:kind>/', views.export_network, name='export-network'),
+    path('_metrics', views.metrics_view, name='metrics'),
+
+    # Асинхронные версии для ASGI (async_views.py)
+    path('async/map-data/', async_views.map_data, name='async-map-data'),
+    path('async/check-connection/', async_views.check_connection, name='async-check-connection'),
+    path('async/search/', async_views.search, name='async-search'),
+    path('async/stats/', async_views.stats, name='async-stats'),
     
     # Новые endpoints
     path('infrastructure/<int:pk>/connected-routes/', 
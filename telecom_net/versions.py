@@ -0,0 +1,46 @@
+"""
+Версии структур в памяти процесса (индексы spatial и autocomplete, граф
+трасс, топология impact), общие для всех процессов: воркеров сервера и
+команд import_network / generate_network.
+
+Версия — размер файла VERSIONS_DIR/<name>: каждое изменение дописывает в
+него байт. Дозапись с O_APPEND атомарна, поэтому у каждого изменения своя
+версия, и процесс, сам применивший изменение к своей копии, по версии
+ровно на единицу больше прежней знает, что чужих изменений между ними не
+было. Проверка версии — один stat() без запросов к БД. Файлы растут на
+байт за изменение; удалять их можно только при остановленных процессах.
+"""
+
+import os
+from pathlib import Path
+
+from django.conf import settings
+
+
+def path(name):
+    return Path(settings.VERSIONS_DIR) / name
+
+
+def current(name):
+    """Текущая версия name (0 — изменений еще не было)"""
+    try:
+        return os.stat(path(name)).st_size
+    except FileNotFoundError:
+        return 0
+
+
+def bump(name):
+    """Новая версия name: структура устарела во всех процессах. Возвращает эту версию"""
+    file = path(name)
+    flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT
+    try:
+        fd = os.open(file, flags, 0o644)
+    except FileNotFoundError:
+        file.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(file, flags, 0o644)
+    try:
+        os.write(fd, b'.')
+        # Позиция после дозаписи — конец именно нашего байта, даже при параллельных bump()
+        return os.lseek(fd, 0, os.SEEK_CUR)
+    finally:
+        os.close(fd)
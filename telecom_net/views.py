@@ -1,11 +1,28 @@
 from rest_framework import viewsets, status
-from rest_framework.decorators import api_view, action
+from rest_framework.decorators import api_view, action, renderer_classes
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
-from django.db.models import Q, Count, Sum
-from django.http import JsonResponse
+from django.core.exceptions import RequestDataTooBig
+from django.db.models import Q, Count, Sum, F, Max
+from django.db.models.functions import Floor
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
+import hashlib
+import json
 import math
 from django.shortcuts import render
-from .models import InfrastructureObject, CableRoute, ObjectHistory
+from . import (autocomplete, coverage, export, fulltext, graph, hierarchy, impact, importer, metrics, qualification,
+               spatial, tiles)
+from . import stats as network_stats
+from .models import InfrastructureObject, CableRoute, ObjectHistory, DeletionLog
+from .db_router import read_from_replica
+from .filters import filter_objects, filter_routes
+from .pagination import HistoryPagination, ObjectPagination, RoutePagination
+from .qualification import CONNECTION_RADIUS, SEARCH_RADIUS
+from .renderers import CompactJSONRenderer, TimedJSONRenderer
 from .serializers import (
     InfrastructureObjectSerializer, 
     CableRouteSerializer,
@@ -22,82 +39,60 @@ def map_picker(request):
 class InfrastructureObjectViewSet(viewsets.ModelViewSet):
     queryset = InfrastructureObject.objects.all()
     serializer_class = InfrastructureObjectSerializer
+    pagination_class = ObjectPagination
     
     def get_queryset(self):
-        queryset = InfrastructureObject.objects.select_related('parent').prefetch_related('children')
-        
-        # Фильтрация по типу объекта
-        object_type = self.request.query_params.get('object_type')
-        if object_type:
-            queryset = queryset.filter(object_type=object_type)
-        
-        # Фильтрация по технологии
-        technology = self.request.query_params.get('technology')
-        if technology:
-            queryset = queryset.filter(technology=technology)
-        
-        # Фильтрация по статусу
-        status = self.request.query_params.get('status')
-        if status:
-            queryset = queryset.filter(status=status)
-        
-        # Фильтрация по активности
-        is_active = self.request.query_params.get('is_active')
-        if is_active is not None:
-            queryset = queryset.filter(is_active=is_active.lower() == 'true')
-        
-        # Поиск
-        search = self.request.query_params.get('search')
-        if search:
-            queryset = queryset.filter(
-                Q(object_id__icontains=search) |
-                Q(name__icontains=search) |
-                Q(address__icontains=search) |
-                Q(technical_notes__icontains=search) |
-                Q(notes__icontains=search)
-            )
-        
+        queryset = InfrastructureObjectSerializer.setup_eager_loading(InfrastructureObject.objects.all())
+        queryset = filter_objects(queryset, self.request.query_params)
         return queryset.order_by('object_id')
     
     @action(detail=False, methods=['get'])
+    @read_from_replica
     def stats(self, request):
-        """Расширенная статистика"""
-        stats = {
-            'total_objects': InfrastructureObject.objects.count(),
-            'active_objects': InfrastructureObject.objects.filter(is_active=True).count(),
-            'objects_by_type': InfrastructureObject.objects.values('object_type').annotate(
-                count=Count('id')
-            ),
-            'objects_by_technology': InfrastructureObject.objects.values('technology').annotate(
-                count=Count('id')
-            ),
-            'objects_by_status': InfrastructureObject.objects.values('status').annotate(
-                count=Count('id')
-            ),
-            'total_capacity': InfrastructureObject.objects.aggregate(
-                total_capacity=Sum('capacity')
-            )['total_capacity'] or 0,
-            'total_free_ports': InfrastructureObject.objects.aggregate(
-                total_free_ports=Sum('free_ports')
-            )['total_free_ports'] or 0,
-            'utilization_rate': round(
-                (InfrastructureObject.objects.aggregate(total_free=Sum('free_ports'))['total_free'] or 0) / 
-                (InfrastructureObject.objects.aggregate(total_cap=Sum('capacity'))['total_cap'] or 1) * 100, 
-                2
-            ),
-        }
-        return Response(stats)
+        """Расширенная статистика (из сводной таблицы, см. stats.py)"""
+        return Response(network_stats.read_stats())
     
     @action(detail=True, methods=['get'])
     def connected_routes(self, request, pk=None):
         """Получить связанные кабельные трассы"""
         obj = self.get_object()
-        routes = CableRoute.objects.filter(
+        routes = CableRouteSerializer.setup_eager_loading(CableRoute.objects.filter(
             Q(from_object=obj) | Q(to_object=obj)
-        ).filter(is_active=True)
+        ).filter(is_active=True))
         serializer = CableRouteSerializer(routes, many=True)
         return Response(serializer.data)
     
+    @action(detail=True, methods=['get'])
+    def subtree(self, request, pk=None):
+        """
+        Объект и все его потомки одним рекурсивным запросом.
+        ?depth= — глубина, ?type= — типы объектов через запятую.
+        """
+        return self.hierarchy_response(request, pk, hierarchy.subtree, with_types=True)
+
+    @action(detail=True, methods=['get'])
+    def ancestors(self, request, pk=None):
+        """Цепочка родителей объекта (?depth= — сколько уровней вверх)"""
+        return self.hierarchy_response(request, pk, hierarchy.ancestors)
+
+    def hierarchy_response(self, request, pk, walk, with_types=False):
+        try:
+            pk = int(pk)
+            depth = request.query_params.get('depth')
+            depth = int(depth) if depth is not None else None
+        except ValueError:
+            return Response({'error': 'Некорректный id или depth'}, status=status.HTTP_400_BAD_REQUEST)
+        if depth is not None and not 0 <= depth <= hierarchy.MAX_DEPTH:
+            return Response({'error': f'depth должен быть от 0 до {hierarchy.MAX_DEPTH}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        kwargs = {}
+        if with_types and request.query_params.get('type'):
+            kwargs['object_types'] = set(request.query_params['type'].split(','))
+        result = walk(pk, depth, **kwargs)
+        if result is None:
+            return Response({'error': 'Объект не найден'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(result)
+    
     @action(detail=True, methods=['get'])
     def history(self, request, pk=None):
         """История изменений объекта"""
@@ -110,36 +105,28 @@ class InfrastructureObjectViewSet(viewsets.ModelViewSet):
 class CableRouteViewSet(viewsets.ModelViewSet):
     queryset = CableRoute.objects.all()
     serializer_class = CableRouteSerializer
+    pagination_class = RoutePagination
     
     def get_queryset(self):
-        queryset = CableRoute.objects.select_related('from_object', 'to_object')
-        
-        # Фильтрация по типу кабеля
-        cable_type = self.request.query_params.get('cable_type')
-        if cable_type:
-            queryset = queryset.filter(cable_type=cable_type)
-        
-        # Фильтрация по типу прокладки
-        route_type = self.request.query_params.get('route_type')
-        if route_type:
-            queryset = queryset.filter(route_type=route_type)
-        
-        # Фильтрация по активности
-        is_active = self.request.query_params.get('is_active')
-        if is_active is not None:
-            queryset = queryset.filter(is_active=is_active.lower() == 'true')
-        
+        queryset = CableRouteSerializer.setup_eager_loading(CableRoute.objects.all())
+        queryset = filter_routes(queryset, self.request.query_params)
         return queryset.order_by('name')
 
 
 class ObjectHistoryViewSet(viewsets.ModelViewSet):
     queryset = ObjectHistory.objects.all()
     serializer_class = ObjectHistorySerializer
+    pagination_class = HistoryPagination
+
+
 
 
 # Улучшенная функция проверки подключения
 def calculate_distance(lat1, lng1, lat2, lng2):
-    """Расчет расстояния между двумя точками (упрощенный)"""
+    """
+    Расчет расстояния между двумя точками (упрощенный).
+    Скалярный эталон для векторного движка geo.haversine.
+    """
     R = 6371  # Радиус Земли в км
     
     dlat = math.radians(lat2 - lat1)
@@ -155,83 +142,103 @@ def calculate_distance(lat1, lng1, lat2, lng2):
     return distance * 1000  # в метрах
 
 
-@api_view(['GET'])
-def check_connection(request):
-    """Улучшенная проверка возможности подключения"""
-    address = request.GET.get('address', '')
-    lat = request.GET.get('lat')
-    lng = request.GET.get('lng')
+def nearest_connection_points(lat, lng):
+    """
+    (distance, pk) ближайших точек подключения: до 10 в CONNECTION_RADIUS,
+    а если таких нет — одна ближайшая на любом расстоянии.
+    """
+    # Кандидаты берутся из пространственного индекса (только ячейки
+    # вокруг точки), расстояния и 10 ближайших считает geo-движок
+    index = spatial.get_index()
+    nearest = index.nearest(lat, lng, CONNECTION_RADIUS, k=10)
+    if not nearest:
+        # Для сообщения «требуется прокладка кабеля» нужна ближайшая точка — поиск расширяется от SEARCH_RADIUS
+        nearest = index.nearest_any(lat, lng, SEARCH_RADIUS)
+    return nearest
+
+
+def connection_result(address, nearest, objects_by_id):
+    """Ответ check-connection по ближайшим точкам и загруженным объектам"""
+    nearest_objects = [
+        {'object': objects_by_id[pk], 'distance': distance}
+        for distance, pk in nearest
+        if pk in objects_by_id
+    ]
+
+    # Фильтруем только в радиусе 2 км
+    nearest_in_range = [obj for obj in nearest_objects if obj['distance'] <= CONNECTION_RADIUS]
+    
+    available = len(nearest_in_range) > 0
+    technology = None
+    message = ""
+    
+    if available:
+        # Определяем доступные технологии
+        technologies = set(obj['object'].technology for obj in nearest_in_range if obj['object'].technology)
+        technology = qualification.connection_technology(technologies)
+        
+        nearest_obj = nearest_in_range[0]
+        message = (f"✅ Подключение ВОЗМОЖНО\n"
+                  f"Ближайшая точка: {nearest_obj['object'].name}\n"
+                  f"Расстояние: {int(nearest_obj['distance'])} м\n"
+                  f"Технология: {technology}\n"
+                  f"Свободных портов: {nearest_obj['object'].free_ports}")
+    else:
+        if nearest_objects:
+            nearest_obj = nearest_objects[0]
+            message = (f"❌ Подключение НЕВОЗМОЖНО в данном месте\n"
+                      f"Ближайшая точка: {nearest_obj['object'].name}\n"
+                      f"Расстояние: {int(nearest_obj['distance'])} м\n"
+                      f"Требуется прокладка кабеля")
+        else:
+            message = "❌ В радиусе 5 км нет точек подключения"
+    
+    return {
+        'address': address,
+        'status': 'available' if available else 'unavailable',
+        'technology': technology,
+        'nearest_objects': InfrastructureObjectSerializer(
+            [obj['object'] for obj in nearest_in_range], 
+            many=True
+        ).data,
+        'distances': {obj['object'].id: int(obj['distance']) for obj in nearest_in_range},
+        'message': message,
+        'available': available
+    }
+
+
+def connection_params(params):
+    """(address, lat, lng) запроса check-connection"""
+    address = params.get('address', '')
+    lat = params.get('lat')
+    lng = params.get('lng')
     
     # Если координаты не предоставлены, используем фиктивные
     if not lat or not lng:
         lat = 38.56  # Душанбе
         lng = 68.78
+    return address, lat, lng
+
+
+def connection_candidates():
+    """Точки подключения с данными для сериализатора (для in_bulk — без сортировки)"""
+    return InfrastructureObjectSerializer.setup_eager_loading(
+        InfrastructureObject.objects.filter(is_active=True, free_ports__gt=0).order_by()
+    )
+
+
+@api_view(['GET'])
+@read_from_replica
+def check_connection(request):
+    """Улучшенная проверка возможности подключения"""
+    address, lat, lng = connection_params(request.GET)
     
     try:
         lat = float(lat)
         lng = float(lng)
-        
-        # Находим все активные объекты со свободными портами
-        all_objects = InfrastructureObject.objects.filter(
-            is_active=True, 
-            free_ports__gt=0
-        )
-        
-        # Рассчитываем расстояние до каждого объекта
-        objects_with_distance = []
-        for obj in all_objects:
-            distance = calculate_distance(lat, lng, obj.lat, obj.lng)
-            objects_with_distance.append({
-                'object': obj,
-                'distance': distance
-            })
-        
-        # Сортируем по расстоянию и берем ближайшие
-        nearest_objects = sorted(objects_with_distance, key=lambda x: x['distance'])[:10]
-        
-        # Фильтруем только в радиусе 2 км
-        nearest_in_range = [obj for obj in nearest_objects if obj['distance'] <= 2000]
-        
-        available = len(nearest_in_range) > 0
-        technology = None
-        message = ""
-        
-        if available:
-            # Определяем доступные технологии
-            technologies = set(obj['object'].technology for obj in nearest_in_range if obj['object'].technology)
-            if technologies:
-                technology = 'GPON' if 'gpon' in technologies else 'ADSL' if 'adsl' in technologies else 'Ethernet'
-            
-            nearest_obj = nearest_in_range[0]
-            message = (f"✅ Подключение ВОЗМОЖНО\n"
-                      f"Ближайшая точка: {nearest_obj['object'].name}\n"
-                      f"Расстояние: {int(nearest_obj['distance'])} м\n"
-                      f"Технология: {technology}\n"
-                      f"Свободных портов: {nearest_obj['object'].free_ports}")
-        else:
-            if nearest_objects:
-                nearest_obj = nearest_objects[0]
-                message = (f"❌ Подключение НЕВОЗМОЖНО в данном месте\n"
-                          f"Ближайшая точка: {nearest_obj['object'].name}\n"
-                          f"Расстояние: {int(nearest_obj['distance'])} м\n"
-                          f"Требуется прокладка кабеля")
-            else:
-                message = "❌ В радиусе 5 км нет точек подключения"
-        
-        result_data = {
-            'address': address,
-            'status': 'available' if available else 'unavailable',
-            'technology': technology,
-            'nearest_objects': InfrastructureObjectSerializer(
-                [obj['object'] for obj in nearest_in_range], 
-                many=True
-            ).data,
-            'distances': {obj['object'].id: int(obj['distance']) for obj in nearest_in_range},
-            'message': message,
-            'available': available
-        }
-        
-        return Response(result_data)
+        nearest = nearest_connection_points(lat, lng)
+        objects_by_id = connection_candidates().in_bulk([pk for _, pk in nearest])
+        return Response(connection_result(address, nearest, objects_by_id))
         
     except Exception as e:
         return Response({
@@ -240,12 +247,315 @@ def check_connection(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+# Максимум точек в одной пакетной проверке
+BATCH_MAX_POINTS = 50_000
+
+
+@api_view(['POST'])
+def check_connection_batch(request):
+    """
+    Пакетная проверка подключения: JSON {"points": [{"lat", "lng", "address"}, ...]}
+    или CSV-файл (multipart, поле file) с колонками lat, lng, address.
+    Ответ — NDJSON, по строке на точку в порядке входа.
+    """
+    try:
+        upload = request.FILES.get('file')
+    except RequestDataTooBig:
+        return Response({'error': 'Слишком большой JSON, загрузите точки CSV-файлом'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if upload is not None:
+        points = [row for _, row in importer.read_csv(upload.file)]
+    else:
+        points = request.data.get('points') if isinstance(request.data, dict) else request.data
+    if not isinstance(points, list) or not points:
+        return Response({'error': 'Передайте непустой список points или CSV-файл'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(points) > BATCH_MAX_POINTS:
+        return Response({'error': f'Не больше {BATCH_MAX_POINTS} точек за запрос'}, status=status.HTTP_400_BAD_REQUEST)
+
+    parts = qualification.check_points(points)
+    return StreamingHttpResponse(
+        (''.join(json.dumps(result, ensure_ascii=False) + '\n' for result in part) for part in parts),
+        content_type='application/x-ndjson'
+    )
+
+
+# Минимальный масштаб карты, с которого в map-data отдаются кабельные трассы
+ROUTES_MIN_ZOOM = 12
+# Ниже этого масштаба map-data отдает кластеры по ячейкам сетки вместо объектов
+CLUSTER_MAX_ZOOM = 13
+# Размер ячейки кластеризации в пикселях экрана (тайл — 256 px)
+CLUSTER_CELL_PX = 80
+
+
+def parse_bbox(value):
+    """
+    Разбор bbox=minLng,minLat,maxLng,maxLat.
+    Возвращает кортеж из четырех float или бросает ValueError.
+    """
+    parts = value.split(',')
+    if len(parts) != 4:
+        raise ValueError('bbox должен содержать 4 числа: minLng,minLat,maxLng,maxLat')
+    min_lng, min_lat, max_lng, max_lat = (float(part) for part in parts)
+    if min_lng > max_lng or min_lat > max_lat:
+        raise ValueError('bbox: минимальные координаты больше максимальных')
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def objects_in_bbox(queryset, bbox):
+    """Фильтрация объектов по прямоугольнику (индекс lat/lng)"""
+    min_lng, min_lat, max_lng, max_lat = bbox
+    return queryset.filter(lat__range=(min_lat, max_lat), lng__range=(min_lng, max_lng))
+
+
+# Поля компактного (колоночного) ответа map-data
+COMPACT_OBJECT_FIELDS = ('id', 'object_type', 'lat', 'lng', 'status', 'technology', 'free_ports')
+COMPACT_ROUTE_FIELDS = (
+    'id', 'cable_type', 'from_object', 'to_object',
+    'from_object__lat', 'from_object__lng', 'to_object__lat', 'to_object__lng',
+)
+
+
+def columns(queryset, fields, names=None):
+    """
+    Колоночное представление: {поле: [значения...]} из одного values_list.
+    names — имена колонок в ответе (по умолчанию совпадают с fields).
+    """
+    return rows_to_columns(list(queryset.values_list(*fields)), names or fields)
+
+
+def rows_to_columns(rows, names):
+    if not rows:
+        return {name: [] for name in names}
+    return {name: list(column) for name, column in zip(names, zip(*rows))}
+
+
+COMPACT_ROUTE_NAMES = ('id', 'cable_type', 'from_object', 'to_object', 'from_lat', 'from_lng', 'to_lat', 'to_lng')
+
+
+def compact_routes(queryset):
+    return columns(queryset, COMPACT_ROUTE_FIELDS, names=COMPACT_ROUTE_NAMES)
+
+
+def cluster_objects(queryset, zoom):
+    """
+    Агрегация объектов по ячейкам сетки, размер которой зависит от zoom.
+    Для каждой ячейки: число объектов по типам, сумма free_ports и центроид.
+    Группировка выполняется в БД одним запросом.
+    """
+    return merge_clusters(cluster_rows(queryset, zoom))
+
+
+def cluster_rows(queryset, zoom):
+    """Запрос сумм по (ячейка, тип объекта) для cluster_objects"""
+    cell_size = 360 / 2 ** zoom * CLUSTER_CELL_PX / 256
+    return queryset.values(
+        'object_type',
+        row=Floor(F('lat') / cell_size),
+        col=Floor(F('lng') / cell_size),
+    ).annotate(
+        count=Count('id'),
+        free_ports_sum=Sum('free_ports'),
+        lat_sum=Sum('lat'),
+        lng_sum=Sum('lng'),
+    ).order_by()
+
+
+def merge_clusters(rows):
+    cells = {}
+    for row in rows:
+        cell = cells.setdefault((row['row'], row['col']), {
+            'count': 0, 'free_ports': 0, 'lat_sum': 0.0, 'lng_sum': 0.0, 'types': {},
+        })
+        cell['count'] += row['count']
+        cell['free_ports'] += row['free_ports_sum'] or 0
+        cell['lat_sum'] += row['lat_sum']
+        cell['lng_sum'] += row['lng_sum']
+        cell['types'][row['object_type']] = row['count']
+
+    return [
+        {
+            'lat': round(cell['lat_sum'] / cell['count'], 6),
+            'lng': round(cell['lng_sum'] / cell['count'], 6),
+            'count': cell['count'],
+            'free_ports': cell['free_ports'],
+            'types': cell['types'],
+        }
+        for cell in cells.values()
+    ]
+
+
+def map_data_version():
+    """
+    Версия данных карты: время последнего изменения объектов, трасс или
+    удаления и id последней записи журнала удалений.
+    """
+    return combine_version(
+        InfrastructureObject.objects.aggregate(last=Max('updated_at'))['last'],
+        CableRoute.objects.aggregate(last=Max('updated_at'))['last'],
+        last_deletion().first(),
+    )
+
+
+def last_deletion():
+    """(id, deleted_at) последней записи журнала удалений (queryset для first/afirst)"""
+    return DeletionLog.objects.order_by('-id').values_list('id', 'deleted_at')
+
+
+def combine_version(objects_modified, routes_modified, last_deletion):
+    timestamps = [objects_modified, routes_modified]
+    deletion_id = 0
+    if last_deletion:
+        deletion_id = last_deletion[0]
+        timestamps.append(last_deletion[1])
+    timestamps = [ts for ts in timestamps if ts]
+    return (max(timestamps) if timestamps else None), deletion_id
+
+
+def parse_since(value):
+    """Разбор since=<ISO 8601>; время без зоны считается в TIME_ZONE"""
+    since = parse_datetime(value)
+    if since is None:
+        raise ValueError('since должен быть датой-временем в формате ISO 8601')
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+def map_data_delta(since, infrastructure_objects, cable_routes, serialize_objects, serialize_routes):
+    """
+    Изменения с момента since. Объекты и трассы, которые изменились, но
+    больше не проходят фильтры (неактивны, вне bbox и т.п.), считаются
+    удаленными — клиенту достаточно убрать их с карты.
+    """
+    changed_objects = InfrastructureObject.objects.filter(updated_at__gte=since)
+    changed_routes = CableRoute.objects.filter(
+        Q(updated_at__gte=since) |
+        # у трассы меняется геометрия, когда перемещается ее конец
+        Q(from_object__in=changed_objects.values('id')) |
+        Q(to_object__in=changed_objects.values('id'))
+    )
+    visible_objects = infrastructure_objects.filter(updated_at__gte=since)
+    visible_routes = cable_routes.filter(pk__in=changed_routes.values('id'))
+    deleted = DeletionLog.objects.filter(deleted_at__gte=since)
+
+    result = {
+        'mode': 'delta',
+        'since': since.isoformat(),
+        'infrastructure_objects': serialize_objects(visible_objects),
+        'cable_routes': serialize_routes(visible_routes),
+        'created': {}, 'updated': {}, 'deleted': {},
+    }
+    for key, log_model, changed, visible in (
+        ('infrastructure_objects', 'object', changed_objects, visible_objects),
+        ('cable_routes', 'route', changed_routes, visible_routes),
+    ):
+        visible_ids = set(visible.values_list('id', flat=True))
+        created, updated, removed = [], [], []
+        for pk, created_at in changed.values_list('id', 'created_at'):
+            if pk not in visible_ids:
+                removed.append(pk)
+            elif created_at >= since:
+                created.append(pk)
+            else:
+                updated.append(pk)
+        removed += deleted.filter(model=log_model).values_list('record_id', flat=True)
+        result['created'][key] = created
+        result['updated'][key] = updated
+        result['deleted'][key] = removed
+    return result
+
+
 @api_view(['GET'])
+@renderer_classes([TimedJSONRenderer, BrowsableAPIRenderer, CompactJSONRenderer])
+@read_from_replica
 def map_data(request):
-    """Данные для карты с фильтрацией"""
-    object_type = request.GET.get('object_type')
-    technology = request.GET.get('technology')
+    """
+    Данные для карты с фильтрацией.
+    bbox=minLng,minLat,maxLng,maxLat — только видимая область;
+    zoom — масштаб карты (трассы отдаются начиная с ROUTES_MIN_ZOOM,
+    ниже CLUSTER_MAX_ZOOM вместо объектов отдаются кластеры);
+    format=compact — только поля для отрисовки маркеров, по колонкам;
+    since=<sync_token> — только изменения после предыдущего ответа.
+
+    Ответ снабжается ETag/Last-Modified по версии данных, поэтому повторный
+    запрос без изменений получает 304.
+    """
+    compact = request.accepted_renderer.format == 'compact'
+    serialize_objects, serialize_routes = map_data_serializers(compact)
+
+    try:
+        bbox, zoom, since = map_data_params(request.GET)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    sync_token, etag, last_modified_ts = map_data_etag(*map_data_version(), request.accepted_media_type, request.GET)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified_ts)
+    if not_modified is not None:
+        return not_modified
     
+    infrastructure_objects, cable_routes = map_data_querysets(request.GET, bbox, zoom)
+
+    if zoom is not None and zoom < CLUSTER_MAX_ZOOM:
+        data = {
+            'mode': 'clusters',
+            'clusters': cluster_objects(infrastructure_objects, zoom),
+            'cable_routes': serialize_routes(cable_routes),
+        }
+    elif since is not None:
+        data = map_data_delta(since, infrastructure_objects, cable_routes, serialize_objects, serialize_routes)
+    else:
+        data = {
+            'mode': 'objects',
+            'infrastructure_objects': serialize_objects(infrastructure_objects),
+            'cable_routes': serialize_routes(cable_routes),
+        }
+    if compact:
+        data['format'] = 'compact'
+    data['sync_token'] = sync_token
+
+    return with_map_data_headers(Response(data), etag, last_modified_ts)
+
+
+def compact_objects(queryset):
+    return columns(queryset, COMPACT_OBJECT_FIELDS)
+
+
+def full_objects(queryset):
+    return InfrastructureObjectSerializer(InfrastructureObjectSerializer.setup_eager_loading(queryset), many=True).data
+
+
+def full_routes(queryset):
+    return CableRouteSerializer(CableRouteSerializer.setup_eager_loading(queryset), many=True).data
+
+
+def map_data_serializers(compact):
+    """Функции сериализации (объекты, трассы) для полного или компактного ответа"""
+    return (compact_objects, compact_routes) if compact else (full_objects, full_routes)
+
+
+def map_data_params(params):
+    """(bbox, zoom, since) из параметров map-data; ValueError при ошибке"""
+    bbox = parse_bbox(params['bbox']) if params.get('bbox') else None
+    zoom = int(params['zoom']) if params.get('zoom') else None
+    since = parse_since(params['since']) if params.get('since') else None
+    return bbox, zoom, since
+
+
+def map_data_etag(last_modified, deletion_id, media_type, params):
+    """(sync_token, ETag, Last-Modified в секундах) по версии данных и запросу"""
+    sync_token = last_modified.isoformat() if last_modified else None
+    etag = '"%s"' % hashlib.md5(
+        f'{sync_token}|{deletion_id}|{media_type}|{params.urlencode()}'.encode()
+    ).hexdigest()
+    last_modified_ts = int(last_modified.timestamp()) if last_modified else None
+    return sync_token, etag, last_modified_ts
+
+
+def map_data_querysets(params, bbox, zoom):
+    """Объекты и трассы map-data с учетом фильтров, bbox и zoom"""
+    object_type = params.get('object_type')
+    technology = params.get('technology')
+
     infrastructure_objects = InfrastructureObject.objects.filter(is_active=True)
     cable_routes = CableRoute.objects.filter(is_active=True)
     
@@ -253,42 +563,229 @@ def map_data(request):
         infrastructure_objects = infrastructure_objects.filter(object_type=object_type)
     if technology:
         infrastructure_objects = infrastructure_objects.filter(technology=technology)
-    
-    data = {
-        'infrastructure_objects': InfrastructureObjectSerializer(infrastructure_objects, many=True).data,
-        'cable_routes': CableRouteSerializer(cable_routes, many=True).data
-    }
-    
-    return Response(data)
+
+    if bbox:
+        # Порядок внутри области карте не нужен, а сортировка после выборки
+        # по индексу lat/lng шла бы через временное B-дерево
+        infrastructure_objects = objects_in_bbox(infrastructure_objects, bbox).order_by()
+        # Трасса видна, если хотя бы один из ее концов попадает в область
+        endpoints = objects_in_bbox(InfrastructureObject.objects.all(), bbox).values('id')
+        cable_routes = cable_routes.filter(Q(from_object__in=endpoints) | Q(to_object__in=endpoints)).order_by()
+    if zoom is not None and zoom < ROUTES_MIN_ZOOM:
+        cable_routes = cable_routes.none()
+    return infrastructure_objects, cable_routes
+
+
+def with_map_data_headers(response, etag, last_modified_ts):
+    response['ETag'] = etag
+    if last_modified_ts is not None:
+        response['Last-Modified'] = http_date(last_modified_ts)
+    # Браузер всегда перепроверяет ответ по ETag
+    response['Cache-Control'] = 'no-cache'
+    return response
 
 
 @api_view(['GET'])
-def search(request):
-    """Улучшенный поиск"""
-    query = request.GET.get('q', '')
-    
-    if not query or len(query) < 2:
-        return Response({'error': 'Слишком короткий запрос'}, status=status.HTTP_400_BAD_REQUEST)
-    
-    # Поиск по объектам инфраструктуры
-    objects = InfrastructureObject.objects.filter(
+def map_tile(request, z, x, y):
+    """Тайл z/x/y с объектами и трассами в GeoJSON (кэшируется)"""
+    if not tiles.is_valid_tile(z, x, y):
+        return Response(
+            {'error': f'Тайлы доступны для масштабов {tiles.TILE_MIN_ZOOM}–{tiles.TILE_MAX_ZOOM}'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    return HttpResponse(tiles.get_tile(z, x, y), content_type='application/geo+json')
+
+
+@api_view(['GET'])
+def coverage_tile(request, z, x, y):
+    """PNG-тайл растра покрытия: цвет — технология подключения (прозрачно — нет покрытия)"""
+    if not coverage.is_valid_tile(z, x, y):
+        return Response(
+            {'error': f'Тайлы покрытия доступны для масштабов {coverage.COVERAGE_MIN_ZOOM}–{coverage.COVERAGE_MAX_ZOOM}'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    response = HttpResponse(coverage.get_tile(z, x, y), content_type='image/png')
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+# Лимиты выдачи поиска
+SEARCH_OBJECTS_LIMIT = 20
+SEARCH_ROUTES_LIMIT = 10
+# Поля объекта, по которым ищет /api/search/ (notes — только в фильтре списка)
+SEARCH_OBJECT_COLUMNS = ('object_id', 'name', 'address', 'technical_notes')
+
+
+def ranked(queryset, ids):
+    """Записи queryset с данными id в порядке списка ids"""
+    found = queryset.in_bulk(ids)
+    return [found[pk] for pk in ids if pk in found]
+
+
+def fulltext_search(query):
+    """Поиск по индексу FTS5: (объекты, всего объектов, трассы, всего трасс) по релевантности"""
+    object_expression = fulltext.match_expression(query, SEARCH_OBJECT_COLUMNS)
+    if object_expression is None:
+        return [], 0, [], 0
+    object_ids, objects_total = fulltext.search('object', object_expression, SEARCH_OBJECTS_LIMIT)
+    route_ids, routes_total = fulltext.search('route', fulltext.match_expression(query), SEARCH_ROUTES_LIMIT)
+    objects = ranked(InfrastructureObjectSerializer.setup_eager_loading(InfrastructureObject.objects.all()), object_ids)
+    routes = ranked(CableRouteSerializer.setup_eager_loading(CableRoute.objects.all()), route_ids)
+    return objects, objects_total, routes, routes_total
+
+
+def icontains_search(query):
+    """Поиск подстрокой для СУБД без FTS5"""
+    objects, routes = icontains_querysets(query)
+    return (
+        list(objects[:SEARCH_OBJECTS_LIMIT]), objects.count(),
+        list(routes[:SEARCH_ROUTES_LIMIT]), routes.count(),
+    )
+
+
+def icontains_querysets(query):
+    objects = InfrastructureObjectSerializer.setup_eager_loading(InfrastructureObject.objects.all()).filter(
         Q(object_id__icontains=query) |
         Q(name__icontains=query) |
         Q(address__icontains=query) |
         Q(technical_notes__icontains=query)
-    ).filter(is_active=True)[:20]
-    
-    # Поиск по кабельным трассам
-    routes = CableRoute.objects.filter(
+    ).filter(is_active=True)
+    routes = CableRouteSerializer.setup_eager_loading(CableRoute.objects.all()).filter(
         Q(name__icontains=query) |
         Q(installation_notes__icontains=query) |
         Q(notes__icontains=query)
-    ).filter(is_active=True)[:10]
+    ).filter(is_active=True)
+    return objects, routes
+
+
+# Максимум резервных путей в /api/graph/path/
+GRAPH_MAX_PATHS = 5
+
+
+@api_view(['GET'])
+def graph_path(request):
+    """
+    Путь по кабельной сети между объектами from и to (id): k=1 — кратчайший
+    по длине кабеля, k>1 — до k путей без общих трасс для резервирования.
+    """
+    try:
+        from_pk = int(request.GET['from'])
+        to_pk = int(request.GET['to'])
+        k = int(request.GET.get('k', 1))
+    except (KeyError, ValueError):
+        return Response({'error': 'Требуются целые параметры from, to и k'}, status=status.HTTP_400_BAD_REQUEST)
+    if not 1 <= k <= GRAPH_MAX_PATHS:
+        return Response({'error': f'k должно быть от 1 до {GRAPH_MAX_PATHS}'}, status=status.HTTP_400_BAD_REQUEST)
+    if InfrastructureObject.objects.filter(pk__in={from_pk, to_pk}).count() != len({from_pk, to_pk}):
+        return Response({'error': 'Объект не найден'}, status=status.HTTP_404_NOT_FOUND)
+
+    cable_graph = graph.get_graph()
+    if k == 1:
+        path = cable_graph.shortest_path(from_pk, to_pk)
+        paths = [path] if path else []
+    else:
+        paths = cable_graph.disjoint_paths(from_pk, to_pk, k)
+    return Response({'from': from_pk, 'to': to_pk, 'paths': paths})
+
+
+@api_view(['GET'])
+def impact_analysis(request):
+    """
+    Последствия отказа объекта (?object=<id>) или трассы (?route=<id>):
+    объекты, теряющие связь с OLT/АТС, по типам с количеством.
+    """
+    kinds = [kind for kind in ('object', 'route') if kind in request.GET]
+    if len(kinds) != 1:
+        return Response({'error': 'Укажите ровно один параметр: object или route'}, status=status.HTTP_400_BAD_REQUEST)
+    kind = kinds[0]
+    try:
+        pk = int(request.GET[kind])
+    except ValueError:
+        return Response({'error': f'Некорректный {kind}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    result = impact.analyse(kind, pk)
+    if result is None:
+        return Response({'error': 'Объект не найден' if kind == 'object' else 'Трасса не найдена'},
+                        status=status.HTTP_404_NOT_FOUND)
+    return Response(result)
+
+
+@api_view(['POST'])
+def import_network(request):
+    """
+    Импорт файла (multipart, поле file) объектов или трасс: kind=objects|routes,
+    format=csv|geojson|xlsx (по умолчанию по расширению). Отчет с ошибками строк.
+    """
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'error': 'Не передан файл'}, status=status.HTTP_400_BAD_REQUEST)
+    kind = request.data.get('kind', 'objects')
+    fmt = request.data.get('format') or importer.detect_format(upload.name)
+    try:
+        report = importer.import_network(upload.file, kind, fmt)
+    except ValueError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(report.as_dict())
+
+
+def export_network(request, kind):
+    """
+    Потоковая выгрузка всей сети: kind=objects|routes, format=geojson|ndjson|csv
+    (по умолчанию geojson). Принимает те же фильтры, что и списки API.
+    Обычный Django view: параметр format в DRF занят выбором рендерера.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Метод не поддерживается'}, status=405)
+    fmt = request.GET.get('format', 'geojson')
+    try:
+        parts = export.export_parts(kind, fmt, request.GET)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    response = StreamingHttpResponse(parts, content_type=export.FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{kind}.{fmt}"'
+    return response
+
+
+# Максимум подсказок автодополнения за запрос
+AUTOCOMPLETE_MAX_LIMIT = 50
+
+
+@api_view(['GET'])
+def autocomplete_view(request):
+    """Подсказки для строки поиска: id, label, type, lat, lng из индекса в памяти"""
+    query = request.GET.get('q', '')
+    try:
+        limit = min(int(request.GET.get('limit', autocomplete.DEFAULT_LIMIT)), AUTOCOMPLETE_MAX_LIMIT)
+    except ValueError:
+        return Response({'error': 'Некорректный limit'}, status=status.HTTP_400_BAD_REQUEST)
+    if limit < 1:
+        return Response({'error': 'Некорректный limit'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'results': autocomplete.get_index().search(query, limit)})
+
+
+@api_view(['GET'])
+@read_from_replica
+def search(request):
+    """Улучшенный поиск"""
+    query = request.GET.get('q', '')
+    
+    if not query or len(query) < 2:
+        return Response({'error': 'Слишком короткий запрос'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if fulltext.is_available():
+        objects, objects_total, routes, routes_total = fulltext_search(query)
+    else:
+        objects, objects_total, routes, routes_total = icontains_search(query)
     
     result = {
         'infrastructure_objects': InfrastructureObjectSerializer(objects, many=True).data,
         'cable_routes': CableRouteSerializer(routes, many=True).data,
-        'total_results': objects.count() + routes.count()
+        'total_results': objects_total + routes_total
     }
     
     return Response(result)
+
+
+def metrics_view(request):
+    """Метрики запросов процесса в текстовом формате Prometheus (metrics.py)"""
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)